@@ -0,0 +1,49 @@
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from authtoken.cache import token_cache
+from monitoring.timing import phase
+from users.cache import get_cached_user
+
+
+def check_account(user):
+    """Raise AuthenticationFailed unless `user`, a CustomUser row or None, may still use the API."""
+    if user is None:
+        raise AuthenticationFailed('User not found', code='user_not_found')
+    if not user.is_active:
+        raise AuthenticationFailed('User is inactive', code='user_inactive')
+
+
+class CachedJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication that decodes and verifies a token once, then serves repeat
+    requests with the same token from the verified-token cache.
+
+    request.user is a claims-backed authtoken.models.ClaimsUser rather than a
+    CustomUser row; views that need the row use users.cache.get_cached_user.
+    The account is still checked through that cache, so a deactivated or
+    deleted user is refused without waiting for their token to expire.
+    """
+
+    def authenticate(self, request):
+        with phase('auth'):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        check_account(get_cached_user(user.id))
+        return user
+
+    def get_validated_token(self, raw_token):
+        if isinstance(raw_token, bytes):
+            try:
+                raw_token = raw_token.decode()
+            except UnicodeDecodeError:
+                # a JWT is ASCII; anything else in the header is not a token
+                raise InvalidToken()
+        validated = token_cache.get(raw_token)
+        if validated is None:
+            validated = super().get_validated_token(raw_token)
+            token_cache.set(raw_token, validated, validated.payload.get('exp'))
+        return validated
@@ -0,0 +1,94 @@
+import hmac
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    'MAX_SIZE': 10000,
+    'TTL': 300,
+}
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of access tokens whose signature and claims were already verified.
+
+    Entries are keyed by the signature segment of the JWT; a hit still compares the
+    whole token so a forged header or payload can never reuse another token's
+    signature. An entry lives until the token's own `exp` or `ttl` seconds,
+    whichever comes first, and the least recently used entry is evicted once
+    `max_size` is reached.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(raw_token: str):
+        return raw_token.rpartition('.')[2]
+
+    def get(self, raw_token: str):
+        key = self.key(raw_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            cached_token, expires_at, validated = entry
+            # compare_digest only takes ASCII str, and a forged token may not be
+            if not hmac.compare_digest(cached_token.encode(), raw_token.encode()):
+                self.misses += 1
+                return None
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return validated
+
+    def set(self, raw_token: str, validated, exp=None):
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        key = self.key(raw_token)
+        with self._lock:
+            self._entries[key] = (raw_token, expires_at, validated)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def token_cache_setting(name):
+    return getattr(settings, 'AUTHTOKEN_CACHE', {}).get(name, DEFAULTS[name])
+
+
+token_cache = VerifiedTokenCache(token_cache_setting('MAX_SIZE'), token_cache_setting('TTL'))
@@ -1,3 +1,21 @@
-from django.db import models
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.models import TokenUser
 
-# Create your models here.
+
+class ClaimsUser(TokenUser):
+    """
+    request.user for JWT-authenticated requests, built from the access token claims
+    (see MyTokenObtainPairSerializer); the user row is only read through the
+    short-lived users.cache to check the account is still active.
+    """
+
+    @cached_property
+    def email(self) -> str:
+        return self.token.get('email', '')
+
+    @cached_property
+    def name(self) -> str:
+        return self.token.get('name', '')
+
+    def __str__(self) -> str:
+        return self.email
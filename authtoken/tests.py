@@ -1,3 +1,99 @@
-from django.test import TestCase
+import time
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from authtoken.cache import VerifiedTokenCache, token_cache
+from authtoken.serializers import MyTokenObtainPairSerializer
+from users.cache import invalidate_user
+from users.models import CustomUser
+
+
+class VerifiedTokenCacheTests(SimpleTestCase):
+    def test_hit_requires_the_whole_token(self):
+        cache = VerifiedTokenCache(max_size=10, ttl=60)
+        cache.set('header.payload.signature', 'validated')
+        self.assertEqual(cache.get('header.payload.signature'), 'validated')
+        self.assertIsNone(cache.get('header.forged.signature'))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_non_ascii_token_is_a_miss(self):
+        cache = VerifiedTokenCache(max_size=10, ttl=60)
+        cache.set('header.payload.signature', 'validated')
+        self.assertIsNone(cache.get('header.pay\u00e9load.signature'))
+
+    def test_expired_entries_are_dropped(self):
+        cache = VerifiedTokenCache(max_size=10, ttl=60)
+        cache.set('a.b.c', 'validated', exp=time.time() - 1)
+        self.assertIsNone(cache.get('a.b.c'))
+        self.assertEqual(cache.expirations, 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = VerifiedTokenCache(max_size=2, ttl=60)
+        cache.set('a.b.one', 1)
+        cache.set('a.b.two', 2)
+        cache.get('a.b.one')
+        cache.set('a.b.three', 3)
+        self.assertIsNone(cache.get('a.b.two'))
+        self.assertEqual(cache.get('a.b.one'), 1)
+        self.assertEqual(cache.evictions, 1)
+
+
+class MalformedTokenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email='tokens@example.com', password='secret', name='tokens', dob='2000-01-01'
+        )
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.token = str(MyTokenObtainPairSerializer.get_token(self.user).access_token)
+
+    def get(self, url, token):
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_header_that_is_not_utf8(self):
+        # header values are latin-1, so this is the byte 0xe9 on its own
+        self.assertEqual(self.get(reverse('paras'), self.token + '\u00e9').status_code, 401)
+
+    def test_cached_signature_with_a_non_ascii_payload(self):
+        self.assertEqual(self.get(reverse('paras'), self.token).status_code, 200)
+        header, payload, signature = self.token.split('.')
+        # 'é' in UTF-8, as latin-1 header characters
+        forged = f'{header}.{payload}\u00c3\u00a9.{signature}'
+        for url in (reverse('paras'), reverse('async-paras')):
+            self.assertEqual(self.get(url, forged).status_code, 401)
+
+
+class AccountStatusTests(TestCase):
+    """A valid token stops working once its account is deactivated or deleted."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email='status@example.com', password='secret', name='status', dob='2000-01-01'
+        )
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        # the rolled back changes of a previous test may still be cached
+        invalidate_user(self.user.pk)
+        token = MyTokenObtainPairSerializer.get_token(self.user).access_token
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def statuses(self):
+        return [self.client.get(url, **self.auth).status_code for url in (reverse('paras'), reverse('async-paras'))]
+
+    def test_deactivated_account(self):
+        self.assertEqual(self.statuses(), [200, 200])
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.statuses(), [401, 401])
+
+    def test_deleted_account(self):
+        self.assertEqual(self.statuses(), [200, 200])
+        self.user.delete()
+        self.assertEqual(self.statuses(), [401, 401])
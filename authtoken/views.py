@@ -1,26 +1,57 @@
-from rest_framework_simplejwt.settings import api_settings
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
-from rest_framework_simplejwt.tokens import UntypedToken
 
+from authtoken.authentication import CachedJWTAuthentication, check_account
+from users.cache import aget_cached_user, get_cached_user
+
+
+authenticator = CachedJWTAuthentication()
 
 
 def get_token_data(token):
     try:
-        UntypedToken(token)
-        token_data = api_settings.AUTH_TOKEN_CLASSES[0](token).payload
-        if isinstance(token_data, str):  # This means an error message was returned
-                return False
-        return token_data
-    except (InvalidToken, TokenError) as e:
-        return str(e)
+        return authenticator.get_validated_token(token).payload
+    except (InvalidToken, TokenError):
+        return False
+
+
+def active_account(user) -> bool:
+    try:
+        check_account(user)
+    except AuthenticationFailed:
+        return False
+    return True
 
 
 def get_token_user_data(request):
-    header: str = request.headers.get('Authorization')
-    if not header.startswith('Bearer '):
+    # DRF already verified the token and the account while authenticating the request
+    if getattr(request, 'auth', None) is not None:
+        return token_user_data(request)
+    user_data = token_user_data(request)
+    if not user_data or not active_account(get_cached_user(user_data[0])):
+        return False
+    return user_data
+
+
+async def aget_token_user_data(request):
+    """get_token_user_data() for async views, which DRF does not authenticate."""
+    user_data = token_user_data(request)
+    if not user_data or not active_account(await aget_cached_user(user_data[0])):
         return False
-    token = header.split()[1]
-    token_data: dict = get_token_data(token)
+    return user_data
+
+
+def token_user_data(request):
+    """(user_id, email, name) from the request's verified token claims, or False; the account is not checked."""
+    validated_token = getattr(request, 'auth', None)
+    if validated_token is not None:
+        token_data: dict = validated_token.payload
+    else:
+        header: str = request.headers.get('Authorization')
+        if not header or not header.startswith('Bearer '):
+            return False
+        token = header.split()[1]
+        token_data: dict = get_token_data(token)
     if not token_data:
         return False
     user_id = token_data.get('user_id', None)
@@ -28,4 +59,4 @@ def get_token_user_data(request):
     username = token_data.get('name', None)
     if not user_id or not email or not username:
         return False
-    return user_id, email, username
\ No newline at end of file
+    return user_id, email, username
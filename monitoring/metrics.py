@@ -0,0 +1,256 @@
+import atexit
+import json
+import os
+import threading
+import time
+import weakref
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+DEFAULTS = {
+    # directory shared by every worker process of the server (gunicorn workers, ingest workers);
+    # None keeps the metrics of each process to itself
+    'DIR': None,
+    # seconds between two writes of a process's metrics to its file in DIR
+    'FLUSH_INTERVAL': 1.0,
+}
+
+# upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests served, by URL name, method and status.', None),
+    'http_request_errors_total': ('counter', 'Requests answered with a 4xx or 5xx status, by URL name.', None),
+    'http_request_duration_seconds': ('histogram', 'Request latency, by URL name.', LATENCY_BUCKETS),
+    'http_requests_in_progress': ('gauge', 'Requests being served right now.', None),
+    'db_queries_total': ('counter', 'SQL queries run while serving requests, by URL name.', None),
+    'db_query_duration_seconds_total': ('counter', 'Seconds spent in SQL queries, by URL name.', None),
+    'db_connections_opened_total': ('counter', 'Database connections opened, by alias.', None),
+    'db_connections_open': ('gauge', 'Database connections open right now, by alias.', None),
+    'ingest_paragraphs_total': ('counter', 'Paragraphs written by ingestion.', None),
+    'ingest_tokens_total': ('counter', 'Unique words per paragraph written by ingestion.', None),
+    'search_cache_hits_total': ('counter', 'Search result cache lookups that found a result.', None),
+    'search_cache_misses_total': ('counter', 'Search result cache lookups that found nothing.', None),
+    'search_cache_hit_ratio': ('gauge', 'Search result cache hits over lookups, since the processes started.', None),
+}
+
+
+def metrics_setting(name):
+    return getattr(settings, 'MONITORING_METRICS', {}).get(name, DEFAULTS[name])
+
+
+def label_key(labels: dict):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms of one process, keyed by metric name and labels.
+
+    Updates only take a lock and touch a dict. When MONITORING_METRICS['DIR'] is
+    set, the process writes a snapshot of its values to its own file there at
+    most every FLUSH_INTERVAL seconds (and at exit), and snapshot() adds up the
+    files of every process, so any worker can answer for all of them. Counters
+    and histograms of processes that exited are kept, so totals never go down;
+    their gauges are dropped.
+
+    Collectors are callables returning (type, name, labels, value) tuples read
+    at snapshot time, for values other code already keeps.
+    """
+
+    def __init__(self):
+        self._counters = defaultdict(float)
+        self._gauges = defaultdict(float)
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._next_flush = 0.0
+        self._name = f'{os.getpid()}-{time.time_ns()}.json'
+        atexit.register(self.flush)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[name, label_key(labels)] += value
+
+    def add(self, name: str, value: float, **labels):
+        """Move a gauge up (or down, for a negative `value`)."""
+        with self._lock:
+            self._gauges[name, label_key(labels)] += value
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = METRICS[name][2]
+        with self._lock:
+            key = (name, label_key(labels))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+            counts = histogram[0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            histogram[1] += value
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def local_snapshot(self):
+        with self._lock:
+            snapshot = {
+                'pid': os.getpid(),
+                'counter': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                'gauge': [[name, labels, value] for (name, labels), value in self._gauges.items()],
+                'histogram': [[name, labels, list(counts), total]
+                              for (name, labels), (counts, total) in self._histograms.items()],
+            }
+        for collector in self._collectors:
+            for kind, name, labels, value in collector():
+                snapshot[kind].append([name, label_key(labels), value])
+        return snapshot
+
+    def maybe_flush(self):
+        """Write the snapshot to DIR if FLUSH_INTERVAL has passed; call it once a unit of work is recorded."""
+        if time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        directory = metrics_setting('DIR')
+        self._next_flush = time.monotonic() + metrics_setting('FLUSH_INTERVAL')
+        if not directory:
+            return
+        # another thread writing the file already has (nearly) the same values
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        directory = Path(directory)
+        path = directory / self._name
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            temporary = path.with_suffix('.tmp')
+            temporary.write_text(json.dumps(self.local_snapshot()))
+            # readers only ever see a whole file
+            os.replace(temporary, path)
+        except OSError:
+            pass
+        finally:
+            self._flush_lock.release()
+
+    def snapshot(self):
+        """{'counter'|'gauge'|'histogram': {(name, labels): value}} over every process sharing DIR."""
+        directory = metrics_setting('DIR')
+        if directory:
+            self.flush()
+            snapshots = []
+            for path in Path(directory).glob('*.json'):
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue
+        else:
+            snapshots = [self.local_snapshot()]
+
+        combined = {'counter': defaultdict(float), 'gauge': defaultdict(float), 'histogram': {}}
+        for snapshot in snapshots:
+            alive = process_alive(snapshot['pid'])
+            for name, labels, value in snapshot['counter']:
+                combined['counter'][name, tuple(map(tuple, labels))] += value
+            for name, labels, value in snapshot['gauge'] if alive else ():
+                combined['gauge'][name, tuple(map(tuple, labels))] += value
+            for name, labels, counts, total in snapshot['histogram']:
+                key = (name, tuple(map(tuple, labels)))
+                histogram = combined['histogram'].setdefault(key, [[0] * len(counts), 0.0])
+                histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+                histogram[1] += total
+        return combined
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+def process_alive(pid: int):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+registry = MetricsRegistry()
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')) for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render_metrics(snapshot):
+    """`snapshot` in the Prometheus text exposition format (version 0.0.4)."""
+    series = defaultdict(list)
+    for kind in ('counter', 'gauge', 'histogram'):
+        for (name, labels), value in snapshot[kind].items():
+            series[name].append((labels, value))
+
+    hits = sum(value for labels, value in series.get('search_cache_hits_total', ()))
+    misses = sum(value for labels, value in series.get('search_cache_misses_total', ()))
+    if hits + misses:
+        series['search_cache_hit_ratio'] = [((), hits / (hits + misses))]
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        if name not in series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(series[name]):
+            if kind != 'histogram':
+                lines.append(f'{name}{format_labels(labels)} {value:g}')
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                lines.append(f'{name}_bucket{format_labels(labels, le=le)} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {total:g}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+# every database connection wrapper that ever connected, to count the open ones
+_connections = weakref.WeakSet()
+
+
+def track_connection(sender, connection, **kwargs):
+    _connections.add(connection)
+    registry.inc('db_connections_opened_total', alias=connection.alias)
+
+
+def collect_connections():
+    open_connections = defaultdict(int)
+    for connection in list(_connections):
+        if connection.connection is not None:
+            open_connections[connection.alias] += 1
+    return [('gauge', 'db_connections_open', {'alias': alias}, count) for alias, count in open_connections.items()]
+
+
+connection_created.connect(track_connection)
+registry.add_collector(collect_connections)
@@ -0,0 +1,205 @@
+import cProfile
+import json
+import logging
+import random
+import re
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from monitoring.metrics import registry
+from monitoring.timing import RequestTimings, current_timings
+
+
+logger = logging.getLogger('monitoring.requests')
+
+DEFAULTS = {
+    # add a Server-Timing header with the phase breakdown to every response
+    'SERVER_TIMING': True,
+    # log one JSON line per request to the monitoring.requests logger
+    'LOG_REQUESTS': True,
+    # requests at least this slow are logged as slow and have their sampled profile kept
+    'SLOW_REQUEST_MS': 500,
+    # fraction of requests run under cProfile (0 disables profiling)
+    'PROFILE_SAMPLE_RATE': 0.0,
+    # where the .prof files of slow profiled requests are written
+    'PROFILE_DIR': 'profiles',
+}
+
+
+def monitoring_setting(name):
+    return getattr(settings, 'MONITORING', {}).get(name, DEFAULTS[name])
+
+
+def server_timing(timings: RequestTimings, total: float):
+    """The Server-Timing header value for `timings`, durations in milliseconds."""
+    metrics = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in timings.phases.items()]
+    metrics.append(f'db;dur={timings.query_seconds * 1000:.2f};desc="{timings.queries} queries"')
+    metrics.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(metrics)
+
+
+def profile_path(request, total_ms: float):
+    slug = re.sub(r'[^\w]+', '-', request.path).strip('-') or 'root'
+    # the random suffix keeps concurrent requests to the same path from overwriting each other
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{slug}-{total_ms:.0f}ms-{random.getrandbits(32):08x}"
+    return Path(monitoring_setting('PROFILE_DIR')) / f'{name}.prof'
+
+
+class ServerTimingMiddleware:
+    """
+    Times every request by phase and counts its SQL queries (see
+    monitoring.timing.record_query).
+
+    Code under a request marks its phases with monitoring.timing.phase():
+    authentication (`auth`), tokenization (`tokenize`), ranking (`search`) and
+    serialization (`serialize`); this middleware adds DRF's rendering (`render`),
+    every query on every database connection (`db`) and the `total`. The breakdown
+    goes out as a Server-Timing header and a JSON log line.
+
+    With MONITORING['PROFILE_SAMPLE_RATE'] above 0, that fraction of requests runs
+    under cProfile, and the profiles of those slower than SLOW_REQUEST_MS are
+    written to PROFILE_DIR for `python -m pstats` or snakeviz.
+
+    Streamed response bodies are produced after the response leaves the
+    middleware, so their queries are not counted. Under ASGI requests are not
+    profiled: cProfile follows a thread, which the event loop shares between
+    every request in flight.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        profile = self.start_profile()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profile is not None:
+                profile.disable()
+            current_timings.reset(token)
+        return self.finish(request, response, timings, profile)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings, None)
+
+    def finish(self, request, response, timings, profile):
+        total = timings.elapsed
+        if monitoring_setting('SERVER_TIMING'):
+            response['Server-Timing'] = server_timing(timings, total)
+        slow = total * 1000 >= monitoring_setting('SLOW_REQUEST_MS')
+        path = self.save_profile(profile, request, total) if profile is not None and slow else None
+        if monitoring_setting('LOG_REQUESTS'):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                'db_ms': round(timings.query_seconds * 1000, 2),
+                'queries': timings.queries,
+                **{f'{name}_ms': round(seconds * 1000, 2) for name, seconds in timings.phases.items()},
+                'slow': slow,
+                'profile': str(path) if path else None,
+            }))
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook; time it up to the end of render()
+        timings = current_timings.get()
+        if timings is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                timings.add('render', time.perf_counter() - start)
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def start_profile(self):
+        rate = monitoring_setting('PROFILE_SAMPLE_RATE')
+        if not rate or random.random() >= rate:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another profiler is already running in this thread
+            return None
+        return profile
+
+    def save_profile(self, profile, request, total: float):
+        path = profile_path(request, total * 1000)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            profile.dump_stats(path)
+        except OSError:
+            logger.exception('could not write the profile of %s %s', request.method, request.path)
+            return None
+        return path
+
+
+class MetricsMiddleware:
+    """
+    Counts requests, errors and latency per URL name into monitoring.metrics,
+    along with the SQL queries ServerTimingMiddleware (listed before this one)
+    counted for them. Unresolved URLs are counted under `unmatched`, so the
+    number of label values stays bounded.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        registry.add('http_requests_in_progress', 1)
+        try:
+            response = self.get_response(request)
+        finally:
+            registry.add('http_requests_in_progress', -1)
+        return self.record(request, response, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        registry.add('http_requests_in_progress', 1)
+        try:
+            response = await self.get_response(request)
+        finally:
+            registry.add('http_requests_in_progress', -1)
+        return self.record(request, response, time.perf_counter() - start)
+
+    def record(self, request, response, elapsed: float):
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        registry.inc('http_requests_total', view=view, method=request.method, status=response.status_code)
+        if response.status_code >= 400:
+            registry.inc('http_request_errors_total', view=view, status=response.status_code)
+        registry.observe('http_request_duration_seconds', elapsed, view=view)
+        timings = current_timings.get()
+        if timings is not None:
+            registry.inc('db_queries_total', timings.queries, view=view)
+            registry.inc('db_query_duration_seconds_total', timings.query_seconds, view=view)
+        registry.maybe_flush()
+        return response
@@ -0,0 +1,117 @@
+import json
+import os
+import pstats
+import re
+import subprocess
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from authtoken.serializers import MyTokenObtainPairSerializer
+from monitoring.metrics import LATENCY_BUCKETS, registry
+from tasks.ingest import ingest_text
+from tasks.vocabulary import term_ids
+from users.models import CustomUser
+
+
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='timing@example.com', password='secret', name='timing', dob='2000-01-01'
+        )
+        token = MyTokenObtainPairSerializer.get_token(self.user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {token.access_token}'}
+        ingest_text(self.user.pk, 'alpha beta\n\nbeta gamma')
+
+    def timings(self, response):
+        return {
+            name: params
+            for name, *params in (metric.split(';') for metric in response['Server-Timing'].split(', '))
+        }
+
+    def test_phases_and_queries(self):
+        with self.assertLogs('monitoring.requests', 'INFO') as logs:
+            response = self.client.get(reverse('paras-search'), {'q': 'beta'}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        timings = self.timings(response)
+        self.assertLessEqual({'auth', 'search', 'serialize', 'render', 'db', 'total'}, set(timings))
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(timings['db'][1], f'desc="{line["queries"]} queries"')
+        self.assertGreater(line['queries'], 0)
+        self.assertEqual((line['path'], line['status'], line['profile']), (reverse('paras-search'), 200, None))
+
+        with self.assertLogs('monitoring.requests', 'INFO'):
+            response = self.client.post(reverse('paras'), {'text': 'delta epsilon'},
+                                        content_type='application/json', **self.auth)
+        self.assertIn('tokenize', self.timings(response))
+
+    def test_slow_sampled_requests_are_profiled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            monitoring = {'PROFILE_SAMPLE_RATE': 1.0, 'SLOW_REQUEST_MS': 0, 'PROFILE_DIR': directory}
+            with override_settings(MONITORING=monitoring), self.assertLogs('monitoring.requests', 'INFO') as logs:
+                self.client.get(reverse('paras'), **self.auth)
+            line = json.loads(logs.records[-1].getMessage())
+            self.assertTrue(line['slow'])
+            profiles = list(Path(directory).glob('*.prof'))
+            self.assertEqual([str(path) for path in profiles], [line['profile']])
+            self.assertGreater(pstats.Stats(str(profiles[0])).total_calls, 0)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.clear()
+        self.addCleanup(registry.clear)
+        self.addCleanup(term_ids.clear)
+        user = CustomUser.objects.create_user(
+            email='metrics@example.com', password='secret', name='metrics', dob='2000-01-01'
+        )
+        token = MyTokenObtainPairSerializer.get_token(user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {token.access_token}'}
+
+    def metrics(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return dict(re.findall(r'^(\S+) (\S+)$', response.content.decode(), re.MULTILINE))
+
+    def test_requests_ingest_and_cache(self):
+        with self.captureOnCommitCallbacks(execute=True), self.assertLogs('monitoring.requests', 'INFO'):
+            self.client.post(reverse('paras'), {'text': 'alpha beta\n\nbeta'}, content_type='application/json',
+                             **self.auth)
+            for _ in range(2):
+                self.client.get(reverse('paras-search'), {'q': 'beta'}, **self.auth)
+            self.client.get(reverse('paras'))
+        metrics = self.metrics()
+        self.assertEqual(metrics['http_requests_total{method="GET",status="200",view="paras-search"}'], '2')
+        self.assertEqual(metrics['http_request_errors_total{status="401",view="paras"}'], '1')
+        self.assertEqual(metrics['http_request_duration_seconds_bucket{view="paras-search",le="+Inf"}'], '2')
+        self.assertEqual(metrics['http_request_duration_seconds_count{view="paras-search"}'], '2')
+        self.assertGreater(int(metrics['db_queries_total{view="paras-search"}']), 0)
+        self.assertEqual((metrics['ingest_paragraphs_total'], metrics['ingest_tokens_total']), ('2', '3'))
+        self.assertIn('search_cache_hit_ratio', metrics)
+
+    def test_processes_sharing_a_directory_are_added_up(self):
+        # the pid of a process that has exited: its counters count, its gauges do not
+        pid = subprocess.Popen(['true'])
+        pid.wait()
+        other = {
+            'pid': pid.pid,
+            'counter': [['http_requests_total', [['method', 'GET'], ['status', '200'], ['view', 'paras']], 5]],
+            'gauge': [['http_requests_in_progress', [], 3]],
+            'histogram': [['http_request_duration_seconds', [['view', 'paras']],
+                           [5] + [0] * len(LATENCY_BUCKETS), 0.01]],
+        }
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(MONITORING_METRICS={'DIR': directory}), \
+                self.assertLogs('monitoring.requests', 'INFO'):
+            with open(os.path.join(directory, f'{pid.pid}-0.json'), 'w') as f:
+                json.dump(other, f)
+            self.client.get(reverse('paras'), **self.auth)
+            metrics = self.metrics()
+            self.assertEqual(len(os.listdir(directory)), 2)
+        self.assertEqual(metrics['http_requests_total{method="GET",status="200",view="paras"}'], '6')
+        self.assertEqual(metrics['http_request_duration_seconds_count{view="paras"}'], '6')
+        # only the request scraping the metrics is in progress
+        self.assertEqual(metrics['http_requests_in_progress'], '1')
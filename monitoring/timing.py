@@ -0,0 +1,90 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class RequestTimings:
+    """
+    Seconds spent in each named phase of one request, and the number and total
+    duration of the SQL queries it ran.
+
+    Phases may nest (an ORM query inside a view's serialization counts towards
+    both `db` and `serialize`), so they are not meant to add up to the total.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] += seconds
+
+    def add_query(self, seconds: float):
+        self.query_seconds += seconds
+        self.queries += 1
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+current_timings: ContextVar = ContextVar('current_timings', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    An execute wrapper (see connection.execute_wrapper()) adding each query to
+    the request being timed, if any. Connections are per thread while the
+    timings follow the request's context, which sync_to_async() carries into
+    the thread running the ORM, so the wrapper is installed on every connection
+    once instead of per request.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(time.perf_counter() - start)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    # connection_created is sent again when a connection reconnects
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def phase(name: str):
+    """Add the time spent in the block to phase `name` of the request being timed, if any."""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def timed_iter(name: str, iterable):
+    """Yield from `iterable`, adding the time spent producing each item to phase `name`."""
+    timings = current_timings.get()
+    if timings is None:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            timings.add(name, time.perf_counter() - start)
+        yield item
@@ -0,0 +1,14 @@
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from monitoring.metrics import registry, render_metrics
+
+
+@require_GET
+def metrics(request):
+    """
+    The metrics of every worker process (see monitoring.metrics) in the
+    Prometheus text format, for a Prometheus scrape job pointed at /metrics.
+    It needs no token, so expose it only where the scraper can reach it.
+    """
+    return HttpResponse(render_metrics(registry.snapshot()), content_type='text/plain; version=0.0.4; charset=utf-8')
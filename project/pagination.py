@@ -0,0 +1,67 @@
+from drf_yasg import openapi
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class PrimaryKeyCursorPagination(CursorPagination):
+    """
+    Keyset pagination ordered by primary key.
+
+    The opaque cursor carries the last id of the previous page, so every page is a
+    single `WHERE id > %s ORDER BY id LIMIT n` range scan no matter how deep it is,
+    and no COUNT(*) is needed. Page size defaults to REST_FRAMEWORK['PAGE_SIZE'] and
+    can be lowered or raised per request with `?page_size=` up to `max_page_size`.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        paginate_queryset() for async views, read with the async ORM. Takes and
+        returns the same cursors; returns (page, next link, previous link).
+        Raises NotFound for a cursor that does not decode.
+        """
+        page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor.reverse
+        if cursor is None or cursor.position is None:
+            queryset = queryset.order_by('id')
+        elif reverse:
+            queryset = queryset.filter(id__lt=cursor.position).order_by('-id')
+        else:
+            queryset = queryset.filter(id__gt=cursor.position).order_by('id')
+
+        page = [row async for row in queryset[:page_size + 1]]
+        more = len(page) > page_size
+        page = page[:page_size]
+        if reverse:
+            page.reverse()
+        if not page:
+            return page, None, None
+
+        def link(row, reverse):
+            position = row['id'] if isinstance(row, dict) else row.pk
+            return self.encode_cursor(Cursor(offset=0, reverse=reverse, position=str(position)))
+
+        next_link = link(page[-1], False) if more or reverse else None
+        previous_link = link(page[0], True) if (more if reverse else cursor is not None) else None
+        return page, next_link, previous_link
+
+
+cursor_parameters = [
+    openapi.Parameter(
+        name='cursor',
+        in_=openapi.IN_QUERY,
+        description='Opaque cursor taken from the `next` or `previous` link of a previous page',
+        type=openapi.TYPE_STRING,
+        required=False
+    ),
+    openapi.Parameter(
+        name='page_size',
+        in_=openapi.IN_QUERY,
+        description='Number of results per page',
+        type=openapi.TYPE_INTEGER,
+        required=False
+    ),
+]
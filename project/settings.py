@@ -49,9 +49,12 @@ INSTALLED_APPS = [
     # Internal Packages
     'users',
     'tasks',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.ServerTimingMiddleware',
+    'monitoring.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -156,11 +159,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authtoken.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'project.pagination.PrimaryKeyCursorPagination',
+    'PAGE_SIZE': 100,
 }
 
 
@@ -174,9 +179,24 @@ SIMPLE_JWT = {
     "USER_ID_FIELD": "id",
     "USER_ID_CLAIM": "user_id",
     "TOKEN_OBTAIN_SERIALIZER": "authtoken.serializers.MyTokenObtainPairSerializer",
+    "TOKEN_USER_CLASS": "authtoken.models.ClaimsUser",
 }
 
 
+# Verified access tokens kept in memory per process (see authtoken/cache.py)
+AUTHTOKEN_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 300,
+}
+
+
+# Seconds a CustomUser row read by users.cache.get_cached_user stays in process memory. Every
+# authenticated request checks the account through it, so other processes refuse a deactivated
+# or deleted user at most this long after the change.
+USERS_CACHE_TTL = 30
+USERS_CACHE_MAX_SIZE = 10000
+
+
 SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,
     'SECURITY_DEFINITIONS': {
@@ -187,3 +207,88 @@ SWAGGER_SETTINGS = {
       }
     },
 }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # search results, see tasks/cache.py; point it at a shared backend to share hits between processes
+    'search': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'search-results',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+TASKS_SEARCH_CACHE = 'search'
+
+# Search backend used by the search API (see tasks/backends):
+# - tasks.backends.postings.PostingsSearchBackend: BM25 over the tokenized words, any database
+# - tasks.backends.postgres.PostgresSearchBackend: PostgreSQL full-text search (tsvector + GIN, ts_rank)
+TASKS_SEARCH_BACKEND = 'tasks.backends.postings.PostingsSearchBackend'
+
+# Users whose per-term paragraph bitmaps (boolean search, see tasks/bitmaps.py) are kept in process memory
+TASKS_BITMAP_CACHE_SIZE = 100
+# Users whose sorted term dictionary (suggest API, see tasks/dictionary.py) is kept in process memory
+TASKS_TERM_DICTIONARY_CACHE_SIZE = 100
+# Words whose Term id (see tasks/vocabulary.py) ingestion keeps in process memory
+TASKS_TERM_ID_CACHE_SIZE = 100000
+
+
+# Paragraph ingestion tuning (see tasks/ingest.py)
+TASKS_INGEST = {
+    'BATCH_SIZE': 500,
+    'INSERT_BATCH_SIZE': 1000,
+    'USE_COPY': True,
+    'STREAM_CHUNK_SIZE': 64 * 1024,
+    # submissions this large are tokenized in a pool of TOKENIZE_WORKERS processes (None: one per CPU)
+    'PARALLEL_TOKENIZE_THRESHOLD': 1024 * 1024,
+    'TOKENIZE_WORKERS': None,
+    'TOKENIZE_CHUNK_SIZE': 256 * 1024,
+}
+
+# Rows fetched per server-side cursor round trip by the ?stream=true list responses
+TASKS_STREAM_CHUNK_SIZE = 2000
+
+# Normalization applied to words when paragraphs are tokenized (see tasks/tokenizer.py) and to
+# search terms; only paragraphs ingested after a change are tokenized the new way
+TASKS_TOKENIZER = {
+    'CASEFOLD': False,
+    'STRIP_PUNCTUATION': False,
+    'NFKC': False,
+}
+
+# Storage of the tokenized words (see tasks/postings.py): 'rows' keeps one TokenizedWords row
+# per paragraph and word, 'packed' keeps compressed PostingBlock rows per word; after switching
+# to 'packed' run `python manage.py pack_postings` to move existing rows over
+TASKS_POSTINGS = {
+    'FORMAT': 'rows',
+    'BLOCK_SIZE': 1000,
+}
+
+
+# Per-request timing (see monitoring/middleware.py): a Server-Timing header and a JSON line on the
+# monitoring.requests logger per request; set PROFILE_SAMPLE_RATE above 0 to run that fraction of
+# requests under cProfile and keep the profiles of the slow ones in PROFILE_DIR
+MONITORING = {
+    'SERVER_TIMING': True,
+    'LOG_REQUESTS': True,
+    'SLOW_REQUEST_MS': 500,
+    'PROFILE_SAMPLE_RATE': 0.0,
+    'PROFILE_DIR': BASE_DIR / 'profiles',
+}
+
+# Request, ingest, search cache and database metrics served at /metrics (see monitoring/metrics.py).
+# With several worker processes (gunicorn -w N) point DIR at a directory they all share, emptied
+# before the server starts, so any worker reports the combined values
+MONITORING_METRICS = {
+    'DIR': os.getenv('METRICS_DIR'),
+    'FLUSH_INTERVAL': 1.0,
+}
@@ -43,4 +43,5 @@ urlpatterns = [
     path('authtoken/v1/', include('authtoken.urls')),
     path('users/v1/',include('users.urls')),
     path('tasks/v1/',include('tasks.urls')),
+    path('', include('monitoring.urls')),
 ]
@@ -3,3 +3,4 @@ from tasks import models
 
 admin.site.register(models.Paragraph)
 admin.site.register(models.TokenizedWords)
+admin.site.register(models.IngestJob)
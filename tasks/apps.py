@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tasks'
+
+    def ready(self) -> None:
+        import tasks.signals
+        from monitoring.metrics import registry
+        from tasks.cache import collect_search_cache
+
+        registry.add_collector(collect_search_cache)
@@ -0,0 +1,239 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from authtoken.views import aget_token_user_data
+from monitoring.timing import phase
+from project.pagination import PrimaryKeyCursorPagination
+from tasks.cache import MISSING, aget_corpus_stats, search_cache
+from tasks.ingest import ingest_tokenized, tokenize_text
+from tasks.jobs import aenqueue
+from tasks.models import Paragraph, TokenizedWords
+from tasks.postings import get_postings_store
+from tasks.query import parse_search_params
+from tasks.search import rank_paragraphs, search_cache_key
+from tasks.serializers import (
+    PackedTokenizedValuesSerializer, ParagraphSerializer, ParagraphValuesSerializer, TokenizedValuesSerializer,
+)
+from tasks.streaming import astreaming_response, wants_stream
+
+
+class AsyncAPIView(View):
+    """
+    Base of the async variants of the tasks API, served natively under ASGI
+    (uvicorn project.asgi:application) without a thread per request.
+
+    DRF's APIView runs its handlers synchronously, so these are Django views with
+    async handlers that keep the DRF views' contract: the same Bearer tokens,
+    query parameters, cursors and success/message/data/status_code envelope.
+    Reads use the async ORM; what has no async form (transactions, ranking, CPU
+    bound tokenization) runs in a worker thread through sync_to_async().
+    """
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # authenticated by token like the DRF views, so no CSRF cookie is involved
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def authenticate(self, request):
+        """(user_id, email, name) of the request's access token, or None if it or its account is not valid."""
+        with phase('auth'):
+            return await aget_token_user_data(request) or None
+
+    def respond(self, status_code: int, message: str, data=None, success=True, **extra):
+        body = {'success': success, 'message': message, **extra, 'data': data, 'status_code': status_code}
+        return JsonResponse(body, status=status_code, encoder=JSONEncoder)
+
+    def unauthorized(self):
+        return self.respond(status.HTTP_401_UNAUTHORIZED, "token is invalid or expired", success=False)
+
+
+class AsyncParagraphsView(AsyncAPIView):
+    queryset = Paragraph.objects
+    pagination_class = PrimaryKeyCursorPagination
+
+    async def get(self, request):
+        """
+        Async variant of ParagraphsView.get: a page (or, with `stream=true`, all)
+        of the user's paragraphs.
+
+        **Request**:
+        - GET /tasks/v1/async/paras/?page_size={n}&cursor={cursor}&stream={bool}
+
+        **Responses**: as GET /tasks/v1/paras/, plus 404 for a cursor that does not decode.
+        """
+        user = await self.authenticate(request)
+        if user is None:
+            return self.unauthorized()
+        user_id, email, username = user
+
+        request = Request(request)
+        rows = ParagraphValuesSerializer.project(self.queryset.filter(user_id=user_id))
+        if wants_stream(request):
+            return astreaming_response(
+                "list of all paragraph's data", rows.order_by('id'), ParagraphValuesSerializer.to_representation
+            )
+
+        try:
+            page, next_link, previous_link = await self.pagination_class().apaginate_queryset(rows, request)
+        except NotFound as e:
+            return self.respond(status.HTTP_404_NOT_FOUND, str(e.detail), success=False)
+        if not page:
+            return self.respond(status.HTTP_200_OK, 'data is empty.')
+        with phase('serialize'):
+            data = ParagraphValuesSerializer.many(page)
+        return self.respond(
+            status.HTTP_200_OK, "list of all paragraph's data", data,
+            count=f'{len(page)} paragraphs in this page', next=next_link, previous=previous_link,
+        )
+
+    async def post(self, request):
+        """
+        Async variant of ParagraphsView.post: split `text` into paragraphs and
+        store them with their tokenized words, or queue it with `async=true`.
+
+        Tokenization runs in a worker thread, or in the shared process pool for
+        large texts, so the event loop keeps serving other requests meanwhile.
+        The write then runs as one transaction in the request's ORM thread.
+
+        **Request**:
+        - POST /tasks/v1/async/paras/?async={bool}
+        - Body: {"text": "first paragraph\\n\\nsecond paragraph"}
+
+        **Responses**: as POST /tasks/v1/paras/.
+        """
+        user = await self.authenticate(request)
+        if user is None:
+            return self.unauthorized()
+        user_id, email, username = user
+
+        if request.content_type == 'application/json':
+            try:
+                payload = json.loads(request.body or b'{}')
+            except ValueError:
+                payload = None
+            if not isinstance(payload, dict):
+                return JsonResponse({'detail': 'JSON parse error'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            payload = request.POST
+        serializer = ParagraphSerializer(data=payload)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        text = serializer.validated_data['text']
+
+        if request.GET.get('async', '').lower() in ('1', 'true', 'yes'):
+            job = await aenqueue(user_id, text)
+            return self.respond(status.HTTP_202_ACCEPTED, "text has been queued for ingestion", {
+                'job_id': job.id,
+                'status_url': reverse('ingest-job', kwargs={'job_id': job.id}),
+            })
+
+        tokenized = await sync_to_async(tokenize_text, thread_sensitive=False)(text)
+        await sync_to_async(ingest_tokenized)(user_id, tokenized)
+        return self.respond(status.HTTP_201_CREATED, "task has been created successfully")
+
+
+class AsyncParagraphSearchView(AsyncAPIView):
+    queryset = Paragraph.objects
+    serializer_class = ParagraphValuesSerializer
+    max_edits = 2
+    fuzzy_expansions = 10
+
+    async def get(self, request):
+        """
+        Async variant of ParagraphSearchView.get: the top 10 paragraphs for a word
+        or query, from the search result cache when the user's paragraphs have not
+        changed since. Ranking runs in the request's ORM thread.
+
+        **Request**:
+        - GET /tasks/v1/async/search/?word={word}
+        - GET /tasks/v1/async/search/?q={query}&fuzzy={bool}&max_edits={n}
+
+        **Responses**: as GET /tasks/v1/search/.
+        """
+        user = await self.authenticate(request)
+        if user is None:
+            return self.unauthorized()
+        user_id, email, username = user
+
+        try:
+            query, max_edits = parse_search_params(request.GET, self.max_edits)
+        except ValueError as e:
+            return self.respond(status.HTTP_400_BAD_REQUEST, str(e), success=False)
+
+        stats = await aget_corpus_stats(user_id)
+        cache_key = search_cache_key(user_id, stats.version, query, max_edits)
+        matching_paragraphs = await search_cache.aget(cache_key)
+        if matching_paragraphs is MISSING:
+            paragraph_ids = await sync_to_async(rank_paragraphs)(
+                user_id, query, stats, max_edits, self.fuzzy_expansions
+            )
+            with phase('serialize'):
+                rows = {
+                    row['id']: row
+                    async for row in self.serializer_class.project(self.queryset.filter(id__in=paragraph_ids))
+                }
+                matching_paragraphs = [self.serializer_class.to_representation(rows[pk]) for pk in paragraph_ids]
+            await search_cache.aset(cache_key, matching_paragraphs)
+
+        if not matching_paragraphs:
+            return self.respond(status.HTTP_200_OK, 'No paragraphs found containing the word.')
+        return self.respond(
+            status.HTTP_200_OK, "List of top 10 paragraphs containing the word, most relevant first.",
+            matching_paragraphs, count=f'{len(matching_paragraphs)} paragraphs found',
+        )
+
+
+class AsyncTokenizedWordsView(AsyncAPIView):
+    queryset = TokenizedWords.objects
+    serializer_class = TokenizedValuesSerializer
+    pagination_class = PrimaryKeyCursorPagination
+
+    async def get(self, request):
+        """
+        Async variant of TokenizedWordsView.get: a page (or, with `stream=true`,
+        all) of the user's tokens. With packed postings the tokens are decoded
+        from the posting blocks in a worker thread, a chunk at a time.
+
+        **Request**:
+        - GET /tasks/v1/async/tokenized/?page_size={n}&cursor={cursor}&stream={bool}
+
+        **Responses**: as GET /tasks/v1/tokenized/, plus 404 for a cursor that does not decode.
+        """
+        user = await self.authenticate(request)
+        if user is None:
+            return self.unauthorized()
+        user_id, email, username = user
+
+        request = Request(request)
+        queryset, serializer_class = self.queryset, self.serializer_class
+        if get_postings_store().packed:
+            queryset, serializer_class = Paragraph.objects, PackedTokenizedValuesSerializer
+        rows = serializer_class.project(queryset.filter(user_id=user_id))
+        if wants_stream(request):
+            return astreaming_response(
+                "list of all tokenized data", rows.order_by('id'), serializer_class.to_representation,
+                many=serializer_class.amany if serializer_class.batched else None,
+            )
+
+        try:
+            page, next_link, previous_link = await self.pagination_class().apaginate_queryset(rows, request)
+        except NotFound as e:
+            return self.respond(status.HTTP_404_NOT_FOUND, str(e.detail), success=False)
+        if not page:
+            return self.respond(status.HTTP_200_OK, 'data is empty.')
+        with phase('serialize'):
+            tokens = await serializer_class.amany(page) if serializer_class.batched else serializer_class.many(page)
+        return self.respond(
+            status.HTTP_200_OK, "list of all tokenized data", tokens,
+            count=f'{len(tokens)} tokens in this page', next=next_link, previous=previous_link,
+        )
@@ -0,0 +1,17 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+DEFAULT_SEARCH_BACKEND = 'tasks.backends.postings.PostingsSearchBackend'
+
+
+@lru_cache(maxsize=None)
+def load_search_backend(path: str):
+    return import_string(path)()
+
+
+def get_search_backend():
+    """The backend named by TASKS_SEARCH_BACKEND (a dotted path to a SearchBackend subclass)."""
+    return load_search_backend(getattr(settings, 'TASKS_SEARCH_BACKEND', DEFAULT_SEARCH_BACKEND))
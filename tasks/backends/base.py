@@ -0,0 +1,14 @@
+class SearchBackend:
+    """
+    Answers parsed search queries (see tasks.query) for one user's paragraphs.
+
+    Backends only rank: they return paragraph ids, best first, and the view reads
+    the rows. Keeping the index they search up to date on write is their own job.
+    """
+
+    # part of the search result cache key, so backends never share cached results
+    name = None
+
+    def search(self, user_id, query, stats, k: int = 10):
+        """Ids of the `k` best matching paragraphs; `stats` is the user's CorpusStats."""
+        raise NotImplementedError
@@ -0,0 +1,62 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+
+from tasks.backends.base import SearchBackend
+from tasks.models import Paragraph
+from tasks.query import And, AndNot, Near, Or, Phrase, Term
+
+
+# must match the configuration of the trigger that fills Paragraph.search_vector
+SEARCH_CONFIG = 'english'
+
+
+def quote(word: str):
+    return "'" + word.replace('\\', '\\\\').replace("'", "''") + "'"
+
+
+def to_tsquery(node):
+    """Render a parsed query (see tasks.query) in to_tsquery syntax."""
+    if isinstance(node, Term):
+        return quote(node.word)
+    if isinstance(node, Phrase):
+        out = quote(node.words[0][1])
+        for (previous, _), (offset, word) in zip(node.words, node.words[1:]):
+            out += f' <{offset - previous}> {quote(word)}'
+        return f'({out})'
+    if isinstance(node, Near):
+        # tsquery only has "followed by exactly N", so spell out every distance both ways
+        left, right = quote(node.left.word), quote(node.right.word)
+        alternatives = [
+            f'{first} <{distance}> {second}'
+            for distance in range(1, node.distance + 1)
+            for first, second in ((left, right), (right, left))
+        ]
+        return '(' + ' | '.join(alternatives) + ')'
+    if isinstance(node, AndNot):
+        return f'({to_tsquery(node.include)} & !{to_tsquery(node.exclude)})'
+    if isinstance(node, Or):
+        return '(' + ' | '.join(map(to_tsquery, node.children)) + ')'
+    if isinstance(node, And):
+        return '(' + ' & '.join(map(to_tsquery, node.children)) + ')'
+    raise TypeError(f'cannot search for {node!r}')
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    PostgreSQL full-text search over Paragraph.search_vector, a tsvector kept up
+    to date by a trigger on every insert or update and indexed with GIN, ranked
+    with ts_rank. The text search configuration stems words and drops its own
+    stop words, so matches can differ slightly from the postings backend.
+    """
+
+    name = 'postgres'
+
+    def search(self, user_id, query, stats, k: int = 10):
+        tsquery = SearchQuery(to_tsquery(query), search_type='raw', config=SEARCH_CONFIG)
+        return list(
+            Paragraph.objects
+            .filter(user_id=user_id, search_vector=tsquery)
+            .annotate(rank=SearchRank(F('search_vector'), tsquery))
+            .order_by('-rank', 'id')
+            .values_list('id', flat=True)[:k]
+        )
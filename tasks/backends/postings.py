@@ -0,0 +1,15 @@
+from tasks.backends.base import SearchBackend
+from tasks.search import ranked_search
+
+
+class PostingsSearchBackend(SearchBackend):
+    """
+    Portable backend over the TokenizedWords postings, written by ingestion on
+    every database: BM25 ranking, positional phrase / NEAR matching and boolean
+    queries over in-process bitmaps (see tasks.search).
+    """
+
+    name = 'postings'
+
+    def search(self, user_id, query, stats, k: int = 10):
+        return ranked_search(user_id, query, stats, k)
@@ -0,0 +1,84 @@
+import contextlib
+import itertools
+import random
+import statistics
+import time
+
+from django.db import connections
+
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pa', 'qu', 'dor', 'fen', 'gal', 'hex', 'jin']
+
+
+def make_vocabulary(size: int, seed: int = 0):
+    """Deterministic list of `size` distinct made-up words."""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_paragraphs(paragraphs: int, words_per_paragraph: int, vocabulary: int, seed: int = 0,
+                    vocabulary_seed=None):
+    """
+    Yield reproducible paragraphs whose words follow a Zipf-like distribution
+    over a vocabulary of the given size, so a few terms are very common.
+    `vocabulary_seed` (default `seed`) lets several corpora share one vocabulary.
+    """
+    rng = random.Random(seed)
+    words = make_vocabulary(vocabulary, seed if vocabulary_seed is None else vocabulary_seed)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    for _ in range(paragraphs):
+        yield ' '.join(rng.choices(words, cum_weights=cum_weights, k=words_per_paragraph))
+
+
+def make_text(paragraphs: int, words_per_paragraph: int, vocabulary: int, seed: int = 0):
+    return '\n\n'.join(make_paragraphs(paragraphs, words_per_paragraph, vocabulary, seed))
+
+
+def make_queries(vocabulary: int, seed: int):
+    """One query of each kind, over common (low rank) and rare words of the generated corpus."""
+    words = make_vocabulary(vocabulary, seed)
+    common, rare = words[:10], words[vocabulary // 2:vocabulary // 2 + 10]
+    return {
+        'common word': common[0],
+        'rare word': rare[0],
+        'phrase': f'"{common[0]} {common[1]}"',
+        'near': f'{common[0]} NEAR/3 {rare[1]}',
+        'boolean': f'{common[2]} AND ({rare[2]} OR {rare[3]} OR {common[3]}) NOT {common[4]}',
+    }
+
+
+def latency_summary(timings_ms):
+    """p50/p95/p99/max of a list of request latencies in milliseconds."""
+    if len(timings_ms) < 2:
+        p50 = p95 = p99 = timings_ms[0] if timings_ms else 0.0
+    else:
+        cuts = statistics.quantiles(timings_ms, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    return {
+        'p50_ms': round(p50, 3),
+        'p95_ms': round(p95, 3),
+        'p99_ms': round(p99, 3),
+        'max_ms': round(max(timings_ms, default=0.0), 3),
+    }
+
+
+@contextlib.contextmanager
+def benchmark_database(alias: str = 'default'):
+    """Run the block against a freshly migrated throwaway copy of the database."""
+    connection = connections[alias]
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextlib.contextmanager
+def timed(result: dict, key: str = 'seconds'):
+    start = time.perf_counter()
+    yield
+    result[key] = time.perf_counter() - start
@@ -0,0 +1,150 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+# bit positions set in each byte value, to walk a container a byte at a time
+BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+CONTAINER_BYTES = 1 << 13
+
+
+class Bitmap:
+    """
+    Compressed set of paragraph ids, split Roaring-style into 2**16-id containers.
+
+    Ids are grouped by their high 16 bits and only non-empty containers are kept.
+    Each container is a Python int used as a 65536-bit bitset, so AND / OR /
+    AND NOT of two bitmaps is one C-level big-int operation per shared container.
+    """
+
+    __slots__ = ('containers',)
+
+    def __init__(self, containers=None):
+        self.containers = containers or {}
+
+    @classmethod
+    def from_ids(cls, ids):
+        blocks = {}
+        for paragraph_id in ids:
+            block = blocks.get(paragraph_id >> 16)
+            if block is None:
+                block = blocks[paragraph_id >> 16] = bytearray(CONTAINER_BYTES)
+            low = paragraph_id & 0xFFFF
+            block[low >> 3] |= 1 << (low & 7)
+        return cls({high: int.from_bytes(block, 'little') for high, block in blocks.items()})
+
+    def __and__(self, other):
+        containers = {}
+        for high, bits in self.containers.items():
+            bits &= other.containers.get(high, 0)
+            if bits:
+                containers[high] = bits
+        return Bitmap(containers)
+
+    def __or__(self, other):
+        containers = dict(self.containers)
+        for high, bits in other.containers.items():
+            containers[high] = containers.get(high, 0) | bits
+        return Bitmap(containers)
+
+    def __sub__(self, other):
+        containers = {}
+        for high, bits in self.containers.items():
+            bits &= ~other.containers.get(high, 0)
+            if bits:
+                containers[high] = bits
+        return Bitmap(containers)
+
+    def __contains__(self, paragraph_id):
+        return bool(self.containers.get(paragraph_id >> 16, 0) >> (paragraph_id & 0xFFFF) & 1)
+
+    def __len__(self):
+        return sum(bits.bit_count() for bits in self.containers.values())
+
+    def __bool__(self):
+        return bool(self.containers)
+
+    def __iter__(self):
+        for high in sorted(self.containers):
+            base = high << 16
+            data = self.containers[high].to_bytes(CONTAINER_BYTES, 'little')
+            for offset, value in enumerate(data):
+                if value:
+                    start = base + (offset << 3)
+                    for bit in BYTE_BITS[value]:
+                        yield start + bit
+
+    def __eq__(self, other):
+        return isinstance(other, Bitmap) and self.containers == other.containers
+
+    def __repr__(self):
+        return f'Bitmap({len(self)} ids)'
+
+
+class TermBitmapCache:
+    """
+    Per-user {normalized term: Bitmap of paragraph ids}, valid for one corpus version.
+
+    Bitmaps are loaded on demand. Ingestion advances a user's bitmaps to the next
+    version once its transaction commits (`advance`), so a new batch of paragraphs
+    does not throw away the bitmaps of terms it never touched. Any other change
+    (a delete, or an ingest in another process) shows up as a version mismatch
+    and the user's bitmaps are dropped and reloaded. Users are evicted least
+    recently used first once `max_size` is reached. Users are keyed by str(user_id)
+    since views see the id from the token claims and ingestion the model's UUID.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version: int, terms, load):
+        """
+        Bitmaps of `terms` at `version`; `load(missing_terms)` must return
+        {term: paragraph ids} read from the database for the ones not held.
+        """
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None or entry[0] != version:
+                entry = self._users[user_id] = (version, {})
+            self._users.move_to_end(user_id)
+            bitmaps = entry[1]
+            found = {term: bitmaps[term] for term in terms if term in bitmaps}
+        missing = [term for term in terms if term not in found]
+        if missing:
+            loaded = load(missing)
+            loaded = {term: Bitmap.from_ids(loaded.get(term, ())) for term in missing}
+            found.update(loaded)
+            with self._lock:
+                entry = self._users.get(user_id)
+                if entry is not None and entry[0] == version:
+                    entry[1].update(loaded)
+                while len(self._users) > self.max_size:
+                    self._users.popitem(last=False)
+        return found
+
+    def advance(self, user_id, old_version: int, new_version: int, added: dict):
+        """OR the paragraph ids in `added` ({term: ids}) into bitmaps held at `old_version`."""
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return
+            if entry[0] != old_version:
+                del self._users[user_id]
+                return
+            bitmaps = entry[1]
+            for term, ids in added.items():
+                if term in bitmaps:
+                    bitmaps[term] = bitmaps[term] | Bitmap.from_ids(ids)
+            self._users[user_id] = (new_version, bitmaps)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+bitmap_cache = TermBitmapCache(getattr(settings, 'TASKS_BITMAP_CACHE_SIZE', 100))
@@ -0,0 +1,106 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+
+from tasks.models import CorpusStats
+
+
+MISSING = object()
+
+
+def get_corpus_stats(user_id):
+    """The user's CorpusStats row, or an unsaved empty one if they never wrote anything."""
+    return CorpusStats.objects.filter(user_id=user_id).first() or CorpusStats(user_id=user_id)
+
+
+async def aget_corpus_stats(user_id):
+    return await CorpusStats.objects.filter(user_id=user_id).afirst() or CorpusStats(user_id=user_id)
+
+
+def bump_corpus_version(user_id, paragraphs=0, length=0, create=True):
+    """
+    Invalidate every cached search result of the user and add `paragraphs` and
+    `length` to their corpus totals. Call it inside the transaction that changes
+    their paragraphs so readers never pair new data with an old version (or the
+    other way round). Deletes pass create=False: the row may be going away with
+    the user in the same cascade.
+    """
+    changes = {
+        'version': F('version') + 1,
+        'paragraphs': F('paragraphs') + paragraphs,
+        'total_length': F('total_length') + length,
+    }
+    updated = CorpusStats.objects.filter(user_id=user_id).update(**changes)
+    if not updated and create:
+        stats, created = CorpusStats.objects.get_or_create(
+            user_id=user_id, defaults={'version': 1, 'paragraphs': paragraphs, 'total_length': length}
+        )
+        if not created:
+            CorpusStats.objects.filter(user_id=user_id).update(**changes)
+
+
+class SearchResultCache:
+    """
+    Search results keyed by (user, corpus version, normalized query) in the
+    TASKS_SEARCH_CACHE cache alias.
+
+    Writes never delete entries: they bump the user's corpus version, which changes
+    every key of that user, and the stale entries age out through the cache
+    backend's own size bound (MAX_ENTRIES) and TIMEOUT.
+    """
+
+    def __init__(self, alias: str):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def key(self, user_id, version: int, query: str):
+        digest = hashlib.sha1(query.encode()).hexdigest()
+        return f'search:{user_id}:{version}:{digest}'
+
+    def get(self, key: str):
+        return self._count(self.cache.get(key, MISSING))
+
+    async def aget(self, key: str):
+        return self._count(await self.cache.aget(key, MISSING))
+
+    def _count(self, value):
+        with self._lock:
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value):
+        self.cache.set(key, value)
+
+    async def aset(self, key: str, value):
+        await self.cache.aset(key, value)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+search_cache = SearchResultCache(getattr(settings, 'TASKS_SEARCH_CACHE', 'search'))
+
+
+def collect_search_cache():
+    # hit and miss counts of this process, for monitoring.metrics
+    return [
+        ('counter', 'search_cache_hits_total', {}, search_cache.hits),
+        ('counter', 'search_cache_misses_total', {}, search_cache.misses),
+    ]
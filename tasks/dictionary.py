@@ -0,0 +1,198 @@
+import heapq
+import itertools
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+
+from tasks.cache import get_corpus_stats
+from tasks.fuzzy import TrigramIndex
+from tasks.postings import get_postings_store
+
+
+# sorts after every string starting with a given prefix
+PREFIX_END = chr(0x10FFFF)
+
+
+class TermDictionary:
+    """
+    A user's normalized terms in sorted order with their document frequencies.
+
+    A prefix maps to a contiguous slice of the sorted terms found with two binary
+    searches; the frequencies are kept in a list aligned with the terms so the
+    best of a slice are picked with C-level list operations rather than a Python
+    key function per term. New terms are buffered and merged in on the next
+    lookup, so an ingest batch costs one pass over the lists instead of one list
+    insert per term. The trigram index used by fuzzy search is only built on
+    first use and then kept up to date the same way. `lock` serializes the
+    lookups and additions of one dictionary.
+    """
+
+    def __init__(self, frequencies: dict):
+        self.terms = sorted(frequencies)
+        self.frequencies = [frequencies[term] for term in self.terms]
+        self._pending = {}
+        self._trigrams = None
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.terms)
+
+    def add(self, counts: dict):
+        """Add {term: paragraphs} document frequency increments."""
+        for term, count in counts.items():
+            self._pending[term] = self._pending.get(term, 0) + count
+
+    def _merge(self):
+        pending, self._pending = self._pending, {}
+        terms, frequencies = self.terms, self.frequencies
+        new_terms = {}
+        for term, count in pending.items():
+            i = bisect_left(terms, term)
+            if i < len(terms) and terms[i] == term:
+                frequencies[i] += count
+            else:
+                new_terms[term] = count
+        if new_terms and self._trigrams is not None:
+            self._trigrams.add(new_terms)
+        if new_terms:
+            # splice the new terms in between slices of the existing lists
+            merged_terms, merged_frequencies = [], []
+            previous = 0
+            for term in sorted(new_terms):
+                i = bisect_left(terms, term, previous)
+                merged_terms += terms[previous:i]
+                merged_frequencies += frequencies[previous:i]
+                merged_terms.append(term)
+                merged_frequencies.append(new_terms[term])
+                previous = i
+            merged_terms += terms[previous:]
+            merged_frequencies += frequencies[previous:]
+            self.terms, self.frequencies = merged_terms, merged_frequencies
+
+    def similar(self, word: str, max_edits: int, limit: int):
+        """Up to `limit` terms within `max_edits` of `word`, closest first, then most frequent."""
+        if self._pending:
+            self._merge()
+        if self._trigrams is None:
+            self._trigrams = TrigramIndex(self.terms)
+        matches = self._trigrams.similar(word, max_edits)
+        frequency = {term: self.frequencies[bisect_left(self.terms, term)] for term, edits in matches}
+        matches.sort(key=lambda match: (match[1], -frequency[match[0]], match[0]))
+        return [term for term, edits in matches[:limit]]
+
+    def complete(self, prefix: str, limit: int):
+        """Up to `limit` (term, df) pairs starting with `prefix`, most frequent first, then alphabetical."""
+        if self._pending:
+            self._merge()
+        lo = bisect_left(self.terms, prefix)
+        hi = bisect_left(self.terms, prefix + PREFIX_END, lo)
+        window = self.frequencies[lo:hi]
+        if len(window) > limit:
+            # everything above the limit-th best frequency, then ties in alphabetical order
+            threshold = heapq.nlargest(limit, window)[-1]
+            picked = [i for i, frequency in enumerate(window) if frequency > threshold]
+            ties = (i for i, frequency in enumerate(window) if frequency == threshold)
+            picked.extend(itertools.islice(ties, limit - len(picked)))
+        else:
+            picked = range(len(window))
+        picked = sorted(picked, key=lambda i: (-window[i], i))
+        return [(self.terms[lo + i], window[i]) for i in picked]
+
+
+def load_term_frequencies(user_id):
+    """{normalized term: number of the user's paragraphs containing it}, in one grouped query."""
+    return get_postings_store().document_frequencies(user_id)
+
+
+class TermDictionaryCache:
+    """
+    Per-user TermDictionary valid for one corpus version, evicted least recently
+    used first once `max_size` users are held.
+
+    Like the term bitmaps (tasks.bitmaps), ingestion advances a held dictionary
+    to the next version after its transaction commits; any other change to the
+    user's paragraphs shows up as a version mismatch and the dictionary is
+    rebuilt from the postings on the next lookup.
+
+    The cache lock only guards the table of users. A dictionary is built under
+    a lock of its user, so concurrent requests wait for one build instead of
+    each loading it, and read under its own lock, so one user's cold build or
+    trigram index never holds up another user's lookups.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._users = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def _held(self, user_id, version: int):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and entry[0] == version:
+                self._users.move_to_end(user_id)
+                return entry[1]
+            return None
+
+    def _build(self, user_id, version: int):
+        with self._lock:
+            building = self._building.setdefault(user_id, threading.Lock())
+        with building:
+            try:
+                # built by the request this one waited for
+                dictionary = self._held(user_id, version)
+                if dictionary is not None:
+                    return dictionary
+                dictionary = TermDictionary(load_term_frequencies(user_id))
+                if get_corpus_stats(user_id).version != version:
+                    # an ingest committed while loading; its commit hook may still count
+                    # the same paragraphs in again, so this dictionary is not kept
+                    return dictionary
+                with self._lock:
+                    self._users[user_id] = (version, dictionary)
+                    self._users.move_to_end(user_id)
+                    while len(self._users) > self.max_size:
+                        self._users.popitem(last=False)
+                return dictionary
+            finally:
+                with self._lock:
+                    if self._building.get(user_id) is building:
+                        del self._building[user_id]
+
+    def lookup(self, user_id, version: int, read):
+        """Call `read(dictionary)` with the user's dictionary at `version`, under the dictionary's lock."""
+        user_id = str(user_id)
+        dictionary = self._held(user_id, version)
+        if dictionary is None:
+            dictionary = self._build(user_id, version)
+        with dictionary.lock:
+            return read(dictionary)
+
+    def complete(self, user_id, version: int, prefix: str, limit: int):
+        return self.lookup(user_id, version, lambda dictionary: dictionary.complete(prefix, limit))
+
+    def similar(self, user_id, version: int, word: str, max_edits: int, limit: int):
+        return self.lookup(user_id, version, lambda dictionary: dictionary.similar(word, max_edits, limit))
+
+    def advance(self, user_id, old_version: int, new_version: int, added: dict):
+        """Count the paragraphs in `added` ({term: paragraph ids}) into a dictionary held at `old_version`."""
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return
+            if entry[0] != old_version:
+                del self._users[user_id]
+                return
+            with entry[1].lock:
+                entry[1].add({term: len(set(ids)) for term, ids in added.items()})
+            self._users[user_id] = (new_version, entry[1])
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+term_dictionaries = TermDictionaryCache(getattr(settings, 'TASKS_TERM_DICTIONARY_CACHE_SIZE', 100))
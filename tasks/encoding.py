@@ -0,0 +1,125 @@
+def encode_positions(positions) -> bytes:
+    """
+    Pack an ascending list of token positions as varint-encoded gaps.
+
+    Positions inside a paragraph are small and close together, so most gaps fit
+    in a single byte.
+    """
+    out = bytearray()
+    previous = 0
+    for position in positions:
+        gap = position - previous
+        previous = position
+        while gap >= 0x80:
+            out.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        out.append(gap)
+    return bytes(out)
+
+
+def decode_positions(data) -> list:
+    positions = []
+    position = gap = shift = 0
+    for byte in bytes(data):
+        gap |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        position += gap
+        positions.append(position)
+        gap = shift = 0
+    return positions
+
+
+def write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos: int):
+    """(value, position after it)"""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_block(term: str, postings) -> bytes:
+    """
+    Pack a term's postings, [(paragraph_id, paragraph_length, {word: positions})]
+    in ascending paragraph order, into one PostingBlock payload.
+
+    Each posting is the gap from the previous paragraph id and the byte size of
+    its payload, so the ids can be read without decoding the rest. The payload
+    holds the paragraph length, then for each spelling of the term in the
+    paragraph its bytes (empty when it is the term itself), its frequency and
+    its positions as gaps.
+    """
+    out = bytearray()
+    previous = 0
+    for paragraph_id, length, words in postings:
+        payload = bytearray()
+        write_varint(payload, length)
+        write_varint(payload, len(words))
+        for word, positions in words.items():
+            spelling = b'' if word == term else word.encode()
+            write_varint(payload, len(spelling))
+            payload += spelling
+            write_varint(payload, len(positions))
+            payload += encode_positions(positions)
+        write_varint(out, paragraph_id - previous)
+        write_varint(out, len(payload))
+        out += payload
+        previous = paragraph_id
+    return bytes(out)
+
+
+def iter_block_ids(data):
+    data = bytes(data)
+    pos = paragraph_id = 0
+    while pos < len(data):
+        gap, pos = read_varint(data, pos)
+        size, pos = read_varint(data, pos)
+        paragraph_id += gap
+        pos += size
+        yield paragraph_id
+
+
+def decode_block(term: str, data, paragraph_ids=None):
+    """
+    Yield (paragraph_id, paragraph_length, {word: positions}) from a PostingBlock
+    payload, skipping the payload of paragraphs not in `paragraph_ids` when given.
+    """
+    data = bytes(data)
+    pos = paragraph_id = 0
+    while pos < len(data):
+        gap, pos = read_varint(data, pos)
+        size, pos = read_varint(data, pos)
+        paragraph_id += gap
+        end = pos + size
+        if paragraph_ids is not None and paragraph_id not in paragraph_ids:
+            pos = end
+            continue
+        length, pos = read_varint(data, pos)
+        count, pos = read_varint(data, pos)
+        words = {}
+        for _ in range(count):
+            size, pos = read_varint(data, pos)
+            word = data[pos:pos + size].decode() if size else term
+            pos += size
+            frequency, pos = read_varint(data, pos)
+            positions = []
+            position = 0
+            for _ in range(frequency):
+                gap, pos = read_varint(data, pos)
+                position += gap
+                positions.append(position)
+            words[word] = positions
+        pos = end
+        yield paragraph_id, length, words
@@ -0,0 +1,100 @@
+import itertools
+from collections import Counter, defaultdict
+
+
+def trigrams(word: str):
+    """Distinct 3-grams of the word padded like pg_trgm: two marks in front, one behind."""
+    padded = f'\0\0{word}\0'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def allowed_edits(word: str):
+    """Edits tolerated for a word of this length: none up to 2 characters, 1 up to 5, then 2."""
+    if len(word) <= 2:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+
+def edit_distance(a: str, b: str, limit: int):
+    """
+    Levenshtein distance of `a` and `b`, capped at `limit + 1`.
+
+    Bit-parallel (Myers / Hyyro): one column of the DP table is held in the bits
+    of a few ints, so each character of `b` costs a handful of int operations
+    instead of a Python loop over `a`.
+    """
+    m = len(a)
+    if abs(m - len(b)) > limit:
+        return limit + 1
+    if not m:
+        return len(b)
+    peq = {}
+    for i, char in enumerate(a):
+        peq[char] = peq.get(char, 0) | 1 << i
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    for char in b:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    return min(score, limit + 1)
+
+
+class TrigramIndex:
+    """
+    Maps each trigram to the terms containing it, so the terms close to a word
+    can be found without comparing it to the whole vocabulary.
+
+    One edit changes at most 3 of a word's trigrams, so a term within `d` edits
+    of a word shares at least `len(trigrams(word)) - 3 * d` of them. Only the
+    terms passing that count (and the length bound) are compared with an edit
+    distance. Capping the edits by word length (`allowed_edits`) keeps that
+    count at one or more, so no term within reach is ever missed.
+    """
+
+    def __init__(self, terms=()):
+        self.terms = set()
+        self.grams = defaultdict(list)
+        self.add(terms)
+
+    def add(self, terms):
+        for term in terms:
+            self.terms.add(term)
+            for gram in trigrams(term):
+                self.grams[gram].append(term)
+
+    def candidates(self, word: str, max_edits: int):
+        grams = trigrams(word)
+        # Counter tallies an iterable in C, far faster than a Python loop over the lists
+        shared = Counter(itertools.chain.from_iterable(self.grams.get(gram, ()) for gram in grams))
+        needed = max(len(grams) - 3 * max_edits, 1)
+        return [
+            term for term, count in shared.items()
+            if count >= needed and abs(len(term) - len(word)) <= max_edits
+        ]
+
+    def similar(self, word: str, max_edits: int):
+        """
+        [(term, edits)] for the indexed terms within `max_edits` of `word` (fewer
+        for short words, see `allowed_edits`), closest first.
+        """
+        max_edits = min(max_edits, allowed_edits(word))
+        if not max_edits:
+            return [(word, 0)] if word in self.terms else []
+        matches = []
+        for term in self.candidates(word, max_edits):
+            edits = edit_distance(word, term, max_edits)
+            if edits <= max_edits:
+                matches.append((term, edits))
+        return sorted(matches, key=lambda match: (match[1], match[0]))
@@ -3,29 +3,91 @@ import uuid
 stop_words = {"needn't", 'hadn', 'here', 'can', 'shan', 'are', 'm', 'didn', 'our', 'wouldn', 'they', 'o', 'same', 'then', "hasn't", 'doing', 'my', "should've", 'against', 'an', 'when', 'if', "couldn't", 'its', 'any', 'at', 'hasn', "isn't", "wasn't", 'be', 'into', 'you', 'of', 'about', 'do', 'other', 'only', 'whom', 'doesn', 'to', 'as', 'won', "hadn't", 'isn', 'each', 'will', 'for', 'was', 'more', 'yourselves', 'before', 'had', 'than', 'or', 'nor', 'during', 'through', 'aren', 'that', "you're", "you'll", 'how', 'she', "you've", "you'd", 'after', 'been', 'too', "doesn't", "weren't", 'so', 't', "mightn't", 'this', 'needn', 'because', 'over', 'we', 'such', 'does', 'the', 'up', 'off', 'all', 'ma', 'again', "shouldn't", 'your', 'no', 're', 'haven', 's', 'while', 'in', 'themselves', 'his', 'herself', 'mustn', 'should', 'it', 'their', "didn't", 'from', "mustn't", 'him', 'under', 'those', "it's", 'a', 'once', 'll', 'has', 'having', 'ourselves', 'now', 'her', 'very', 'above', "she's", 'on', 'am', 've', 'few', "shan't", 'down', "don't", 'them', 'yours', 'yourself', 'did', 'with', 'until', 'not', 'y', 'himself', 'me', 'have', 'and', 'there', 'why', 'itself', "won't", 'd', 'both', "haven't", 'these', 'between', 'were', 'what', 'just', "wouldn't", 'couldn', 'ours', 'myself', "aren't", 'mightn', 'he', 'own', 'where', 'don', 'who', 'by', 'hers', 'further', 'wasn', 'weren', 'being', 'shouldn', 'theirs', 'ain', 'which', 'some', 'out', 'below', 'is', 'i', 'most', "that'll", 'but'}
 
 
+def iter_paras(chunks):
+    """
+    Generator version of split_paras over an iterable of text chunks.
+
+    Yields the same paragraphs as `split_paras(''.join(chunks))` while only keeping
+    the paragraph being read (and the last complete one) in memory. The last
+    non-blank paragraph is held back until more text arrives so the trailing
+    whitespace of the whole text can be stripped like `text.strip()` does.
+    """
+    parts = []
+    held = None
+    blanks = []
+
+    def pieces():
+        nonlocal parts
+        for chunk in chunks:
+            if not chunk:
+                continue
+            joined = parts and parts[-1].endswith('\n') and chunk.startswith('\n')
+            if '\n\n' not in chunk and not joined:
+                parts.append(chunk)
+                continue
+            *complete, rest = (''.join(parts) + chunk).split('\n\n')
+            parts = [rest]
+            yield from complete
+        yield ''.join(parts)
+
+    for piece in pieces():
+        if not piece.strip():
+            if held is not None:
+                blanks.append(piece)
+            continue
+        if held is None:
+            piece = piece.lstrip()
+        else:
+            yield held.replace('\n','')
+            for blank in blanks:
+                yield blank.replace('\n','')
+            blanks = []
+        held = piece
+
+    if held is not None:
+        yield held.rstrip().replace('\n','')
+
+
 def split_paras(text: str):
-    paras = []
-    for i in text.strip().split('\n\n'):
-        paras.append(i.replace('\n',''))
-    return paras
+    return list(iter_paras([text]))
 
 
 def remove_duplicates(array: list):
     return list(set(array))
 
 
+def index_paragraph(para: str):
+    """
+    Return the word count of `para` and {word: positions} for its non stop words,
+    without any normalization. Ingestion uses tasks.tokenizer; this stays as the
+    baseline of bench_ingest and bench_tokenizer (see tokenized_words()).
+
+    Positions are offsets into `para.split()`, ascending, so stop words still take
+    up a position and phrase queries can account for them. Words appear in the
+    order of their first occurrence.
+    """
+    all_words = para.split()
+    add_dict = {}
+    for position, word in enumerate(all_words):
+        if word not in stop_words:
+            add_dict.setdefault(word, []).append(position)
+    return len(all_words), add_dict
+
+
+def index_words(para: str):
+    length, indexed = index_paragraph(para)
+    return {word: positions[0] for word, positions in indexed.items()}
+
+
 def tokenized_words(text:str):
+    # the original tokenizer, kept as the baseline of bench_ingest and bench_tokenizer
     paras = split_paras(text)
     indexed_words = {}
     each_para = {}
     for para in paras:
         para_id = uuid.uuid4()
         each_para[para_id] = para   
-        words = remove_duplicates(para.split())
-        add_dict = {}
-        filtered_words = [word for word in words if word not in stop_words]
-        for idx,word in enumerate(filtered_words):
-            add_dict[word] = idx
+        add_dict = index_words(para)
         indexed_words[para_id] = [dict(sorted(add_dict.items(), key=lambda add_dict:add_dict[1]))]
 
     return each_para, indexed_words
@@ -0,0 +1,250 @@
+import codecs
+import itertools
+import json
+import uuid
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from monitoring.metrics import registry
+from monitoring.timing import phase, timed_iter
+from tasks.bitmaps import bitmap_cache
+from tasks.cache import MISSING, bump_corpus_version
+from tasks.dictionary import term_dictionaries
+from tasks.helpers import iter_paras, split_paras
+from tasks.models import CorpusStats, Paragraph
+from tasks.postings import get_postings_store
+from tasks.tokenizer import index_paragraph, tokenize_paragraphs
+
+
+DEFAULTS = {
+    # paragraphs buffered before they are written out
+    'BATCH_SIZE': 500,
+    # rows per INSERT statement issued by bulk_create
+    'INSERT_BATCH_SIZE': 1000,
+    # stream token rows with COPY ... FROM STDIN on PostgreSQL
+    'USE_COPY': True,
+    # bytes read from the request body at a time by the streaming upload
+    'STREAM_CHUNK_SIZE': 64 * 1024,
+    # submissions of at least this many characters (or bytes) are tokenized in a process pool
+    'PARALLEL_TOKENIZE_THRESHOLD': 1024 * 1024,
+    # processes in that pool, None for one per CPU; 0 or 1 always tokenizes in process
+    'TOKENIZE_WORKERS': None,
+    # characters of paragraphs sent to a pool process at a time
+    'TOKENIZE_CHUNK_SIZE': 256 * 1024,
+    # seconds a running job may go without committing a batch before another worker takes it over
+    'JOB_LEASE_SECONDS': 300,
+    # claims of a job before one that keeps losing its worker is marked failed
+    'JOB_MAX_ATTEMPTS': 3,
+}
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl')
+STREAM_CONTENT_TYPES = ('text/plain',) + NDJSON_CONTENT_TYPES
+
+
+def ingest_setting(name):
+    return getattr(settings, 'TASKS_INGEST', {}).get(name, DEFAULTS[name])
+
+
+def record_ingest(paragraphs: int, tokens: int):
+    registry.inc('ingest_paragraphs_total', paragraphs)
+    registry.inc('ingest_tokens_total', tokens)
+    registry.maybe_flush()
+
+
+class ParagraphIngestor:
+    """
+    Writes paragraphs and their tokenized words for one user in batches.
+
+    Each flush costs one bulk INSERT for the paragraphs and one bulk INSERT (or a
+    single COPY on PostgreSQL) for their postings, instead of one round trip per row.
+    Paragraphs go through bulk_create because their ids are needed for the token rows.
+    Large submissions are tokenized in a process pool while batches are written,
+    see feed(). `on_flush(ingestor)` runs inside each batch's transaction, after
+    the counts are updated, so whatever it records commits or rolls back with
+    the batch.
+    """
+
+    def __init__(self, user_id, batch_size=None, insert_batch_size=None, use_copy=None, on_flush=None,
+                 tokenize_workers=MISSING):
+        self.user_id = user_id
+        self.on_flush = on_flush
+        self.batch_size = batch_size or ingest_setting('BATCH_SIZE')
+        self.insert_batch_size = insert_batch_size or ingest_setting('INSERT_BATCH_SIZE')
+        if use_copy is None:
+            use_copy = ingest_setting('USE_COPY')
+        self.use_copy = use_copy and connection.vendor == 'postgresql'
+        self.store = get_postings_store()
+        if tokenize_workers is MISSING:
+            tokenize_workers = ingest_setting('TOKENIZE_WORKERS')
+        self.tokenize_workers = tokenize_workers
+        self.paragraphs = 0
+        self.tokens = 0
+        self.last_paragraph = None
+        self._pending = []
+
+    def add(self, para: str, indexed=None):
+        """Queue a paragraph, with its index_paragraph() result when already tokenized."""
+        self._pending.append((para, indexed))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def feed(self, paras, size=None):
+        """
+        Add every paragraph and flush. When the `size` of the submission reaches
+        TASKS_INGEST['PARALLEL_TOKENIZE_THRESHOLD'], the paragraphs are tokenized
+        in the shared process pool (see tasks.tokenizer.tokenize_paragraphs),
+        in order, ahead of the batch being written.
+        """
+        if size is not None and size >= ingest_setting('PARALLEL_TOKENIZE_THRESHOLD'):
+            tokenized = tokenize_paragraphs(
+                paras, self.tokenize_workers, chunk_size=ingest_setting('TOKENIZE_CHUNK_SIZE')
+            )
+            for para, indexed in timed_iter('tokenize', tokenized):
+                self.add(para, indexed)
+        else:
+            for para in paras:
+                self.add(para)
+        self.flush()
+        return self
+
+    def flush(self):
+        if not self._pending:
+            return
+        paragraphs = []
+        indexed = []
+        with phase('tokenize'):
+            for para, tokens in self._pending:
+                length, words = index_paragraph(para) if tokens is None else tokens
+                paragraphs.append(Paragraph(
+                    user_id=self.user_id, uuid=uuid.uuid4(), paragraphs=para, length=length,
+                    terms=self.store.paragraph_terms(words),
+                ))
+                indexed.append(words)
+        with transaction.atomic():
+            Paragraph.objects.bulk_create(paragraphs, batch_size=self.insert_batch_size)
+            if not connection.features.can_return_rows_from_bulk_insert:
+                ids = dict(Paragraph.objects.filter(
+                    uuid__in=[str(p.uuid) for p in paragraphs]
+                ).values_list('uuid', 'id'))
+                for paragraph in paragraphs:
+                    paragraph.id = ids[str(paragraph.uuid)]
+
+            self.store.write(self.user_id, paragraphs, indexed, self.insert_batch_size, self.use_copy)
+            bump_corpus_version(
+                self.user_id, paragraphs=len(paragraphs), length=sum(p.length for p in paragraphs)
+            )
+            # the stats row is locked by the bump until commit, so this is the version it set
+            version = CorpusStats.objects.filter(user_id=self.user_id).values_list('version', flat=True).get()
+            added = defaultdict(list)
+            for paragraph, words in zip(paragraphs, indexed):
+                for word in words:
+                    added[word.lower()].append(paragraph.id)
+            transaction.on_commit(partial(bitmap_cache.advance, self.user_id, version - 1, version, added))
+            transaction.on_commit(partial(term_dictionaries.advance, self.user_id, version - 1, version, added))
+            transaction.on_commit(partial(record_ingest, len(paragraphs), sum(len(words) for words in indexed)))
+
+            self.paragraphs += len(paragraphs)
+            self.tokens += sum(len(words) for words in indexed)
+            self.last_paragraph = paragraphs[-1]
+            self._pending = []
+            if self.on_flush:
+                self.on_flush(self)
+
+
+def ingest_text(user_id, text: str, **options):
+    """Split `text` into paragraphs and write them all in one transaction."""
+    ingestor = ParagraphIngestor(user_id, **options)
+    with transaction.atomic():
+        ingestor.feed(split_paras(text), size=len(text))
+    return ingestor
+
+
+def tokenize_text(text: str):
+    """
+    [(para, index_paragraph(para))] for the paragraphs of `text`, tokenized in the
+    shared process pool when the text reaches PARALLEL_TOKENIZE_THRESHOLD and in
+    the calling thread otherwise. Lets async views tokenize off the event loop
+    and write with ingest_tokenized().
+    """
+    workers = ingest_setting('TOKENIZE_WORKERS') if len(text) >= ingest_setting('PARALLEL_TOKENIZE_THRESHOLD') else 1
+    with phase('tokenize'):
+        return list(tokenize_paragraphs(split_paras(text), workers, chunk_size=ingest_setting('TOKENIZE_CHUNK_SIZE')))
+
+
+def ingest_tokenized(user_id, tokenized, **options):
+    """Write the (para, indexed) pairs of tokenize_text() in one transaction."""
+    ingestor = ParagraphIngestor(user_id, **options)
+    with transaction.atomic():
+        for para, indexed in tokenized:
+            ingestor.add(para, indexed)
+        ingestor.flush()
+    return ingestor
+
+
+def iter_decoded_chunks(stream, chunk_size: int):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def iter_lines(stream, chunk_size: int):
+    parts = []
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        *lines, rest = chunk.split(b'\n')
+        if lines:
+            lines[0] = b''.join(parts) + lines[0]
+            parts = []
+            yield from lines
+        parts.append(rest)
+    tail = b''.join(parts)
+    if tail:
+        yield tail
+
+
+def iter_ndjson_texts(stream, chunk_size: int):
+    for number, line in enumerate(iter_lines(stream, chunk_size), start=1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'line {number}: invalid JSON ({e.msg})')
+        if not isinstance(obj, dict) or not isinstance(obj.get('text'), str):
+            raise ValueError(f'line {number}: expected an object with a "text" string')
+        yield obj['text']
+
+
+def ingest_stream(user_id, stream, content_type: str, chunk_size=None, size=None, **options):
+    """
+    Ingest a request body without reading it into memory.
+
+    `text/plain` bodies are split into paragraphs as they are read. NDJSON bodies
+    carry one `{"text": ...}` object per line and each text is split on its own.
+    Paragraphs are flushed in batches of TASKS_INGEST['BATCH_SIZE'] inside one
+    transaction, so memory stays bounded by the batch and the largest paragraph.
+    Raises ValueError (or UnicodeDecodeError) for a malformed body, after which
+    nothing has been written. `size` is the length of the body when known, see
+    ParagraphIngestor.feed().
+    """
+    chunk_size = chunk_size or ingest_setting('STREAM_CHUNK_SIZE')
+    if content_type in NDJSON_CONTENT_TYPES:
+        paras = itertools.chain.from_iterable(
+            iter_paras([text]) for text in iter_ndjson_texts(stream, chunk_size)
+        )
+    else:
+        paras = iter_paras(iter_decoded_chunks(stream, chunk_size))
+
+    ingestor = ParagraphIngestor(user_id, **options)
+    with transaction.atomic():
+        ingestor.feed(paras, size=size)
+    return ingestor
@@ -0,0 +1,158 @@
+import itertools
+import logging
+import multiprocessing
+import signal
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections, connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from tasks.helpers import iter_paras
+from tasks.ingest import ParagraphIngestor, ingest_setting
+from tasks.models import IngestJob
+
+logger = logging.getLogger('tasks.jobs')
+
+# longest pause of a worker whose loop keeps failing (the database is down)
+MAX_BACKOFF = 60.0
+
+
+class LeaseLost(Exception):
+    """Another worker claimed the job after its lease lapsed."""
+
+
+def enqueue(user_id, text: str):
+    return IngestJob.objects.create(user_id=user_id, text=text)
+
+
+async def aenqueue(user_id, text: str):
+    return await IngestJob.objects.acreate(user_id=user_id, text=text)
+
+
+def claim_next_job():
+    """
+    Move the oldest pending job to `running` and return it, or None if the queue is empty.
+
+    Running jobs whose worker has not committed a batch for
+    TASKS_INGEST['JOB_LEASE_SECONDS'] (it was killed, or lost the database) are
+    claimed again and resume after the paragraphs already written, see run_job().
+    A job claimed JOB_MAX_ATTEMPTS times is marked failed instead.
+
+    The claim is a conditional UPDATE on the status, heartbeat and attempts the
+    worker read, so when several workers race for the same row exactly one of
+    them wins and the others move on to the next candidate.
+    """
+    while True:
+        now = timezone.now()
+        expired = now - timedelta(seconds=ingest_setting('JOB_LEASE_SECONDS'))
+        lapsed = Q(status=IngestJob.RUNNING, heartbeat_at__lt=expired)
+        job = (
+            IngestJob.objects.filter(Q(status=IngestJob.PENDING) | lapsed)
+            .order_by('id').values('id', 'status', 'heartbeat_at', 'attempts').first()
+        )
+        if job is None:
+            return None
+        candidate = IngestJob.objects.filter(**job)
+        if job['attempts'] >= ingest_setting('JOB_MAX_ATTEMPTS'):
+            candidate.update(
+                status=IngestJob.FAILED, finished_at=now,
+                error=f"the worker stopped responding {job['attempts']} times",
+            )
+            continue
+        changes = {'status': IngestJob.RUNNING, 'heartbeat_at': now, 'attempts': F('attempts') + 1}
+        if job['status'] == IngestJob.PENDING:
+            changes['started_at'] = now
+        if candidate.update(**changes):
+            return IngestJob.objects.get(id=job['id'])
+
+
+def run_job(job: IngestJob):
+    """
+    Ingest the text of a claimed job.
+
+    Every batch is committed on its own, in the same transaction as the job's
+    counts and heartbeat, so the status endpoint can report progress while the
+    job runs and the counts always match what was written. A job claimed again
+    after its worker died therefore resumes after its first `paragraphs`
+    paragraphs without writing any twice.
+
+    A failed job keeps the paragraphs written before the error and its counts
+    say how many. Submitting its text again would store those paragraphs a
+    second time; submit only the rest of the text.
+    """
+    current = IngestJob.objects.filter(id=job.id, status=IngestJob.RUNNING, attempts=job.attempts)
+
+    def report(ingestor):
+        renewed = current.update(paragraphs=ingestor.paragraphs, tokens=ingestor.tokens, heartbeat_at=timezone.now())
+        if not renewed:
+            # rolls this batch back, the worker that took over writes it
+            raise LeaseLost(job.id)
+
+    ingestor = ParagraphIngestor(job.user_id, on_flush=report)
+    ingestor.paragraphs, ingestor.tokens = job.paragraphs, job.tokens
+    try:
+        ingestor.feed(itertools.islice(iter_paras([job.text]), job.paragraphs, None), size=len(job.text))
+    except LeaseLost:
+        return False
+    except Exception:
+        current.update(status=IngestJob.FAILED, error=traceback.format_exc(limit=5), finished_at=timezone.now())
+        return False
+    # the text is no longer needed once it is stored as paragraphs
+    current.update(
+        status=IngestJob.DONE, text='', paragraphs=ingestor.paragraphs,
+        tokens=ingestor.tokens, finished_at=timezone.now()
+    )
+    return True
+
+
+def work(stop, poll_interval: float = 1.0, burst: bool = False):
+    """
+    Drain the job table until `stop` is set (or, with `burst`, until it is empty).
+
+    An error outside a job (the database went away while claiming, or while
+    marking a job failed) is logged and retried after a pause that doubles up to
+    MAX_BACKOFF, so a database blip does not end the worker. A job left running
+    is claimed again once its lease lapses.
+    """
+    # the parent process handles SIGINT and tells the workers to stop through `stop`
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    backoff = 0
+    try:
+        while not stop.is_set():
+            try:
+                close_old_connections()
+                job = claim_next_job()
+                if job is None:
+                    if burst:
+                        break
+                    stop.wait(poll_interval)
+                    continue
+                run_job(job)
+            except Exception:
+                backoff = min(max(2 * backoff, poll_interval, 0.1), MAX_BACKOFF)
+                logger.exception('ingest worker failed, retrying in %.1f seconds', backoff)
+                close_old_connections()
+                stop.wait(backoff)
+            else:
+                backoff = 0
+    finally:
+        connections.close_all()
+
+
+def start_workers(count: int, poll_interval: float = 1.0, burst: bool = False):
+    """
+    Fork `count` worker processes. Returns the processes and the event that stops them.
+    Database connections are closed first so no child inherits the parent's socket.
+    """
+    context = multiprocessing.get_context('fork')
+    stop = context.Event()
+    connections.close_all()
+    processes = [
+        context.Process(target=work, args=(stop, poll_interval, burst), name=f'ingest-worker-{number}')
+        for number in range(count)
+    ]
+    for process in processes:
+        process.start()
+    return processes, stop
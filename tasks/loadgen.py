@@ -0,0 +1,449 @@
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from tasks.benchmarks import latency_summary, make_paragraphs, make_queries
+
+
+SCENARIOS_DIR = Path(__file__).resolve().parent / 'scenarios'
+
+DEFAULTS = {
+    'users': {'count': 2, 'email': 'loadgen-{n}@example.com', 'password': 'loadgen-password'},
+    # paragraphs each user uploads before the first stage, so searches have something to find
+    'preload': {'requests': 5},
+    # what one `paras` POST sends, and the vocabulary the search queries are drawn from
+    'corpus': {'paragraphs': 20, 'words': 60, 'vocabulary': 5000, 'seed': 0},
+    # relative weights of the requests replayed during the stages
+    'mix': {'paras': 1, 'search': 8, 'tokenized': 1},
+    'page_size': 100,
+    # `sync` replays the DRF views, `async` their ASGI variants under /tasks/v1/async/
+    'api': 'sync',
+    # bytes per second each request body is sent at, to play slow clients on poor links; 0 sends it at once
+    'upload_bytes_per_sec': 0,
+    'connections': 32,
+    'timeout': 30,
+    'stages': [{'rps': 10, 'duration': 10}],
+    # a stage is saturated once it misses any of these
+    'slo': {'p99_ms': 1000, 'error_rate': 0.01, 'throughput': 0.95},
+}
+
+ENDPOINTS = {
+    'paras': ('POST', '/tasks/v1/paras/'),
+    'search': ('GET', '/tasks/v1/search/'),
+    'tokenized': ('GET', '/tasks/v1/tokenized/'),
+}
+ASYNC_ENDPOINTS = {
+    'paras': ('POST', '/tasks/v1/async/paras/'),
+    'search': ('GET', '/tasks/v1/async/search/'),
+    'tokenized': ('GET', '/tasks/v1/async/tokenized/'),
+}
+APIS = {'sync': ENDPOINTS, 'async': ASYNC_ENDPOINTS}
+LOGIN_PATH = '/authtoken/v1/login/'
+CREATE_USER_PATH = '/users/v1/create/'
+
+# upper bounds (ms) of the latency histogram buckets; slower requests land in the last, open one
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class ScenarioError(ValueError):
+    pass
+
+
+def load_scenario(name_or_path: str):
+    """
+    A scenario read from a JSON file (or one of the files shipped in
+    tasks/scenarios, by name), with every missing key filled from DEFAULTS.
+    """
+    path = Path(name_or_path)
+    if not path.exists():
+        path = SCENARIOS_DIR / f'{name_or_path}.json'
+    try:
+        with open(path) as f:
+            options = json.load(f)
+    except FileNotFoundError:
+        shipped = ', '.join(sorted(p.stem for p in SCENARIOS_DIR.glob('*.json')))
+        raise ScenarioError(f'no scenario file {name_or_path!r} (shipped scenarios: {shipped})')
+    except json.JSONDecodeError as e:
+        raise ScenarioError(f'{path}: {e}')
+    scenario = {'name': path.stem}
+    for key, default in DEFAULTS.items():
+        value = options.get(key, default)
+        scenario[key] = {**default, **value} if isinstance(default, dict) and key != 'mix' else value
+    scenario.update((key, value) for key, value in options.items() if key not in scenario)
+    validate_scenario(scenario)
+    return scenario
+
+
+def validate_scenario(scenario):
+    unknown = set(scenario['mix']) - set(ENDPOINTS)
+    if unknown:
+        raise ScenarioError(f"unknown endpoints in mix: {', '.join(sorted(unknown))} "
+                            f"(expected {', '.join(ENDPOINTS)})")
+    if not any(weight > 0 for weight in scenario['mix'].values()):
+        raise ScenarioError('mix needs at least one endpoint with a positive weight')
+    if not scenario['stages']:
+        raise ScenarioError('a scenario needs at least one stage')
+    for stage in scenario['stages']:
+        if stage.get('rps', 0) <= 0 or stage.get('duration', 0) <= 0:
+            raise ScenarioError(f'stages need a positive rps and duration, got {stage}')
+    if scenario['api'] not in APIS:
+        raise ScenarioError(f"unknown api {scenario['api']!r} (expected {', '.join(APIS)})")
+    if scenario['upload_bytes_per_sec'] < 0:
+        raise ScenarioError('upload_bytes_per_sec cannot be negative')
+    if scenario['users']['count'] < 1:
+        raise ScenarioError('a scenario needs at least one user')
+
+
+class HTTPError(Exception):
+    pass
+
+
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    def close(self):
+        self.writer.close()
+
+
+class HTTPClient:
+    """
+    A minimal HTTP/1.1 client over asyncio streams, keeping up to `connections`
+    keep-alive connections to one server. Requests beyond that wait for a free
+    connection, and that wait counts towards their latency.
+
+    With an `upload_rate` (bytes per second) request bodies trickle out in
+    tenth-of-a-second slices, like a client on a slow link, holding the server's
+    connection (and, under WSGI, its thread) for the whole upload.
+    """
+
+    def __init__(self, base_url: str, connections: int, timeout: float, upload_rate: float = 0):
+        url = urlsplit(base_url)
+        if url.scheme != 'http':
+            raise ScenarioError(f'only http:// servers are supported, not {base_url!r}')
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.prefix = url.path.rstrip('/')
+        self.timeout = timeout
+        self.upload_rate = upload_rate
+        self._idle = []
+        self._slots = asyncio.Semaphore(connections)
+
+    async def request(self, method: str, path: str, headers=None, body: bytes = b''):
+        """(status, body) of one request, reading the whole (possibly chunked or streamed) body."""
+        async with self._slots:
+            return await asyncio.wait_for(self._request(method, path, headers or {}, body), self.timeout)
+
+    async def json(self, method: str, path: str, data=None, headers=None):
+        headers = {'Content-Type': 'application/json', **(headers or {})}
+        body = json.dumps(data).encode() if data is not None else b''
+        status, content = await self.request(method, path, headers, body)
+        try:
+            return status, json.loads(content) if content else None
+        except ValueError:
+            return status, None
+
+    async def _request(self, method, path, headers, body):
+        while True:
+            connection = self._idle.pop() if self._idle else await self._connect()
+            try:
+                return await self._send(connection, method, path, headers, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                connection.close()
+                # the server may close an idle keep-alive connection, so retry those once on a new one
+                if not connection.reused:
+                    raise
+            except BaseException:
+                connection.close()
+                raise
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        return Connection(reader, writer)
+
+    async def _send(self, connection, method, path, headers, body):
+        lines = [f'{method} {self.prefix}{path} HTTP/1.1', f'Host: {self.host}:{self.port}',
+                 f'Content-Length: {len(body)}']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        connection.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await self._write_body(connection.writer, body)
+
+        reader = connection.reader
+        status_line = await reader.readuntil(b'\r\n')
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            raise HTTPError(f'malformed status line {status_line!r}')
+        response_headers = {}
+        while True:
+            line = await reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        keep_alive = response_headers.get('connection', '').lower() != 'close'
+        if 'chunked' in response_headers.get('transfer-encoding', '').lower():
+            content = await self._read_chunked(reader)
+        elif 'content-length' in response_headers:
+            content = await reader.readexactly(int(response_headers['content-length']))
+        else:
+            # a streamed response without a length ends when the server closes the connection
+            content = await reader.read()
+            keep_alive = False
+
+        if keep_alive:
+            connection.reused = True
+            self._idle.append(connection)
+        else:
+            connection.close()
+        return status, content
+
+    async def _write_body(self, writer, body):
+        if not self.upload_rate:
+            writer.write(body)
+            await writer.drain()
+            return
+        size = max(1, int(self.upload_rate / 10))
+        for offset in range(0, len(body), size):
+            if offset:
+                await asyncio.sleep(0.1)
+            writer.write(body[offset:offset + size])
+            await writer.drain()
+
+    async def _read_chunked(self, reader):
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            if not size:
+                # trailers, if any, up to the blank line
+                while await reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+class Histogram:
+    """Request counts per BUCKETS_MS latency bucket."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, latency_ms: float):
+        for i, bound in enumerate(BUCKETS_MS):
+            if latency_ms <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def as_dict(self):
+        labels = [f'<={bound}ms' for bound in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}ms']
+        return {label: count for label, count in zip(labels, self.counts) if count}
+
+
+class StageResult:
+    """The outcome of every request sent during one stage, grouped by endpoint."""
+
+    def __init__(self, rps: float, duration: float):
+        self.rps = rps
+        self.duration = duration
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.elapsed = 0.0
+        self.max_in_flight = 0
+
+    def add(self, endpoint: str, latency_ms: float, status):
+        self.latencies[endpoint].append(latency_ms)
+        self.statuses[endpoint][str(status)] += 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[endpoint] += 1
+
+    def report(self, slo):
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            histogram = Histogram()
+            for latency in latencies:
+                histogram.add(latency)
+            endpoints[endpoint] = {
+                'requests': len(latencies),
+                'errors': self.errors[endpoint],
+                'error_rate': round(self.errors[endpoint] / len(latencies), 4),
+                'statuses': dict(self.statuses[endpoint]),
+                **latency_summary(latencies),
+                'histogram': histogram.as_dict(),
+            }
+        latencies = [latency for values in self.latencies.values() for latency in values]
+        requests = len(latencies)
+        errors = sum(self.errors.values())
+        achieved = requests / self.elapsed if self.elapsed else 0.0
+        overall = {
+            'requests': requests,
+            'errors': errors,
+            'error_rate': round(errors / requests, 4) if requests else 0.0,
+            **latency_summary(latencies),
+        }
+        reasons = []
+        if achieved < slo['throughput'] * self.rps:
+            reasons.append(f"achieved {achieved:.1f} of {self.rps} requests/sec")
+        if overall['p99_ms'] > slo['p99_ms']:
+            reasons.append(f"p99 {overall['p99_ms']}ms over {slo['p99_ms']}ms")
+        if overall['error_rate'] > slo['error_rate']:
+            reasons.append(f"error rate {overall['error_rate']} over {slo['error_rate']}")
+        return {
+            'target_rps': self.rps,
+            'achieved_rps': round(achieved, 1),
+            'duration': self.duration,
+            'max_in_flight': self.max_in_flight,
+            'saturated': bool(reasons),
+            'saturation_reasons': reasons,
+            **overall,
+            'endpoints': endpoints,
+        }
+
+
+class LoadGenerator:
+    """
+    Replays a scenario against a running server: logs its users in (creating
+    them on first use), preloads their corpora, then sends the weighted mix of
+    requests stage by stage.
+
+    Arrivals are open loop: request i of a stage is due i / rps seconds after it
+    starts whether or not earlier requests have come back, and its latency is
+    measured from when it was due. A server that falls behind therefore shows up
+    as growing latency and a missed throughput target instead of silently
+    slowing the generator down.
+    """
+
+    def __init__(self, scenario, base_url: str, seed: int = 0):
+        self.scenario = scenario
+        self.base_url = base_url
+        self.rng = random.Random(seed)
+        self.corpus_seed = seed
+        self.client = None
+        self.tokens = []
+        corpus = scenario['corpus']
+        self.queries = list(make_queries(corpus['vocabulary'], corpus['seed']).values())
+
+    async def run(self):
+        self.client = HTTPClient(
+            self.base_url, self.scenario['connections'], self.scenario['timeout'], self.scenario['upload_bytes_per_sec']
+        )
+        try:
+            await self.login()
+            for _ in range(self.scenario['preload']['requests']):
+                await asyncio.gather(*(self.send('paras', token) for token in self.tokens))
+            stages = [await self.run_stage(stage['rps'], stage['duration']) for stage in self.scenario['stages']]
+        finally:
+            await self.client.close()
+        return self.report(stages)
+
+    async def login(self):
+        users = self.scenario['users']
+        for n in range(users['count']):
+            credentials = {'email': users['email'].format(n=n), 'password': users['password']}
+            status, data = await self.client.json('POST', LOGIN_PATH, credentials)
+            if status == 401:
+                status, data = await self.client.json('POST', CREATE_USER_PATH, {
+                    **credentials, 'confirm_password': users['password'], 'name': 'loadgen', 'dob': '2000-01-01',
+                })
+                if status != 201:
+                    raise HTTPError(f"could not create {credentials['email']}: {status} {data}")
+                status, data = await self.client.json('POST', LOGIN_PATH, credentials)
+            if status != 200:
+                raise HTTPError(f"could not log in as {credentials['email']}: {status} {data}")
+            self.tokens.append(data['access'])
+
+    def paragraphs(self):
+        corpus = self.scenario['corpus']
+        self.corpus_seed += 1
+        return '\n\n'.join(make_paragraphs(
+            corpus['paragraphs'], corpus['words'], corpus['vocabulary'], self.corpus_seed,
+            vocabulary_seed=corpus['seed'],
+        ))
+
+    async def send(self, endpoint: str, token: str):
+        method, path = APIS[self.scenario['api']][endpoint]
+        headers = {'Authorization': f'Bearer {token}'}
+        if endpoint == 'paras':
+            status, content = await self.client.json(method, path, {'text': self.paragraphs()}, headers)
+            return status
+        if endpoint == 'search':
+            path = f"{path}?{urlencode({'q': self.rng.choice(self.queries)})}"
+        else:
+            path = f"{path}?{urlencode({'page_size': self.scenario['page_size']})}"
+        status, content = await self.client.request(method, path, headers)
+        return status
+
+    async def run_stage(self, rps: float, duration: float):
+        result = StageResult(rps, duration)
+        endpoints = list(self.scenario['mix'])
+        weights = [self.scenario['mix'][endpoint] for endpoint in endpoints]
+        loop = asyncio.get_running_loop()
+        in_flight = 0
+
+        async def timed(endpoint, token, due):
+            nonlocal in_flight
+            in_flight += 1
+            result.max_in_flight = max(result.max_in_flight, in_flight)
+            try:
+                status = await self.send(endpoint, token)
+            except asyncio.TimeoutError:
+                status = 'timeout'
+            except (OSError, HTTPError, asyncio.IncompleteReadError) as e:
+                status = type(e).__name__
+            finally:
+                in_flight -= 1
+            result.add(endpoint, (loop.time() - due) * 1000, status)
+
+        start = loop.time()
+        tasks = []
+        for i in range(max(1, round(rps * duration))):
+            due = start + i / rps
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            endpoint = self.rng.choices(endpoints, weights)[0]
+            tasks.append(asyncio.ensure_future(timed(endpoint, self.rng.choice(self.tokens), due)))
+        await asyncio.gather(*tasks)
+        # a stage that keeps up takes its duration; one that falls behind takes longer
+        result.elapsed = max(duration, loop.time() - start)
+        return result
+
+    def report(self, stages):
+        slo = self.scenario['slo']
+        stages = [stage.report(slo) for stage in stages]
+        saturated = next((i for i, stage in enumerate(stages) if stage['saturated']), None)
+        return {
+            'scenario': self.scenario['name'],
+            'server': self.base_url,
+            'api': self.scenario['api'],
+            'users': self.scenario['users']['count'],
+            'mix': self.scenario['mix'],
+            'slo': slo,
+            # the first stage that missed the SLO, and the highest rate sustained before it
+            'saturation': None if saturated is None else {
+                'target_rps': stages[saturated]['target_rps'],
+                'reasons': stages[saturated]['saturation_reasons'],
+                'last_sustained_rps': stages[saturated - 1]['target_rps'] if saturated else None,
+            },
+            'stages': stages,
+        }
+
+
+def run_load(scenario, base_url: str, seed: int = 0):
+    started = time.perf_counter()
+    report = asyncio.run(LoadGenerator(scenario, base_url, seed).run())
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
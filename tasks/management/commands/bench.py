@@ -0,0 +1,139 @@
+import json
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from authtoken.serializers import MyTokenObtainPairSerializer
+from tasks.benchmarks import benchmark_database, latency_summary, make_paragraphs, make_queries
+from tasks.cache import search_cache
+from users.models import CustomUser
+
+
+class Recorder:
+    """Latency, status and query count of every request, grouped by path name."""
+
+    def __init__(self, client: Client, connection):
+        self.client = client
+        self.connection = connection
+        self.requests = defaultdict(list)
+
+    def request(self, name: str, method: str, url: str, **kwargs):
+        with CaptureQueriesContext(self.connection) as queries:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(url, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        self.requests[name].append((elapsed, response.status_code, len(queries.captured_queries)))
+        return response
+
+    def summary(self, name: str, **extra):
+        requests = self.requests[name]
+        seconds = sum(elapsed for elapsed, status, queries in requests)
+        queries = [count for elapsed, status, count in requests]
+        return {
+            'path': name,
+            'requests': len(requests),
+            'errors': sum(1 for elapsed, status, count in requests if status >= 400),
+            'seconds': round(seconds, 4),
+            'requests_per_sec': round(len(requests) / seconds, 1) if seconds else None,
+            **latency_summary([elapsed * 1000 for elapsed, status, count in requests]),
+            'queries_mean': round(sum(queries) / len(queries), 2) if queries else 0,
+            'queries_max': max(queries, default=0),
+            **extra,
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate reproducible synthetic corpora and drive the ingest, list, tokenized and search '
+        'endpoints through the Django test client; prints throughput, p50/p95/p99 latency and '
+        'query counts per path as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2)
+        parser.add_argument('--paragraphs', type=int, default=1000, help='paragraphs per user')
+        parser.add_argument('--words', type=int, default=60, help='words per paragraph')
+        parser.add_argument('--vocabulary', type=int, default=5000)
+        parser.add_argument('--paragraphs-per-request', type=int, default=100,
+                            help='paragraphs posted in one ingest request')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--pages', type=int, default=10, help='list and tokenized pages read per user')
+        parser.add_argument('--searches', type=int, default=50, help='search requests per user')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        # private in-memory caches, so the benchmark can clear them and never touches shared ones
+        bench_caches = {
+            alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'bench-{alias}'}
+            for alias in settings.CACHES
+        }
+        setup_test_environment()
+        try:
+            with override_settings(CACHES=bench_caches), benchmark_database(options['database']) as connection:
+                report = self.run(connection, options)
+        finally:
+            teardown_test_environment()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, connection, options):
+        recorder = Recorder(Client(), connection)
+        users = []
+        for number in range(options['users']):
+            user = CustomUser.objects.create_user(
+                email=f'bench-{number}@example.com', password=None, name='bench', dob='2000-01-01'
+            )
+            token = MyTokenObtainPairSerializer.get_token(user)
+            users.append((number, {'HTTP_AUTHORIZATION': f'Bearer {token.access_token}'}))
+
+        # every user gets its own corpus over the same vocabulary, reproducible from the seed
+        ingested = 0
+        for number, auth in users:
+            paragraphs = list(make_paragraphs(
+                options['paragraphs'], options['words'], options['vocabulary'], options['seed'] + number,
+                vocabulary_seed=options['seed'],
+            ))
+            step = options['paragraphs_per_request']
+            for i in range(0, len(paragraphs), step):
+                text = '\n\n'.join(paragraphs[i:i + step])
+                ingested += len(text.encode())
+                recorder.request('ingest', 'post', reverse('paras'), data={'text': text},
+                                 content_type='application/json', **auth)
+
+        for name in ('paras', 'tokenized'):
+            for number, auth in users:
+                url = f"{reverse(name)}?page_size={options['page_size']}"
+                for _ in range(options['pages']):
+                    data = recorder.request(name, 'get', url, **auth).json()
+                    url = data.get('next')
+                    if not url:
+                        break
+
+        queries = make_queries(options['vocabulary'], options['seed'])
+        kinds = list(queries.items())
+        for number, auth in users:
+            for i in range(options['searches']):
+                kind, q = kinds[i % len(kinds)]
+                # measure the search itself, not the result cache in front of it
+                search_cache.cache.clear()
+                recorder.request(f'search ({kind})', 'get', reverse('paras-search'), data={'q': q}, **auth)
+
+        ingest = recorder.summary('ingest')
+        ingest['megabytes_per_sec'] = round(ingested / 1e6 / ingest['seconds'], 3) if ingest['seconds'] else None
+        return {
+            'vendor': connection.vendor,
+            'options': {key: options[key] for key in (
+                'users', 'paragraphs', 'words', 'vocabulary', 'paragraphs_per_request',
+                'page_size', 'pages', 'searches', 'seed',
+            )},
+            'results': [ingest, recorder.summary('paras'), recorder.summary('tokenized')] + [
+                recorder.summary(f'search ({kind})') for kind in queries
+            ],
+        }
@@ -0,0 +1,67 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tasks.benchmarks import benchmark_database, make_text, timed
+from tasks.helpers import split_paras, tokenized_words
+from tasks.ingest import ParagraphIngestor
+from tasks.models import Paragraph, Term, TokenizedWords
+from users.models import CustomUser
+
+
+def per_row_ingest(user, text):
+    """The original ParagraphSerializer.create path: one INSERT per row, autocommit."""
+    each_para, indexed_words = tokenized_words(text)
+    rows = 0
+    for para_id, para_text in each_para.items():
+        paragraph = Paragraph.objects.create(user=user, uuid=para_id, paragraphs=para_text)
+        rows += 1
+        for word_dict in indexed_words[para_id]:
+            for word, idx in word_dict.items():
+                term, created = Term.objects.get_or_create(word=word)
+                TokenizedWords.objects.create(user=user, uuid=paragraph, term=term, indexes=idx)
+                rows += 1
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Compare paragraph ingestion throughput (rows/sec) of the per-row and bulk paths.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paragraphs', type=int, default=200)
+        parser.add_argument('--words', type=int, default=60, help='words per paragraph')
+        parser.add_argument('--vocabulary', type=int, default=5000)
+        parser.add_argument('--batch-size', type=int, nargs='+', default=[100, 500, 1000],
+                            help='paragraphs per flush to try for the bulk paths')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        text = make_text(options['paragraphs'], options['words'], options['vocabulary'], options['seed'])
+        results = []
+        with benchmark_database(options['database']) as connection:
+            runs = [('per-row', None, False)]
+            for batch_size in options['batch_size']:
+                runs.append(('bulk_create', batch_size, False))
+                if connection.vendor == 'postgresql':
+                    runs.append(('copy', batch_size, True))
+
+            for number, (path, batch_size, use_copy) in enumerate(runs):
+                user = CustomUser.objects.create_user(
+                    email=f'bench-ingest-{number}@example.com', password=None, name='bench', dob='2000-01-01'
+                )
+                result = {'path': path, 'batch_size': batch_size, 'vendor': connection.vendor}
+                with timed(result):
+                    if path == 'per-row':
+                        rows = per_row_ingest(user, text)
+                    else:
+                        ingestor = ParagraphIngestor(user.pk, batch_size=batch_size, use_copy=use_copy)
+                        with transaction.atomic():
+                            ingestor.feed(split_paras(text))
+                        rows = ingestor.paragraphs + ingestor.tokens
+                result['rows'] = rows
+                result['rows_per_sec'] = round(rows / result['seconds'], 1)
+                results.append(result)
+
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,69 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks.backends import load_search_backend
+from tasks.benchmarks import benchmark_database, make_queries, make_text
+from tasks.cache import get_corpus_stats
+from tasks.ingest import ingest_text
+from tasks.query import parse_query
+from users.models import CustomUser
+
+
+BACKENDS = {
+    'postings': 'tasks.backends.postings.PostingsSearchBackend',
+    'postgres': 'tasks.backends.postgres.PostgresSearchBackend',
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare search latency (ms) of the search backends over the same generated corpus.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paragraphs', type=int, default=5000)
+        parser.add_argument('--words', type=int, default=60, help='words per paragraph')
+        parser.add_argument('--vocabulary', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--backend', nargs='+', choices=sorted(BACKENDS),
+                            help='defaults to every backend the database supports')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        queries = make_queries(options['vocabulary'], options['seed'])
+        results = []
+        with benchmark_database(options['database']) as connection:
+            backends = options['backend'] or [
+                name for name in BACKENDS if name != 'postgres' or connection.vendor == 'postgresql'
+            ]
+            user = CustomUser.objects.create_user(
+                email='bench-search@example.com', password=None, name='bench', dob='2000-01-01'
+            )
+            ingest_text(user.pk, make_text(
+                options['paragraphs'], options['words'], options['vocabulary'], options['seed']
+            ))
+            stats = get_corpus_stats(user.pk)
+
+            for name in backends:
+                backend = load_search_backend(BACKENDS[name])
+                for kind, text in queries.items():
+                    query = parse_query(text)
+                    timings = []
+                    for _ in range(options['repeat']):
+                        start = time.perf_counter()
+                        hits = backend.search(user.pk, query, stats)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    results.append({
+                        'backend': name,
+                        'vendor': connection.vendor,
+                        'query': kind,
+                        'q': text,
+                        'hits': len(hits),
+                        'first_ms': round(timings[0], 3),
+                        'median_ms': round(statistics.median(timings), 3),
+                        'max_ms': round(max(timings), 3),
+                    })
+
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,100 @@
+import json
+import os
+import random
+
+from django.core.management.base import BaseCommand
+
+from tasks.benchmarks import make_paragraphs, timed
+from tasks.helpers import split_paras, tokenized_words
+from tasks.tokenizer import Tokenizer, tokenize_paragraphs
+
+
+CONFIGURATIONS = {
+    'plain': {},
+    'casefold': {'casefold': True},
+    'casefold+punctuation': {'casefold': True, 'strip_punctuation': True},
+    'casefold+punctuation+nfkc': {'casefold': True, 'strip_punctuation': True, 'nfkc': True},
+}
+
+
+def make_noisy_text(paragraphs: int, words_per_paragraph: int, vocabulary: int, seed: int = 0):
+    """Generated paragraphs with some words capitalized or followed by punctuation, like prose."""
+    rng = random.Random(seed)
+    out = []
+    for para in make_paragraphs(paragraphs, words_per_paragraph, vocabulary, seed):
+        words = para.split()
+        for i, word in enumerate(words):
+            roll = rng.random()
+            if roll < 0.1:
+                words[i] = word.capitalize()
+            elif roll > 0.9:
+                words[i] = word + rng.choice(',.;:!?')
+        out.append(' '.join(words))
+    return '\n\n'.join(out)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare tokenizer throughput (MB/s) and vocabulary size of tokenized_words and tasks.tokenizer, '
+        'in process and in a process pool of each --workers size.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paragraphs', type=int, default=2000)
+        parser.add_argument('--words', type=int, default=60, help='words per paragraph')
+        parser.add_argument('--vocabulary', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=3, help='best of this many runs is reported')
+        parser.add_argument('--workers', type=int, nargs='+', default=sorted({2, os.cpu_count() or 1}),
+                            help='process pool sizes to try, with the TASKS_TOKENIZER settings')
+        parser.add_argument('--chunk-size', type=int, default=256 * 1024,
+                            help='characters of paragraphs sent to a pool process at a time')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        text = make_noisy_text(options['paragraphs'], options['words'], options['vocabulary'], options['seed'])
+        megabytes = len(text.encode()) / 1e6
+
+        def legacy():
+            each_para, indexed_words = tokenized_words(text)
+            return {word for words in indexed_words.values() for word in words[0]}
+
+        def tokenizer(tokenize):
+            terms = set()
+            for para in split_paras(text):
+                length, words = tokenize(para)
+                terms.update(words)
+            return terms
+
+        def pool(workers):
+            terms = set()
+            for para, (length, words) in tokenize_paragraphs(split_paras(text), workers, options['chunk_size']):
+                terms.update(words)
+            return terms
+
+        runs = [('tokenized_words', legacy)] + [
+            (name, lambda tokenize=Tokenizer(**config): tokenizer(tokenize))
+            for name, config in CONFIGURATIONS.items()
+        ]
+        for workers in options['workers']:
+            if workers > 1:
+                # start the pool processes outside the timed runs
+                pool(workers)
+                runs.append((f'pool x{workers}', lambda workers=workers: pool(workers)))
+        results = []
+        for name, run in runs:
+            timings = []
+            for _ in range(options['repeat']):
+                result = {}
+                with timed(result):
+                    terms = run()
+                timings.append(result['seconds'])
+            seconds = min(timings)
+            results.append({
+                'tokenizer': name,
+                'megabytes': round(megabytes, 3),
+                'seconds': round(seconds, 4),
+                'mb_per_sec': round(megabytes / seconds, 1),
+                'unique_terms': len(terms),
+            })
+
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,29 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from tasks.jobs import start_workers
+
+
+class Command(BaseCommand):
+    help = 'Start a pool of local worker processes that drain queued paragraph ingestion jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='seconds an idle worker waits before checking the queue again')
+        parser.add_argument('--burst', action='store_true',
+                            help='exit once the queue is empty instead of waiting for new jobs')
+
+    def handle(self, *args, **options):
+        processes, stop = start_workers(options['workers'], options['poll_interval'], options['burst'])
+        self.stdout.write(f"started {len(processes)} ingest workers")
+
+        def shutdown(signum, frame):
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        for process in processes:
+            process.join()
+        self.stdout.write("ingest workers stopped")
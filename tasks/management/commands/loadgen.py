@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.loadgen import APIS, HTTPError, ScenarioError, load_scenario, run_load
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a scenario of paras POSTs, search GETs and tokenized GETs against a running server '
+        'at the target request rates of its stages; prints latency histograms, error rates and the '
+        'saturation point per endpoint and stage as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', help='a scenario JSON file, or the name of one in tasks/scenarios')
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='base URL of the server under load')
+        parser.add_argument(
+            '--api', choices=list(APIS),
+            help="replay the DRF views (sync) or their ASGI variants (async) instead of the scenario's api",
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='also write the report to this file')
+
+    def handle(self, *args, **options):
+        try:
+            scenario = load_scenario(options['scenario'])
+            if options['api']:
+                scenario['api'] = options['api']
+            report = run_load(scenario, options['url'], options['seed'])
+        except ScenarioError as e:
+            raise CommandError(str(e))
+        except (OSError, HTTPError) as e:
+            raise CommandError(f"cannot load {options['url']}: {e}")
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tasks.cache import bump_corpus_version
+from tasks.models import CorpusStats, PostingBlock, TokenizedWords
+from tasks.postings import get_postings_store, postings_setting
+
+
+class Command(BaseCommand):
+    help = (
+        "Move TokenizedWords rows into packed PostingBlocks and merge small blocks, "
+        "one user per transaction. Requires TASKS_POSTINGS['FORMAT'] = 'packed'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users',
+                            help='only pack this user id (repeatable); default every user with postings')
+        parser.add_argument('--block-size', type=int, default=None,
+                            help="paragraphs per block (default TASKS_POSTINGS['BLOCK_SIZE'])")
+
+    def handle(self, *args, **options):
+        store = get_postings_store()
+        if not store.packed:
+            raise CommandError("set TASKS_POSTINGS['FORMAT'] = 'packed' first, so new uploads are packed too")
+        block_size = options['block_size'] or postings_setting('BLOCK_SIZE')
+        if block_size < 1:
+            raise CommandError('--block-size must be a positive integer')
+
+        users = options['users']
+        if not users:
+            users = sorted(
+                set(TokenizedWords.objects.values_list('user_id', flat=True).distinct())
+                | set(PostingBlock.objects.values_list('user_id', flat=True).distinct())
+            )
+        for user_id in users:
+            with transaction.atomic():
+                # ingest takes this lock before it commits, so its blocks are either read here or written after
+                list(CorpusStats.objects.select_for_update().filter(user_id=user_id))
+                rows, read, written = store.pack(user_id, block_size)
+                bump_corpus_version(user_id)
+            self.stdout.write(f'user {user_id}: {rows} rows and {read} blocks packed into {written} blocks')
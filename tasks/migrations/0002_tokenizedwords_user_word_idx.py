@@ -0,0 +1,25 @@
+# Generated by Django 5.1 on 2026-10-18 07:53
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+from tasks.operations import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name='tokenizedwords',
+            index=models.Index(models.F('user'), django.db.models.functions.text.Lower('words'), models.F('uuid'), name='tokens_user_word_idx'),
+        ),
+    ]
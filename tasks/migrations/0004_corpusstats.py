@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-18 08:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_ingestjob'),
+        ('users', '0004_alter_customuser_is_staff'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorpusStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1 on 2026-10-18 08:02
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_statistics(apps, schema_editor):
+    """Fill in lengths, word frequencies and per-user totals for paragraphs stored before ranking."""
+    Paragraph = apps.get_model('tasks', 'Paragraph')
+    TokenizedWords = apps.get_model('tasks', 'TokenizedWords')
+    CorpusStats = apps.get_model('tasks', 'CorpusStats')
+
+    paragraphs = Paragraph.objects.only('id', 'paragraphs').order_by('id').iterator(chunk_size=1000)
+    for paragraph in paragraphs:
+        words = paragraph.paragraphs.split()
+        frequencies = Counter(words)
+        Paragraph.objects.filter(id=paragraph.id).update(length=len(words))
+        tokens = list(TokenizedWords.objects.filter(uuid_id=paragraph.id).only('id', 'words'))
+        for token in tokens:
+            token.frequency = frequencies.get(token.words, 1)
+        TokenizedWords.objects.bulk_update(tokens, ['frequency'], batch_size=1000)
+
+    totals = Paragraph.objects.values('user_id').annotate(count=Count('id'), length=Sum('length'))
+    for total in totals:
+        CorpusStats.objects.update_or_create(
+            user_id=total['user_id'],
+            defaults={'paragraphs': total['count'], 'total_length': total['length'] or 0},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_corpusstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='corpusstats',
+            name='paragraphs',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='corpusstats',
+            name='total_length',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='paragraph',
+            name='length',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tokenizedwords',
+            name='frequency',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.RunPython(backfill_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1 on 2026-10-18 08:05
+
+from django.db import migrations, models
+
+
+# Frozen copies of tasks.helpers.index_paragraph and tasks.encoding.encode_positions
+# as they were when this migration was written, so the backfill never changes with
+# the app code.
+
+stop_words = {"needn't", 'hadn', 'here', 'can', 'shan', 'are', 'm', 'didn', 'our', 'wouldn', 'they', 'o', 'same', 'then', "hasn't", 'doing', 'my', "should've", 'against', 'an', 'when', 'if', "couldn't", 'its', 'any', 'at', 'hasn', "isn't", "wasn't", 'be', 'into', 'you', 'of', 'about', 'do', 'other', 'only', 'whom', 'doesn', 'to', 'as', 'won', "hadn't", 'isn', 'each', 'will', 'for', 'was', 'more', 'yourselves', 'before', 'had', 'than', 'or', 'nor', 'during', 'through', 'aren', 'that', "you're", "you'll", 'how', 'she', "you've", "you'd", 'after', 'been', 'too', "doesn't", "weren't", 'so', 't', "mightn't", 'this', 'needn', 'because', 'over', 'we', 'such', 'does', 'the', 'up', 'off', 'all', 'ma', 'again', "shouldn't", 'your', 'no', 're', 'haven', 's', 'while', 'in', 'themselves', 'his', 'herself', 'mustn', 'should', 'it', 'their', "didn't", 'from', "mustn't", 'him', 'under', 'those', "it's", 'a', 'once', 'll', 'has', 'having', 'ourselves', 'now', 'her', 'very', 'above', "she's", 'on', 'am', 've', 'few', "shan't", 'down', "don't", 'them', 'yours', 'yourself', 'did', 'with', 'until', 'not', 'y', 'himself', 'me', 'have', 'and', 'there', 'why', 'itself', "won't", 'd', 'both', "haven't", 'these', 'between', 'were', 'what', 'just', "wouldn't", 'couldn', 'ours', 'myself', "aren't", 'mightn', 'he', 'own', 'where', 'don', 'who', 'by', 'hers', 'further', 'wasn', 'weren', 'being', 'shouldn', 'theirs', 'ain', 'which', 'some', 'out', 'below', 'is', 'i', 'most', "that'll", 'but'}
+
+
+def index_paragraph(para: str):
+    all_words = para.split()
+    add_dict = {}
+    for position, word in enumerate(all_words):
+        if word not in stop_words:
+            add_dict.setdefault(word, []).append(position)
+    return len(all_words), add_dict
+
+
+def encode_positions(positions) -> bytes:
+    out = bytearray()
+    previous = 0
+    for position in positions:
+        gap = position - previous
+        previous = position
+        while gap >= 0x80:
+            out.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        out.append(gap)
+    return bytes(out)
+
+
+def backfill_positions(apps, schema_editor):
+    """Store real positions for tokens written when `indexes` was an offset into a set."""
+    Paragraph = apps.get_model('tasks', 'Paragraph')
+    TokenizedWords = apps.get_model('tasks', 'TokenizedWords')
+
+    paragraphs = Paragraph.objects.only('id', 'paragraphs').order_by('id').iterator(chunk_size=1000)
+    for paragraph in paragraphs:
+        length, words = index_paragraph(paragraph.paragraphs)
+        tokens = list(TokenizedWords.objects.filter(uuid_id=paragraph.id).only('id', 'words'))
+        for token in tokens:
+            positions = words.get(token.words)
+            if positions:
+                token.indexes = positions[0]
+                token.positions = encode_positions(positions)
+        TokenizedWords.objects.bulk_update(tokens, ['indexes', 'positions'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_ranking_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tokenizedwords',
+            name='positions',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(backfill_positions, migrations.RunPython.noop),
+    ]
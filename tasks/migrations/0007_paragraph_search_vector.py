@@ -0,0 +1,52 @@
+# Generated by Django 5.1 on 2026-10-18 08:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+from tasks.operations import AddPostgresIndexConcurrently
+
+
+def create_search_vector_trigger(apps, schema_editor):
+    """Keep search_vector in step with the text on every write path (bulk_create, admin, raw SQL)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE TRIGGER tasks_paragraph_search_vector BEFORE INSERT OR UPDATE OF paragraphs "
+        "ON tasks_paragraph FOR EACH ROW "
+        "EXECUTE PROCEDURE tsvector_update_trigger(search_vector, 'pg_catalog.english', paragraphs)"
+    )
+    schema_editor.execute(
+        "UPDATE tasks_paragraph SET search_vector = to_tsvector('pg_catalog.english', paragraphs)"
+    )
+
+
+def drop_search_vector_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP TRIGGER IF EXISTS tasks_paragraph_search_vector ON tasks_paragraph')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0006_token_positions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paragraph',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_vector_trigger, drop_search_vector_trigger),
+        AddPostgresIndexConcurrently(
+            model_name='paragraph',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='paragraph_search_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1 on 2026-10-18 08:40
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    The Term table and a nullable TokenizedWords.term. 0011 fills the column in
+    batches, 0012 swaps the indexes concurrently and 0013 drops `words`, so no
+    step holds a lock on the tokens table for longer than one batch.
+    """
+
+    dependencies = [
+        ('tasks', '0008_posting_blocks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Term',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                'indexes': [models.Index(django.db.models.functions.text.Lower('word'), name='term_lower_word_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='tokenizedwords',
+            name='term',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='tasks.term'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1 on 2026-10-18 09:40
+
+from django.db import migrations, transaction
+from django.db.models import Max, OuterRef, Subquery
+
+# tokens updated per transaction
+BATCH_SIZE = 10000
+
+
+def batches(queryset, using):
+    """Id ranges of `queryset`, each yielded inside its own transaction."""
+    last = queryset.aggregate(last=Max('id'))['last'] or 0
+    for start in range(0, last + 1, BATCH_SIZE):
+        with transaction.atomic(using=using):
+            yield queryset.filter(id__gte=start, id__lt=start + BATCH_SIZE)
+
+
+def intern_words(apps, schema_editor):
+    """
+    Create a Term for every distinct word and point the tokens at it. Tokens
+    already pointing at a term are skipped, so a run cut short resumes.
+    """
+    Term = apps.get_model('tasks', 'Term')
+    TokenizedWords = apps.get_model('tasks', 'TokenizedWords')
+    using = schema_editor.connection.alias
+
+    words = TokenizedWords.objects.using(using).values_list('words', flat=True).distinct().order_by('words')
+    Term.objects.using(using).bulk_create(
+        (Term(word=word) for word in words.iterator()), batch_size=1000, ignore_conflicts=True
+    )
+    term = Subquery(Term.objects.filter(word=OuterRef('words')).values('id')[:1])
+    for batch in batches(TokenizedWords.objects.using(using), using):
+        batch.filter(term__isnull=True).update(term=term)
+
+
+def restore_words(apps, schema_editor):
+    Term = apps.get_model('tasks', 'Term')
+    TokenizedWords = apps.get_model('tasks', 'TokenizedWords')
+    using = schema_editor.connection.alias
+
+    word = Subquery(Term.objects.filter(id=OuterRef('term_id')).values('word')[:1])
+    for batch in batches(TokenizedWords.objects.using(using), using):
+        batch.update(words=word)
+
+
+class Migration(migrations.Migration):
+
+    # every batch commits on its own instead of one UPDATE of the whole table
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0010_ingestjob_lease'),
+    ]
+
+    operations = [
+        migrations.RunPython(intern_words, restore_words),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+from tasks.operations import AddIndexConcurrentlyIfSupported, RemoveIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0011_term_backfill'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name='tokenizedwords',
+            index=models.Index(fields=['user', 'term', 'uuid'], name='tokens_user_term_idx'),
+        ),
+        RemoveIndexConcurrentlyIfSupported(
+            model_name='tokenizedwords',
+            name='tokens_user_word_idx',
+        ),
+    ]
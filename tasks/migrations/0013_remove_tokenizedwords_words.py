@@ -0,0 +1,29 @@
+# Generated by Django 5.1 on 2026-10-18 09:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0012_tokens_user_term_idx'),
+    ]
+
+    operations = [
+        # a default lets the column be added back (and refilled) when migrating backwards
+        migrations.AlterField(
+            model_name='tokenizedwords',
+            name='words',
+            field=models.CharField(default='', max_length=50),
+        ),
+        migrations.RemoveField(
+            model_name='tokenizedwords',
+            name='words',
+        ),
+        migrations.AlterField(
+            model_name='tokenizedwords',
+            name='term',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='tasks.term'),
+        ),
+    ]
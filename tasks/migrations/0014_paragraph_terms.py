@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 09:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0013_remove_tokenizedwords_words'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paragraph',
+            name='terms',
+            field=models.TextField(editable=False, null=True),
+        ),
+    ]
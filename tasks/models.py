@@ -1,21 +1,164 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models.functions import Lower
 from users.models import CustomUser
 
 
+class ParagraphQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Delete the paragraphs, then drop them from the search structures once per
+        delete rather than once per row (see tasks.signals.forget_paragraphs).
+        Their TokenizedWords rows cascade without being loaded.
+        """
+        from tasks.signals import forget_paragraphs
+
+        with transaction.atomic(using=self.db):
+            paragraphs = list(self.order_by().only('id', 'user_id', 'length', 'terms'))
+            deleted = super().delete()
+            forget_paragraphs(paragraphs)
+        return deleted
+
+
 class Paragraph(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     uuid = models.CharField(max_length=50, unique=True, null=False)
     paragraphs = models.TextField()
+    # number of words in the paragraph, the document length used by BM25
+    length = models.IntegerField(default=0)
+    # space separated terms of the paragraph's posting blocks, so a delete finds them by term;
+    # null when its postings were written as TokenizedWords rows and not packed since
+    terms = models.TextField(null=True, editable=False)
+    # filled by a database trigger on PostgreSQL, see tasks.backends.postgres
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ParagraphQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='paragraph_search_idx'),
+        ]
 
     def __str__(self) -> str:
         return f'{self.uuid} user =  {self.user}'
 
+    def delete(self, using=None, keep_parents=False):
+        deleted = Paragraph.objects.using(using or self._state.db).filter(pk=self.pk).delete()
+        self.pk = None
+        return deleted
+
+
+class Term(models.Model):
+    """A word as written in the paragraphs, stored once and referenced by id (see tasks.vocabulary)."""
+    word = models.CharField(max_length=50, unique=True)
+
+    class Meta:
+        indexes = [
+            # search looks words up case insensitively
+            models.Index(Lower('word'), name='term_lower_word_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return self.word
+
 
 class TokenizedWords(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     uuid = models.ForeignKey(Paragraph, on_delete=models.CASCADE)
-    words = models.CharField(max_length=50)
+    term = models.ForeignKey(Term, on_delete=models.PROTECT)
+    # position of the first occurrence of the word in the paragraph
     indexes = models.IntegerField()
+    # occurrences of the word in the paragraph
+    frequency = models.IntegerField(default=1)
+    # every position of the word in the paragraph, see tasks.encoding
+    positions = models.BinaryField(default=b'')
+
+    class Meta:
+        indexes = [
+            # search resolves (user, term) -> paragraph ids from this index alone
+            models.Index(fields=['user', 'term', 'uuid'], name='tokens_user_term_idx'),
+        ]
+
+    @property
+    def words(self) -> str:
+        return self.term.word
+
+    def __str__(self) -> str:
+        return str(self.uuid)
+
+
+class PostingBlock(models.Model):
+    """
+    Postings of one term for a run of the user's paragraphs, packed by
+    tasks.encoding.encode_block. Replaces TokenizedWords rows when
+    TASKS_POSTINGS['FORMAT'] is 'packed', see tasks.postings.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    # lower cased word
+    term = models.CharField(max_length=50)
+    # lowest and highest paragraph id in the block
+    first_paragraph = models.BigIntegerField()
+    last_paragraph = models.BigIntegerField()
+    # number of paragraphs in the block
+    postings = models.IntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'term', 'first_paragraph'], name='postingblock_term_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.term} user = {self.user_id}'
+
+
+class IngestJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    text = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    paragraphs = models.IntegerField(default=0)
+    tokens = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # renewed with every committed batch; a running job whose lease lapsed is claimed again
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    # times the job was claimed by a worker
+    attempts = models.IntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='ingestjob_status_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'job {self.id} {self.status} user = {self.user_id}'
+
+
+class CorpusStats(models.Model):
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True)
+    # bumped in the same transaction as every write to the user's paragraphs
+    version = models.BigIntegerField(default=0)
+    # corpus size and summed paragraph lengths, for BM25's N and average document length
+    paragraphs = models.BigIntegerField(default=0)
+    total_length = models.BigIntegerField(default=0)
+
+    @property
+    def average_length(self) -> float:
+        return self.total_length / self.paragraphs if self.paragraphs else 0.0
 
     def __str__(self) -> str:
-        return str(self.uuid)
\ No newline at end of file
+        return f'user = {self.user_id} version = {self.version}'
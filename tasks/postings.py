@@ -0,0 +1,318 @@
+import heapq
+import io
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.functions import Lower
+
+from tasks.encoding import decode_block, decode_positions, encode_block, encode_positions, iter_block_ids
+from tasks.models import Paragraph, PostingBlock, TokenizedWords
+from tasks.vocabulary import resolve_terms
+
+
+DEFAULTS = {
+    # 'rows': one TokenizedWords row per paragraph and word
+    # 'packed': one PostingBlock row per term and run of paragraphs
+    'FORMAT': 'rows',
+    # paragraphs per block written by pack_postings
+    'BLOCK_SIZE': 1000,
+}
+
+# paragraph ids sent as an IN list; larger candidate sets are filtered in Python
+IN_LIST_LIMIT = 500
+
+
+def postings_setting(name):
+    return getattr(settings, 'TASKS_POSTINGS', {}).get(name, DEFAULTS[name])
+
+
+def _copy_value(value):
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def merge_variants(variants):
+    """One (tf, positions) posting out of the (tf, positions) of a word's case variants."""
+    if len(variants) == 1:
+        return variants[0]
+    return (
+        sum(frequency for frequency, positions in variants),
+        list(heapq.merge(*(positions for frequency, positions in variants))),
+    )
+
+
+class RowPostingStore:
+    """Postings as TokenizedWords rows, read through the (user, term, paragraph) index."""
+    packed = False
+
+    def write(self, user_id, paragraphs, indexed, batch_size: int, use_copy: bool):
+        """Store the {word: positions} of each of the (saved) paragraphs."""
+        ids = resolve_terms({word for words in indexed for word in words})
+        rows = [
+            (paragraph.id, ids[word], positions[0], len(positions), encode_positions(positions))
+            for paragraph, words in zip(paragraphs, indexed)
+            for word, positions in words.items()
+        ]
+        if use_copy:
+            self._copy_tokens(user_id, rows)
+            return
+        TokenizedWords.objects.bulk_create(
+            [TokenizedWords(user_id=user_id, uuid_id=para_id, term_id=term_id, indexes=idx,
+                            frequency=frequency, positions=positions)
+             for para_id, term_id, idx, frequency, positions in rows],
+            batch_size=batch_size,
+        )
+
+    def _copy_tokens(self, user_id, rows):
+        buffer = io.StringIO()
+        user_id = _copy_value(user_id)
+        for para_id, term_id, idx, frequency, positions in rows:
+            buffer.write(f'{user_id}\t{para_id}\t{term_id}\t{idx}\t{frequency}\t\\\\x{positions.hex()}\n')
+        buffer.seek(0)
+        table = connection.ops.quote_name(TokenizedWords._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {table} (user_id, uuid_id, term_id, indexes, frequency, positions) FROM STDIN', buffer
+            )
+
+    def read(self, user_id, terms, with_positions=False, paragraph_ids=None):
+        """
+        ({term: {paragraph_id: (tf, positions)}}, {paragraph_id: paragraph_length})
+        for the user's normalized terms, in one query. Case variants of a word are
+        merged into one posting. Positions are only read (and decoded) when asked
+        for, and `paragraph_ids` narrows the postings down to those paragraphs.
+        """
+        fields = ['normalized', 'uuid_id', 'frequency', 'uuid__length']
+        if with_positions:
+            fields.append('positions')
+        rows = (
+            TokenizedWords.objects
+            .annotate(normalized=Lower('term__word'))
+            .filter(user_id=user_id, normalized__in=terms)
+        )
+        if paragraph_ids is not None:
+            # membership tests on a set are much cheaper than on a bitmap's big ints
+            paragraph_ids = set(paragraph_ids)
+            if len(paragraph_ids) <= IN_LIST_LIMIT:
+                rows = rows.filter(uuid_id__in=paragraph_ids)
+        merged = defaultdict(list)
+        lengths = {}
+        for term, paragraph_id, frequency, length, *positions in rows.values_list(*fields):
+            if paragraph_ids is not None and paragraph_id not in paragraph_ids:
+                continue
+            merged[term, paragraph_id].append((frequency, decode_positions(positions[0]) if positions else []))
+            lengths[paragraph_id] = length
+
+        postings = {term: {} for term in terms}
+        for (term, paragraph_id), variants in merged.items():
+            postings[term][paragraph_id] = merge_variants(variants)
+        return postings, lengths
+
+    def paragraph_ids(self, user_id, terms):
+        """{term: ids of the user's paragraphs containing it}"""
+        ids = defaultdict(list)
+        rows = (
+            TokenizedWords.objects
+            .annotate(normalized=Lower('term__word'))
+            .filter(user_id=user_id, normalized__in=terms)
+            .values_list('normalized', 'uuid_id')
+        )
+        for term, paragraph_id in rows:
+            ids[term].append(paragraph_id)
+        return ids
+
+    def document_frequencies(self, user_id):
+        """{normalized term: number of the user's paragraphs containing it}, in one grouped query."""
+        rows = (
+            TokenizedWords.objects
+            .filter(user_id=user_id)
+            .annotate(normalized=Lower('term__word'))
+            .values('normalized')
+            .annotate(paragraphs=Count('uuid', distinct=True))
+            .values_list('normalized', 'paragraphs')
+        )
+        return dict(rows)
+
+    def paragraph_terms(self, words):
+        """Paragraph.terms for a paragraph's {word: positions}; rows need none."""
+        return None
+
+    def remove(self, user_id, paragraphs):
+        # the rows go with the paragraphs (ON DELETE CASCADE)
+        pass
+
+
+class PackedPostingStore(RowPostingStore):
+    """
+    Postings packed into PostingBlock rows: one row per term and run of
+    paragraphs instead of one row per paragraph and word.
+
+    Every ingest flush appends one block per term it saw, so small uploads leave
+    many small blocks behind; the pack_postings command merges them (and any
+    TokenizedWords rows left from the row format) into blocks of BLOCK_SIZE.
+    """
+    packed = True
+
+    def blocks(self, user_id, term: str, postings, block_size=None):
+        """PostingBlocks for [(paragraph_id, length, {word: positions})] in ascending paragraph order."""
+        block_size = block_size or len(postings)
+        return [
+            PostingBlock(
+                user_id=user_id, term=term, first_paragraph=chunk[0][0], last_paragraph=chunk[-1][0],
+                postings=len(chunk), data=encode_block(term, chunk),
+            )
+            for chunk in (postings[i:i + block_size] for i in range(0, len(postings), block_size))
+        ]
+
+    def write(self, user_id, paragraphs, indexed, batch_size: int, use_copy: bool):
+        by_term = defaultdict(list)
+        for paragraph, words in zip(paragraphs, indexed):
+            variants = defaultdict(dict)
+            for word, positions in words.items():
+                variants[word.lower()][word] = positions
+            for term, words in variants.items():
+                by_term[term].append((paragraph.id, paragraph.length, words))
+        PostingBlock.objects.bulk_create(
+            [block for term, postings in by_term.items() for block in self.blocks(user_id, term, postings)],
+            batch_size=batch_size,
+        )
+
+    def read(self, user_id, terms, with_positions=False, paragraph_ids=None):
+        postings = {term: {} for term in terms}
+        lengths = {}
+        blocks = PostingBlock.objects.filter(user_id=user_id, term__in=terms)
+        if paragraph_ids is not None:
+            paragraph_ids = set(paragraph_ids)
+            if not paragraph_ids:
+                return postings, lengths
+            blocks = blocks.filter(first_paragraph__lte=max(paragraph_ids), last_paragraph__gte=min(paragraph_ids))
+        for term, data in blocks.values_list('term', 'data'):
+            for paragraph_id, length, words in decode_block(term, data, paragraph_ids):
+                variants = [(len(positions), positions) for positions in words.values()]
+                frequency, positions = merge_variants(variants)
+                postings[term][paragraph_id] = (frequency, positions if with_positions else [])
+                lengths[paragraph_id] = length
+        return postings, lengths
+
+    def paragraph_ids(self, user_id, terms):
+        ids = defaultdict(list)
+        for term, data in PostingBlock.objects.filter(user_id=user_id, term__in=terms).values_list('term', 'data'):
+            ids[term].extend(iter_block_ids(data))
+        return ids
+
+    def document_frequencies(self, user_id):
+        rows = (
+            PostingBlock.objects
+            .filter(user_id=user_id)
+            .values('term')
+            .annotate(paragraphs=Sum('postings'))
+            .values_list('term', 'paragraphs')
+        )
+        return dict(rows)
+
+    def paragraph_terms(self, words):
+        return ' '.join(sorted({word.lower() for word in words}))
+
+    def containing(self, user_id, paragraphs):
+        """
+        The user's blocks that can hold `paragraphs`, [(paragraph_id, terms)]:
+        the blocks of their recorded terms (not of the words today's tokenizer
+        settings would give) overlapping their id range. Without terms for every
+        paragraph, every block overlapping the range.
+        """
+        ids = [paragraph_id for paragraph_id, terms in paragraphs]
+        blocks = PostingBlock.objects.filter(
+            user_id=user_id, first_paragraph__lte=max(ids), last_paragraph__gte=min(ids),
+        )
+        if any(terms is None for paragraph_id, terms in paragraphs):
+            return blocks
+        return blocks.filter(term__in={term for paragraph_id, terms in paragraphs for term in terms.split()})
+
+    def remove(self, user_id, paragraphs):
+        """Rewrite the blocks holding the user's deleted `paragraphs`, [(paragraph_id, terms)], without them."""
+        if not paragraphs:
+            return
+        paragraph_ids = {paragraph_id for paragraph_id, terms in paragraphs}
+        for block in self.containing(user_id, paragraphs):
+            if paragraph_ids.isdisjoint(iter_block_ids(block.data)):
+                continue
+            postings = [
+                posting for posting in decode_block(block.term, block.data) if posting[0] not in paragraph_ids
+            ]
+            if not postings:
+                block.delete()
+                continue
+            block.first_paragraph = postings[0][0]
+            block.last_paragraph = postings[-1][0]
+            block.postings = len(postings)
+            block.data = encode_block(block.term, postings)
+            block.save(update_fields=['first_paragraph', 'last_paragraph', 'postings', 'data'])
+
+    def pack(self, user_id, block_size: int):
+        """
+        Rewrite the user's TokenizedWords rows and PostingBlocks as blocks of
+        `block_size` paragraphs, and record the terms of paragraphs that had
+        none. Returns (rows read, blocks read, blocks written).
+        Run inside a transaction that holds the user's CorpusStats row, so no ingest
+        commits blocks in between.
+        """
+        postings = defaultdict(dict)
+        rows = (
+            TokenizedWords.objects
+            .filter(user_id=user_id)
+            .annotate(normalized=Lower('term__word'))
+            .values_list('id', 'normalized', 'term__word', 'uuid_id', 'uuid__length', 'positions')
+        )
+        last_row = None
+        read_rows = 0
+        for row_id, term, word, paragraph_id, length, positions in rows.iterator():
+            postings[term].setdefault(paragraph_id, (length, {}))[1][word] = decode_positions(positions)
+            last_row = max(last_row, row_id) if last_row else row_id
+            read_rows += 1
+        block_ids = []
+        for block_id, term, data in PostingBlock.objects.filter(user_id=user_id).values_list('id', 'term', 'data'):
+            block_ids.append(block_id)
+            for paragraph_id, length, words in decode_block(term, data):
+                postings[term].setdefault(paragraph_id, (length, {}))[1].update(words)
+
+        if last_row is not None:
+            TokenizedWords.objects.filter(user_id=user_id, id__lte=last_row).delete()
+        for i in range(0, len(block_ids), IN_LIST_LIMIT):
+            PostingBlock.objects.filter(id__in=block_ids[i:i + IN_LIST_LIMIT]).delete()
+        blocks = [
+            block
+            for term, by_paragraph in postings.items()
+            for block in self.blocks(
+                user_id, term,
+                [(paragraph_id, length, words) for paragraph_id, (length, words) in sorted(by_paragraph.items())],
+                block_size,
+            )
+        ]
+        PostingBlock.objects.bulk_create(blocks, batch_size=IN_LIST_LIMIT)
+
+        terms = defaultdict(list)
+        for term, by_paragraph in postings.items():
+            for paragraph_id in by_paragraph:
+                terms[paragraph_id].append(term)
+        unrecorded = list(Paragraph.objects.filter(user_id=user_id, terms__isnull=True).only('id'))
+        for paragraph in unrecorded:
+            paragraph.terms = ' '.join(sorted(terms[paragraph.id]))
+        Paragraph.objects.bulk_update(unrecorded, ['terms'], batch_size=IN_LIST_LIMIT)
+        return read_rows, len(block_ids), len(blocks)
+
+
+STORES = {
+    'rows': RowPostingStore(),
+    'packed': PackedPostingStore(),
+}
+
+
+def get_postings_store():
+    """The store named by TASKS_POSTINGS['FORMAT']."""
+    name = postings_setting('FORMAT')
+    try:
+        return STORES[name]
+    except KeyError:
+        raise ImproperlyConfigured(f"TASKS_POSTINGS['FORMAT'] must be one of {', '.join(STORES)}, not {name!r}")
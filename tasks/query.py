@@ -0,0 +1,365 @@
+import re
+from dataclasses import dataclass
+
+from tasks.helpers import stop_words
+from tasks.tokenizer import normalize_word, normalize_words
+
+
+# a quoted phrase, a NEAR/k operator, a parenthesis or a bare word
+TOKEN_RE = re.compile(r'"[^"]*"|"|NEAR/\d+|[()]|[^\s"()]+')
+OPERATORS = ('AND', 'OR', 'NOT')
+
+
+class QueryError(ValueError):
+    pass
+
+
+def intersect(left: list, right: list):
+    """Values present in both ascending lists."""
+    out = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if left[i] < right[j]:
+            i += 1
+        elif left[i] > right[j]:
+            j += 1
+        else:
+            out.append(left[i])
+            i += 1
+            j += 1
+    return out
+
+
+def near(left: list, right: list, distance: int):
+    """Positions in `left` with a different position of `right` at most `distance` away."""
+    out = []
+    j = 0
+    for position in left:
+        while j < len(right) and right[j] < position - distance:
+            j += 1
+        k = j
+        while k < len(right) and right[k] <= position + distance:
+            if right[k] != position:
+                out.append(position)
+                break
+            k += 1
+    return out
+
+
+class Leaf:
+    """A query node answered from the postings of its own words."""
+
+    def leaves(self):
+        return [self]
+
+    def scored(self):
+        return [self]
+
+    def match(self, sets):
+        return sets[self]
+
+
+@dataclass(frozen=True)
+class Term(Leaf):
+    word: str
+
+    positional = False
+
+    def terms(self):
+        return {self.word}
+
+    def positions(self, postings):
+        return {pid: positions for pid, (frequency, positions) in postings[self.word].items()}
+
+    def evaluate(self, postings):
+        """{paragraph_id: term frequency}"""
+        return {pid: frequency for pid, (frequency, positions) in postings[self.word].items()}
+
+    def __str__(self):
+        return self.word
+
+
+@dataclass(frozen=True)
+class Phrase(Leaf):
+    text: str
+    # (offset from the first indexed word, word) for each word that is not a stop word
+    words: tuple
+
+    positional = True
+
+    def terms(self):
+        return {word for offset, word in self.words}
+
+    def positions(self, postings):
+        """{paragraph_id: positions where the phrase starts}"""
+        # walk the rarest word first so the candidate set shrinks fastest
+        words = sorted(self.words, key=lambda item: len(postings[item[1]]))
+        matches = None
+        for offset, word in words:
+            docs = postings[word]
+            if matches is None:
+                matches = {pid: [p - offset for p in positions] for pid, (f, positions) in docs.items()}
+                continue
+            narrowed = {}
+            for pid, starts in matches.items():
+                if pid in docs:
+                    starts = intersect(starts, [p - offset for p in docs[pid][1]])
+                    if starts:
+                        narrowed[pid] = starts
+            matches = narrowed
+        return matches
+
+    def evaluate(self, postings):
+        return {pid: len(starts) for pid, starts in self.positions(postings).items()}
+
+    def __str__(self):
+        return f'"{self.text}"'
+
+
+@dataclass(frozen=True)
+class Near(Leaf):
+    left: Term
+    right: Term
+    distance: int
+
+    positional = True
+
+    def terms(self):
+        return self.left.terms() | self.right.terms()
+
+    def positions(self, postings):
+        right = self.right.positions(postings)
+        matches = {}
+        for pid, positions in self.left.positions(postings).items():
+            if pid in right:
+                found = near(positions, right[pid], self.distance)
+                if found:
+                    matches[pid] = found
+        return matches
+
+    def evaluate(self, postings):
+        return {pid: len(found) for pid, found in self.positions(postings).items()}
+
+    def __str__(self):
+        return f'{self.left} NEAR/{self.distance} {self.right}'
+
+
+def parse_phrase(text: str):
+    words = normalize_words(text)
+    indexed = [(offset, word) for offset, word in enumerate(words) if word and word not in stop_words]
+    if not indexed:
+        raise QueryError(f'phrase "{text}" has no searchable words')
+    if len(indexed) == 1:
+        return Term(indexed[0][1])
+    first = indexed[0][0]
+    return Phrase(' '.join(words[first:indexed[-1][0] + 1]), tuple((offset - first, word) for offset, word in indexed))
+
+
+@dataclass(frozen=True)
+class And:
+    children: tuple
+
+    def terms(self):
+        return set().union(*(child.terms() for child in self.children))
+
+    def leaves(self):
+        return [leaf for child in self.children for leaf in child.leaves()]
+
+    def scored(self):
+        return [leaf for child in self.children for leaf in child.scored()]
+
+    def match(self, sets):
+        result = self.children[0].match(sets)
+        for child in self.children[1:]:
+            result = result & child.match(sets)
+        return result
+
+    def __str__(self):
+        return '(' + ' AND '.join(map(str, self.children)) + ')'
+
+
+@dataclass(frozen=True)
+class Or(And):
+    def match(self, sets):
+        result = self.children[0].match(sets)
+        for child in self.children[1:]:
+            result = result | child.match(sets)
+        return result
+
+    def __str__(self):
+        return '(' + ' OR '.join(map(str, self.children)) + ')'
+
+
+@dataclass(frozen=True)
+class AndNot:
+    include: object
+    exclude: object
+
+    def terms(self):
+        return self.include.terms() | self.exclude.terms()
+
+    def leaves(self):
+        return self.include.leaves() + self.exclude.leaves()
+
+    def scored(self):
+        # excluded words never appear in a match, so they take no part in ranking
+        return self.include.scored()
+
+    def match(self, sets):
+        return self.include.match(sets) - self.exclude.match(sets)
+
+    def __str__(self):
+        return f'({self.include} NOT {self.exclude})'
+
+
+def expand_terms(node, expand):
+    """
+    Copy of the query with every Term replaced by an OR of the words `expand(word)`
+    returns (the term itself when it returns nothing). Phrases and NEAR are kept.
+    """
+    if isinstance(node, Term):
+        words = expand(node.word)
+        if not words:
+            return node
+        return Term(words[0]) if len(words) == 1 else Or(tuple(Term(word) for word in words))
+    if isinstance(node, AndNot):
+        return AndNot(expand_terms(node.include, expand), expand_terms(node.exclude, expand))
+    if isinstance(node, And):
+        return type(node)(tuple(expand_terms(child, expand) for child in node.children))
+    return node
+
+
+def parse_operand(token: str):
+    if token == '"':
+        raise QueryError('unterminated phrase')
+    if token.startswith('NEAR/'):
+        raise QueryError(f'{token} needs a word on each side')
+    if token in OPERATORS or token in '()':
+        raise QueryError(f'unexpected {token}')
+    if token.startswith('"'):
+        return parse_phrase(token[1:-1])
+    word = normalize_word(token)
+    if not word:
+        raise QueryError(f'"{token}" has no searchable characters')
+    if word in stop_words:
+        raise QueryError(f'"{word}" is a stop word and is not indexed')
+    return Term(word)
+
+
+class QueryParser:
+    """
+    Recursive descent over the query tokens, loosest binding first:
+
+        query  := clause ('OR' clause)*
+        clause := atom (['AND'] atom | 'NOT' atom)*
+        atom   := '(' query ')' | operand ['NEAR/k' operand]
+    """
+
+    def __init__(self, text: str):
+        self.tokens = TOKEN_RE.findall(text)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        if token is None:
+            raise QueryError('query ends too early')
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError('query is empty')
+        node = self.query()
+        if self.peek() is not None:
+            raise QueryError(f'unexpected {self.peek()}')
+        return node
+
+    def query(self):
+        children = [self.clause()]
+        while self.peek() == 'OR':
+            self.take()
+            children.append(self.clause())
+        return children[0] if len(children) == 1 else Or(tuple(children))
+
+    def clause(self):
+        node = self.atom()
+        children = []
+        while self.peek() not in (None, ')', 'OR'):
+            if self.peek() == 'NOT':
+                self.take()
+                node = AndNot(self.combine(node, children), self.atom())
+                children = []
+                continue
+            if self.peek() == 'AND':
+                self.take()
+                if self.peek() == 'NOT':
+                    continue
+            children.append(self.atom())
+        return self.combine(node, children)
+
+    @staticmethod
+    def combine(node, children):
+        return And((node, *children)) if children else node
+
+    def atom(self):
+        token = self.take()
+        if token == '(':
+            node = self.query()
+            if self.take() != ')':
+                raise QueryError('missing )')
+            return node
+        node = parse_operand(token)
+        if self.peek() is None or not self.peek().startswith('NEAR/'):
+            return node
+        distance = int(self.take()[len('NEAR/'):])
+        right = parse_operand(self.take())
+        if not isinstance(node, Term) or not isinstance(right, Term):
+            raise QueryError('NEAR/k combines single words')
+        if distance < 1:
+            raise QueryError('NEAR/k needs k of at least 1')
+        return Near(node, right, distance)
+
+
+def parse_query(text: str):
+    """
+    Parse a search query into a tree of query nodes.
+
+    - `word`: paragraphs containing the word
+    - `"some exact words"`: the words next to each other in this order; stop
+      words in the phrase are not indexed but still count as positions
+    - `word NEAR/k other`: the two words at most k positions apart, either order
+    - `a AND b` (or just `a b`), `a OR b`, `a NOT b` and parentheses combine
+      the above; AND and NOT bind tighter than OR
+
+    Raises QueryError for anything else.
+    """
+    return QueryParser(text).parse()
+
+
+def parse_search_params(params, max_edits_limit: int):
+    """
+    (query, max_edits) for the `word` or `q`, `fuzzy` and `max_edits` parameters
+    of the search API; max_edits is None unless fuzzy matching was asked for.
+    Raises ValueError with the message to send back when they are not valid.
+    """
+    word = params.get('word')
+    text = params.get('q')
+    if not word and not text:
+        raise ValueError("word or q parameter is required.")
+    try:
+        query = Term(normalize_word(word)) if word else parse_query(text)
+    except QueryError as e:
+        raise ValueError(f"invalid query: {e}")
+
+    if params.get('fuzzy', '').lower() not in ('1', 'true'):
+        return query, None
+    try:
+        max_edits = int(params.get('max_edits', max_edits_limit))
+    except ValueError:
+        max_edits = 0
+    if not 1 <= max_edits <= max_edits_limit:
+        raise ValueError(f"max_edits must be between 1 and {max_edits_limit}.")
+    return query, max_edits
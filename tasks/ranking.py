@@ -0,0 +1,38 @@
+import heapq
+import math
+from collections import defaultdict
+
+
+# standard Okapi BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def idf(df: int, n_docs: int):
+    # N can lag behind df for paragraphs stored before statistics were kept
+    n_docs = max(n_docs, df)
+    return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+
+def bm25(tf: int, length: int, average_length: float, term_idf: float, k1=K1, b=B):
+    norm = 1 - b + b * length / average_length if average_length else 1
+    return term_idf * tf * (k1 + 1) / (tf + k1 * norm)
+
+
+def top_k(postings: dict, n_docs: int, average_length: float, k: int = 10, df=None):
+    """
+    Rank paragraphs with BM25.
+
+    `postings` maps each query term to {paragraph_id: (tf, paragraph_length)}; the
+    document frequency of a term is the size of its postings unless `df` gives it
+    ({term: df}, for postings narrowed down to the paragraphs worth scoring). Only
+    paragraphs that appear in some postings list are scored, and a k-sized heap
+    picks the best ones. Returns [(paragraph_id, score)] best first, ties broken
+    by paragraph id.
+    """
+    scores = defaultdict(float)
+    for term, docs in postings.items():
+        term_idf = idf(df[term] if df else len(docs), n_docs)
+        for paragraph_id, (tf, length) in docs.items():
+            scores[paragraph_id] += bm25(tf, length, average_length, term_idf)
+    return heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,108 @@
+from monitoring.timing import phase
+from tasks.backends import get_search_backend
+from tasks.bitmaps import Bitmap, bitmap_cache
+from tasks.cache import search_cache
+from tasks.dictionary import term_dictionaries
+from tasks.postings import get_postings_store
+from tasks.query import Leaf, expand_terms
+from tasks.ranking import top_k
+
+
+def term_postings(user_id, terms, with_positions=False, paragraph_ids=None):
+    """
+    ({term: {paragraph_id: (tf, positions)}}, {paragraph_id: paragraph_length})
+    for the user's normalized terms, read from the configured postings store
+    (see tasks.postings). `paragraph_ids` narrows the postings down to those paragraphs.
+    """
+    return get_postings_store().read(user_id, terms, with_positions=with_positions, paragraph_ids=paragraph_ids)
+
+
+def load_term_ids(user_id, terms):
+    return get_postings_store().paragraph_ids(user_id, terms)
+
+
+def term_bitmaps(user_id, version: int, terms):
+    """{term: Bitmap of the user's paragraphs containing it} at the given corpus version."""
+    return bitmap_cache.get(user_id, version, list(terms), lambda missing: load_term_ids(user_id, missing))
+
+
+def ranked_search(user_id, query, stats, k: int = 10):
+    """
+    Paragraph ids of the `k` best BM25 matches for a parsed query (see tasks.query),
+    best first. Phrases and NEAR are matched by intersecting position lists; their
+    match count in a paragraph plays the part of the term frequency.
+
+    Boolean queries are first evaluated over per-term paragraph id bitmaps, then
+    only the paragraphs left are scored, over the words that are not excluded.
+    """
+    if isinstance(query, Leaf):
+        postings, lengths = term_postings(user_id, query.terms(), with_positions=query.positional)
+        matches = {str(query): {pid: (tf, lengths[pid]) for pid, tf in query.evaluate(postings).items()}}
+        return [paragraph_id for paragraph_id, score in top_k(matches, stats.paragraphs, stats.average_length, k)]
+
+    bitmaps = term_bitmaps(user_id, stats.version, query.terms())
+    leaves = set(query.leaves())
+    sets = {leaf: bitmaps[leaf.word] for leaf in leaves if not leaf.positional}
+    counts = {}
+    lengths = {}
+    positional = [leaf for leaf in leaves if leaf.positional]
+    if positional:
+        # only paragraphs holding every word of a phrase (or NEAR) can match it
+        candidates = Bitmap()
+        for leaf in positional:
+            words = [bitmaps[term] for term in leaf.terms()]
+            both = words[0]
+            for bitmap in words[1:]:
+                both = both & bitmap
+            candidates = candidates | both
+        terms = set().union(*(leaf.terms() for leaf in positional))
+        postings, lengths = term_postings(user_id, terms, with_positions=True, paragraph_ids=candidates)
+        for leaf in positional:
+            counts[leaf] = leaf.evaluate(postings)
+            sets[leaf] = Bitmap.from_ids(counts[leaf])
+
+    matched = query.match(sets)
+    if not matched:
+        return []
+    matched = set(matched)
+
+    scored = set(query.scored())
+    words = {leaf.word for leaf in scored if not leaf.positional}
+    if words:
+        postings, term_lengths = term_postings(user_id, words, paragraph_ids=matched)
+        lengths.update(term_lengths)
+        for leaf in scored:
+            if not leaf.positional:
+                counts[leaf] = {pid: tf for pid, (tf, positions) in postings[leaf.word].items()}
+    matches = {
+        str(leaf): {pid: (tf, lengths[pid]) for pid, tf in counts[leaf].items() if pid in matched}
+        for leaf in scored
+    }
+    df = {str(leaf): len(sets[leaf]) for leaf in scored}
+    return [
+        paragraph_id
+        for paragraph_id, score in top_k(matches, stats.paragraphs, stats.average_length, k, df=df)
+    ]
+
+
+def search_cache_key(user_id, version: int, query, max_edits=None):
+    """The search result cache key of `query` for the configured backend, fuzzy or not."""
+    name = get_search_backend().name
+    key = f'{name}:{query}:fuzzy={max_edits}' if max_edits else f'{name}:{query}'
+    return search_cache.key(user_id, version, key)
+
+
+def rank_paragraphs(user_id, query, stats, max_edits=None, expansions: int = 10, k: int = 10):
+    """
+    Ids of the user's `k` best paragraphs for `query`, best first, ranked by the
+    TASKS_SEARCH_BACKEND. With `max_edits` every word first stands for up to
+    `expansions` of the user's words within that many typos.
+    """
+    if max_edits:
+        # swap each word for the user's words within reach, found through
+        # the trigram index of their term dictionary, then search exactly
+        query = expand_terms(query, lambda word: term_dictionaries.similar(
+            user_id, stats.version, word, max_edits, expansions
+        ))
+    with phase('search'):
+        return get_search_backend().search(user_id, query, stats, k=k)
@@ -1,7 +1,10 @@
+from asgiref.sync import sync_to_async
 from rest_framework import serializers
 
-from tasks.models import Paragraph, TokenizedWords
-from tasks.helpers import tokenized_words
+from tasks.encoding import decode_block
+from tasks.models import IngestJob, Paragraph, TokenizedWords
+from tasks.ingest import ingest_text
+from tasks.postings import get_postings_store
 
 class ParagraphSerializer(serializers.ModelSerializer):
     user = serializers.EmailField(read_only=True, source='user.email')
@@ -22,34 +25,16 @@ class ParagraphSerializer(serializers.ModelSerializer):
         text = data.pop('text',None)
         user = self.context['request'].user
         if text:
-            # Tokenize and split paragraphs
-            each_para, indexed_words = tokenized_words(text)
-
-            for para_id, para_text in each_para.items():
-                # Save each paragraph to the database
-                paragraph = Paragraph.objects.create(
-                    user=user,
-                    uuid=para_id,
-                    paragraphs=para_text
-                )
-
-                # Save each tokenized word with its index
-                for word_dict in indexed_words[para_id]:
-                    for word, idx in word_dict.items():
-                        TokenizedWords.objects.create(
-                            user = user,
-                            uuid=paragraph,
-                            words=word,
-                            indexes=idx
-                        )
-
-            return paragraph
+            # Tokenize, split paragraphs and bulk insert them in one transaction
+            ingestor = ingest_text(user.pk, text)
+            return ingestor.last_paragraph
         return None
         
 
 class TokenizedSerializer(serializers.ModelSerializer):
     user = serializers.EmailField(source='user.email')  # Display user's email
     paragraph_uuid = serializers.CharField(source='uuid.uuid')
+    words = serializers.CharField(source='term.word')
 
     class Meta:
         model = TokenizedWords
@@ -59,3 +44,118 @@ class TokenizedSerializer(serializers.ModelSerializer):
             'indexes',
             'words',
         ]
+
+
+class IngestJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = IngestJob
+        fields = [
+            'id',
+            'status',
+            'attempts',
+            'paragraphs',
+            'tokens',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer for list endpoints that skips DRF's per-field machinery.
+
+    `fields` maps each output key to the lookup producing it. `project()` turns a
+    queryset into one joined SELECT of exactly those columns (plus `id` for cursor
+    pagination) and `to_representation()` only renames the keys of a row.
+    Serializers with `batched` set need a list of rows at a time: streams hand
+    `many()` (or the coroutine `amany()`) whole chunks instead.
+    """
+    fields = {}
+    batched = False
+
+    @classmethod
+    def project(cls, queryset):
+        return queryset.values('id', *cls.fields.values())
+
+    @classmethod
+    def to_representation(cls, row):
+        return {key: row[lookup] for key, lookup in cls.fields.items()}
+
+    @classmethod
+    def many(cls, rows):
+        return [cls.to_representation(row) for row in rows]
+
+
+class ParagraphValuesSerializer(ValuesSerializer):
+    fields = {
+        'user': 'user__email',
+        'uuid': 'uuid',
+        'paragraphs': 'paragraphs',
+    }
+
+
+class TokenizedValuesSerializer(ValuesSerializer):
+    fields = {
+        'user': 'user__email',
+        'paragraph_uuid': 'uuid__uuid',
+        'indexes': 'indexes',
+        'words': 'term__word',
+    }
+
+
+class PackedTokenizedValuesSerializer(ValuesSerializer):
+    """
+    Token rows for the packed postings format, which keeps no row per token:
+    the words and first positions the TokenizedWords rows would hold are read
+    back from the PostingBlocks of a batch of paragraphs' recorded terms, so
+    `many()` costs one query per batch and reads no block of other terms. `to_representation()` returns the list of one
+    paragraph's tokens.
+    """
+    fields = {
+        'user': 'user__email',
+        'paragraph_uuid': 'uuid',
+    }
+    batched = True
+
+    @classmethod
+    def project(cls, queryset):
+        return queryset.values('id', 'user_id', 'terms', *cls.fields.values())
+
+    @classmethod
+    def blocks(cls, rows):
+        """(term, data) of the blocks holding the rows' paragraphs, all of one user."""
+        paragraphs = [(row['id'], row['terms']) for row in rows]
+        return get_postings_store().containing(rows[0]['user_id'], paragraphs).values_list('term', 'data')
+
+    @classmethod
+    def tokens(cls, rows, blocks):
+        """The rows' tokens decoded from their `blocks`, in paragraph and then word order."""
+        words = {row['id']: [] for row in rows}
+        for term, data in blocks:
+            for paragraph_id, length, variants in decode_block(term, data, words):
+                words[paragraph_id].extend((positions[0], word) for word, positions in variants.items())
+        return [
+            {'user': row['user__email'], 'paragraph_uuid': row['uuid'], 'indexes': index, 'words': word}
+            for row in rows
+            for index, word in sorted(words[row['id']])
+        ]
+
+    @classmethod
+    def to_representation(cls, row):
+        return cls.many([row])
+
+    @classmethod
+    def many(cls, rows):
+        if not rows:
+            return []
+        return cls.tokens(rows, list(cls.blocks(rows)))
+
+    @classmethod
+    async def amany(cls, rows):
+        """many() for async views, decoding the blocks in a worker thread."""
+        if not rows:
+            return []
+        blocks = [block async for block in cls.blocks(rows)]
+        return await sync_to_async(cls.tokens, thread_sensitive=False)(rows, blocks)
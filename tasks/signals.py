@@ -0,0 +1,36 @@
+from collections import defaultdict
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from tasks.cache import bump_corpus_version
+from tasks.models import Paragraph
+from tasks.postings import get_postings_store
+
+# ParagraphIngestor bumps the version itself, bulk_create sends no signals. This
+# covers single-row edits (admin). Token rows only change with their paragraph.
+#
+# Deletes do not go through signals: a post_delete receiver on a model turns off
+# Django's fast delete for it, so every cascaded row would be loaded and handled
+# on its own. Paragraph and its queryset call forget_paragraphs() once per delete
+# instead, and a user's delete takes their corpus statistics and posting blocks
+# with it.
+
+@receiver(post_save, sender=Paragraph)
+def invalidate_search_results_on_save(sender, instance, **kwargs):
+    bump_corpus_version(instance.user_id)
+
+
+def forget_paragraphs(paragraphs):
+    """
+    Drop deleted `paragraphs` from packed posting blocks and from their owners'
+    corpus totals, with one version bump per owner. Call it in the deleting
+    transaction.
+    """
+    store = get_postings_store()
+    removed = defaultdict(list)
+    for paragraph in paragraphs:
+        removed[paragraph.user_id].append(paragraph)
+    for user_id, owned in removed.items():
+        store.remove(user_id, [(paragraph.id, paragraph.terms) for paragraph in owned])
+        length = sum(paragraph.length for paragraph in owned)
+        bump_corpus_version(user_id, paragraphs=-len(owned), length=-length, create=False)
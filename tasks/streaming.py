@@ -0,0 +1,112 @@
+import itertools
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from drf_yasg import openapi
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# rows fetched per round trip by QuerySet.iterator() (server-side cursor on PostgreSQL)
+DEFAULT_CHUNK_SIZE = 2000
+# encoded rows joined into one chunk of the response body
+ROWS_PER_WRITE = 500
+
+
+stream_parameter = openapi.Parameter(
+    name='stream',
+    in_=openapi.IN_QUERY,
+    description='Stream every row in one response instead of returning a single page',
+    type=openapi.TYPE_BOOLEAN,
+    required=False
+)
+
+
+def wants_stream(request):
+    return request.query_params.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def stream_chunk_size():
+    return getattr(settings, 'TASKS_STREAM_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def iter_envelope(message: str, rows):
+    """
+    Encode the usual success/message/data/status_code envelope piece by piece,
+    so only ROWS_PER_WRITE encoded rows are held in memory at any time.
+    """
+    encode = JSONEncoder().encode
+    yield f'{{"success": true, "message": {encode(message)}, "data": ['
+    separator = ''
+    batch = []
+    for row in rows:
+        batch.append(encode(row))
+        if len(batch) >= ROWS_PER_WRITE:
+            yield separator + ','.join(batch)
+            separator = ','
+            batch = []
+    if batch:
+        yield separator + ','.join(batch)
+    yield '], "status_code": 200}'
+
+
+def iter_chunks(iterable, size: int):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def streaming_response(message: str, queryset, to_representation, many=None):
+    """
+    Stream `queryset` through a server-side cursor, one representation per row,
+    or with `many` every item of the list it returns for each chunk of rows.
+    """
+    size = stream_chunk_size()
+    objs = queryset.iterator(chunk_size=size)
+    if many is None:
+        rows = (to_representation(obj) for obj in objs)
+    else:
+        rows = itertools.chain.from_iterable(many(chunk) for chunk in iter_chunks(objs, size))
+    return StreamingHttpResponse(iter_envelope(message, rows), content_type='application/json')
+
+
+async def aiter_envelope(message: str, rows):
+    """iter_envelope() over an async iterable of rows."""
+    encode = JSONEncoder().encode
+    yield f'{{"success": true, "message": {encode(message)}, "data": ['
+    separator = ''
+    batch = []
+    async for row in rows:
+        batch.append(encode(row))
+        if len(batch) >= ROWS_PER_WRITE:
+            yield separator + ','.join(batch)
+            separator = ','
+            batch = []
+    if batch:
+        yield separator + ','.join(batch)
+    yield '], "status_code": 200}'
+
+
+def astreaming_response(message: str, queryset, to_representation, many=None):
+    """
+    streaming_response() for async views: the rows are read with
+    QuerySet.aiterator(), and `many` is a coroutine function, so CPU heavy work
+    on a chunk can be moved off the event loop.
+    """
+    size = stream_chunk_size()
+
+    async def rows():
+        chunk = []
+        async for obj in queryset.aiterator(chunk_size=size):
+            if many is None:
+                yield to_representation(obj)
+                continue
+            chunk.append(obj)
+            if len(chunk) >= size:
+                for item in await many(chunk):
+                    yield item
+                chunk = []
+        if chunk:
+            for item in await many(chunk):
+                yield item
+
+    return StreamingHttpResponse(aiter_envelope(message, rows()), content_type='application/json')
@@ -1,3 +1,856 @@
-from django.test import TestCase
+import io
+import json
+import os
+import signal
+import tempfile
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import QuerySet
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from authtoken.serializers import MyTokenObtainPairSerializer
+from project.pagination import PrimaryKeyCursorPagination
+from tasks.bitmaps import bitmap_cache
+from tasks.cache import get_corpus_stats
+from tasks.dictionary import TermDictionaryCache, term_dictionaries
+from tasks.encoding import decode_block, decode_positions, iter_block_ids
+from tasks.helpers import split_paras
+from tasks.ingest import ParagraphIngestor, ingest_text
+from tasks.jobs import claim_next_job, enqueue, run_job, work
+from tasks.loadgen import ScenarioError, load_scenario, run_load
+from tasks.models import CorpusStats, IngestJob, Paragraph, PostingBlock, Term, TokenizedWords
+from tasks.postings import RowPostingStore
+from tasks.serializers import PackedTokenizedValuesSerializer
+from tasks.tokenizer import Tokenizer, index_paragraph, tokenize_paragraphs, tokenizer_pool
+from tasks.vocabulary import resolve_terms, term_ids
+from users.cache import get_cached_user
+from users.models import CustomUser
+
+
+class AuthenticatedTestCase(TestCase):
+    """
+    One user per class, `cls.user` named after `username`, with headers carrying
+    their access token in `self.auth`. Ids of terms created by a test are rolled
+    back with it, so the term id cache is cleared after every test.
+    """
+    username = 'tester'
+
+    @classmethod
+    def make_user(cls, name):
+        return CustomUser.objects.create_user(
+            email=f'{name}@example.com', password='secret', name=name, dob='2000-01-01'
+        )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.make_user(cls.username)
+
+    @staticmethod
+    def auth_headers(user):
+        token = MyTokenObtainPairSerializer.get_token(user)
+        return {'HTTP_AUTHORIZATION': f'Bearer {token.access_token}'}
+
+    def setUp(self):
+        self.addCleanup(term_ids.clear)
+        self.auth = self.auth_headers(self.user)
+
+
+class ListQueryCountTests(AuthenticatedTestCase):
+    """List and search endpoints must cost the same number of queries for 3 rows or 300."""
+
+    # the user comes from the token claims and the account check from the user cache (warmed in
+    # setUp), so only the projected page query remains
+    LIST_QUERIES = 1
+
+    username = 'reader'
+
+    def setUp(self):
+        super().setUp()
+        get_cached_user(self.user.pk)
+
+    def ingest(self, paragraphs):
+        ingest_text(self.user.pk, '\n\n'.join(f'common word{i} filler{i}' for i in range(paragraphs)))
+
+    def assert_constant_queries(self, url, expected):
+        for paragraphs in (3, 300):
+            self.ingest(paragraphs)
+            with self.assertNumQueries(expected):
+                response = self.client.get(url, **self.auth)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertEqual(response.status_code, 200)
+
+    def test_paragraph_list(self):
+        self.assert_constant_queries(reverse('paras'), self.LIST_QUERIES)
+
+    def test_paragraph_stream(self):
+        self.assert_constant_queries(reverse('paras') + '?stream=true', self.LIST_QUERIES)
+
+    @override_settings(TASKS_STREAM_CHUNK_SIZE=2)
+    def test_stream_returns_every_row_in_the_envelope(self):
+        self.ingest(7)
+        pages = []
+        url = reverse('paras') + '?page_size=3'
+        while url:
+            body = self.client.get(url, **self.auth).json()
+            pages += body['data']
+            url = body['next']
+        # rows are written a few at a time, so the separators between writes are exercised too
+        with mock.patch('tasks.streaming.ROWS_PER_WRITE', 2):
+            response = self.client.get(reverse('paras') + '?stream=true', **self.auth)
+            body = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(body, {
+            'success': True, 'message': "list of all paragraph's data", 'data': pages, 'status_code': 200,
+        })
+
+    def test_tokenized_list(self):
+        self.assert_constant_queries(reverse('tokenized') + '?page_size=1000', self.LIST_QUERIES)
+
+    def test_tokenized_stream(self):
+        self.assert_constant_queries(reverse('tokenized') + '?stream=true', self.LIST_QUERIES)
+
+    def test_search(self):
+        # corpus statistics (which key the result cache), postings, then the page of paragraphs
+        self.assert_constant_queries(reverse('paras-search') + '?word=common', 3)
+
+
+class DeleteTests(AuthenticatedTestCase):
+    username = 'deleter'
+
+    def test_paragraph_delete_does_not_load_its_tokens(self):
+        ingest_text(self.user.pk, ' '.join(f'word{i}' for i in range(300)) + '\n\nkept paragraph')
+        paragraph = Paragraph.objects.get(paragraphs__startswith='word0')
+        version = get_corpus_stats(self.user.pk).version
+        # savepoint, the paragraph read for the totals and by the collector, its tokens, itself, one bump, release
+        with self.assertNumQueries(7):
+            paragraph.delete()
+        stats = get_corpus_stats(self.user.pk)
+        self.assertEqual((stats.version, stats.paragraphs, stats.total_length), (version + 1, 1, 2))
+        self.assertEqual(TokenizedWords.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_delete_bumps_each_user_once(self):
+        other = self.make_user('other-deleter')
+        for user in (self.user, other):
+            ingest_text(user.pk, '\n\n'.join(f'paragraph {i}' for i in range(50)))
+        versions = dict(CorpusStats.objects.values_list('user_id', 'version'))
+        # as for one paragraph, with one bump per user
+        with self.assertNumQueries(8):
+            Paragraph.objects.all().delete()
+        self.assertEqual(
+            dict(CorpusStats.objects.values_list('user_id', 'version')),
+            {user_id: version + 1 for user_id, version in versions.items()},
+        )
+        self.assertFalse(CorpusStats.objects.exclude(paragraphs=0, total_length=0).exists())
+
+    def test_user_delete_cost_does_not_grow_with_their_tokens(self):
+        ingest_text(self.user.pk, '\n\n'.join(' '.join(f'word{i}x{j}' for j in range(30)) for i in range(20)))
+        with CaptureQueriesContext(connection) as queries:
+            self.user.delete()
+        self.assertLess(len(queries), 30)
+        self.assertFalse(TokenizedWords.objects.exists())
+
+
+class PaginationTests(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ingest_text(cls.user.pk, '\n\n'.join(f'paragraph{i}' for i in range(5)))
+
+    def get(self, url, **params):
+        return self.client.get(url, params, **self.auth)
+
+    def texts(self, body):
+        return [row['paragraphs'] for row in body['data']]
+
+    def test_next_and_previous_round_trip(self):
+        first = self.get(reverse('paras'), page_size=2).json()
+        self.assertIsNone(first['previous'])
+        second = self.get(first['next']).json()
+        last = self.get(second['next']).json()
+        self.assertEqual(
+            [self.texts(first), self.texts(second), self.texts(last)],
+            [['paragraph0', 'paragraph1'], ['paragraph2', 'paragraph3'], ['paragraph4']],
+        )
+        self.assertIsNone(last['next'])
+        back = self.get(last['previous']).json()
+        self.assertEqual(self.texts(back), self.texts(second))
+        self.assertEqual(self.texts(self.get(back['previous']).json()), self.texts(first))
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(PrimaryKeyCursorPagination, 'max_page_size', 3):
+            self.assertEqual(len(self.get(reverse('paras'), page_size=50).json()['data']), 3)
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.get(reverse('paras'), cursor='not-a-cursor').status_code, 404)
+
+    def test_pages_do_not_leak_into_other_responses(self):
+        self.assertIsNotNone(self.get(reverse('paras'), page_size=2).json()['next'])
+        body = self.client.get(reverse('paras'), **self.auth_headers(self.make_user('empty'))).json()
+        self.assertEqual(body, {'success': True, 'message': 'data is empty.', 'data': None, 'status_code': 200})
+
+
+class IngestTests(AuthenticatedTestCase):
+    username = 'ingest'
+
+    def test_paragraphs_are_written_in_batches(self):
+        flushed = []
+        ingestor = ParagraphIngestor(
+            self.user.pk, batch_size=2, on_flush=lambda ingestor: flushed.append(ingestor.paragraphs)
+        )
+        ingestor.feed(split_paras('one\n\ntwo\n\nthree\n\nfour\n\nfive'))
+        self.assertEqual(flushed, [2, 4, 5])
+        self.assertEqual((ingestor.paragraphs, ingestor.tokens), (5, 5))
+        self.assertEqual(
+            list(Paragraph.objects.filter(user=self.user).order_by('id').values_list('paragraphs', flat=True)),
+            ['one', 'two', 'three', 'four', 'five'],
+        )
+        self.assertEqual(get_corpus_stats(self.user.pk).paragraphs, 5)
+
+    def test_a_failing_batch_rolls_back_the_whole_text(self):
+        def fail(ingestor):
+            if ingestor.paragraphs > 2:
+                raise RuntimeError('disk full')
+
+        with self.assertRaisesMessage(RuntimeError, 'disk full'):
+            ingest_text(self.user.pk, 'one\n\ntwo\n\nthree\n\nfour', batch_size=2, on_flush=fail)
+        self.assertFalse(Paragraph.objects.filter(user=self.user).exists())
+        self.assertFalse(TokenizedWords.objects.filter(user=self.user).exists())
+        self.assertFalse(CorpusStats.objects.filter(user=self.user).exists())
+
+    def test_token_positions(self):
+        ingest_text(self.user.pk, 'the cat saw the other cat')
+        tokens = {
+            token.words: (token.indexes, token.frequency, decode_positions(token.positions))
+            for token in TokenizedWords.objects.filter(user=self.user).select_related('term')
+        }
+        # stop words are not stored but still take up a position
+        self.assertEqual(tokens, {'cat': (1, 2, [1, 5]), 'saw': (2, 1, [2])})
+        self.assertEqual(Paragraph.objects.get(user=self.user).length, 6)
+
+
+@override_settings(TASKS_INGEST={'BATCH_SIZE': 2, 'JOB_LEASE_SECONDS': 60, 'JOB_MAX_ATTEMPTS': 3})
+class IngestJobTests(AuthenticatedTestCase):
+    TEXT = 'one\n\ntwo\n\nthree\n\nfour\n\nfive'
+
+    username = 'jobs'
+
+    def stored(self):
+        return list(Paragraph.objects.filter(user=self.user).order_by('id').values_list('paragraphs', flat=True))
+
+    def test_racing_workers_claim_different_jobs(self):
+        first, second = enqueue(self.user.pk, 'first'), enqueue(self.user.pk, 'second')
+        read_first = QuerySet.first
+        claimed_by_rival = []
+
+        def first_then_rival_claims(queryset):
+            row = read_first(queryset)
+            if not claimed_by_rival:
+                # another worker claims the same job between our read and our UPDATE
+                with mock.patch.object(QuerySet, 'first', read_first):
+                    claimed_by_rival.append(claim_next_job())
+            return row
+
+        with mock.patch.object(QuerySet, 'first', first_then_rival_claims):
+            job = claim_next_job()
+        self.assertEqual((claimed_by_rival[0].id, job.id), (first.id, second.id))
+        self.assertEqual(claimed_by_rival[0].attempts, 1)
+        self.assertIsNone(claim_next_job())
+
+    def test_progress_and_failure(self):
+        enqueue(self.user.pk, self.TEXT)
+        job = claim_next_job()
+        write = RowPostingStore.write
+        batches = []
+
+        def fail_third_batch(store, *args):
+            # the counts committed with the previous batches are visible while the job runs
+            batches.append(IngestJob.objects.values_list('paragraphs', flat=True).get(id=job.id))
+            if len(batches) == 3:
+                raise RuntimeError('disk full')
+            return write(store, *args)
+
+        with mock.patch.object(RowPostingStore, 'write', fail_third_batch):
+            self.assertFalse(run_job(job))
+        self.assertEqual(batches, [0, 2, 4])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.paragraphs, job.tokens), (IngestJob.FAILED, 4, 4))
+        self.assertIn('disk full', job.error)
+        self.assertEqual(self.stored(), ['one', 'two', 'three', 'four'])
+
+    def test_lapsed_job_resumes_where_its_worker_stopped(self):
+        enqueue(self.user.pk, self.TEXT)
+        stale = claim_next_job()
+        # the first worker committed one batch, then died
+        ParagraphIngestor(self.user.pk).feed(['one', 'two'])
+        IngestJob.objects.filter(id=stale.id).update(
+            paragraphs=2, tokens=2, heartbeat_at=timezone.now() - timedelta(minutes=5)
+        )
+        job = claim_next_job()
+        self.assertEqual((job.id, job.attempts, job.paragraphs), (stale.id, 2, 2))
+        # a worker that only stalled finds out on its next batch and writes nothing
+        self.assertFalse(run_job(stale))
+        self.assertTrue(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.paragraphs, job.tokens, job.text), (IngestJob.DONE, 5, 5, ''))
+        self.assertEqual(self.stored(), ['one', 'two', 'three', 'four', 'five'])
+
+    def test_job_that_keeps_losing_its_worker_fails(self):
+        job = enqueue(self.user.pk, self.TEXT)
+        IngestJob.objects.filter(id=job.id).update(
+            status=IngestJob.RUNNING, attempts=3, heartbeat_at=timezone.now() - timedelta(minutes=5)
+        )
+        self.assertIsNone(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (IngestJob.FAILED, 'the worker stopped responding 3 times'))
+
+    def test_worker_survives_database_errors(self):
+        enqueue(self.user.pk, self.TEXT)
+        claim = claim_next_job
+        calls = []
+
+        def flaky_claim():
+            calls.append(None)
+            if len(calls) == 1:
+                raise OperationalError('server closed the connection unexpectedly')
+            return claim()
+
+        self.addCleanup(signal.signal, signal.SIGINT, signal.getsignal(signal.SIGINT))
+        # a test runs inside a transaction, which closing the connections would end
+        with mock.patch('tasks.jobs.claim_next_job', flaky_claim), \
+                mock.patch('tasks.jobs.close_old_connections'), mock.patch('tasks.jobs.connections'), \
+                self.assertLogs('tasks.jobs', 'ERROR'):
+            work(threading.Event(), poll_interval=0, burst=True)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(self.stored(), ['one', 'two', 'three', 'four', 'five'])
+
+
+class StreamUploadTests(AuthenticatedTestCase):
+    username = 'uploader'
+
+    def upload(self, body: bytes, content_type='text/plain', **extra):
+        return self.client.generic('POST', reverse('paras-stream'), body, content_type, **self.auth, **extra)
+
+    def stored(self):
+        return list(Paragraph.objects.filter(user=self.user).order_by('id').values_list('paragraphs', flat=True))
+
+    def test_plain_text(self):
+        response = self.upload('first café\n\nsecond one\n\n\n'.encode())
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['data'], {'paragraphs': 2, 'tokens': 4})
+        self.assertEqual(self.stored(), ['first café', 'second one'])
+
+    @override_settings(TASKS_INGEST={'STREAM_CHUNK_SIZE': 3})
+    def test_ndjson_lines_across_chunks(self):
+        body = b'{"text": "one\\n\\ntwo"}\n\n{"text": "caf\xc3\xa9"}'
+        self.assertEqual(self.upload(body, 'application/x-ndjson').status_code, 201)
+        self.assertEqual(self.stored(), ['one', 'two', 'café'])
+
+    def test_chunked_upload_without_content_length(self):
+        body = b'chunked upload\n\nstill here'
+        # what a de-chunking WSGI server such as gunicorn passes on
+        response = self.upload(
+            body, CONTENT_LENGTH='', **{'wsgi.input': io.BytesIO(body), 'wsgi.input_terminated': True}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stored(), ['chunked upload', 'still here'])
+        self.assertEqual(self.upload(body, CONTENT_LENGTH='', **{'wsgi.input': io.BytesIO(body)}).status_code, 400)
+
+    @override_settings(TASKS_INGEST={'BATCH_SIZE': 1, 'STREAM_CHUNK_SIZE': 8})
+    def test_malformed_body_stores_nothing(self):
+        body = b'{"text": "kept in a batch"}\n{"text": "also kept"}\n{"text": 3}\n'
+        response = self.upload(body, 'application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('line 3', response.json()['message'])
+        self.assertEqual(self.upload(b'valid \xff invalid').status_code, 400)
+        self.assertEqual(self.stored(), [])
+        self.assertFalse(TokenizedWords.objects.filter(user=self.user).exists())
+
+    def test_unsupported_content_type(self):
+        self.assertEqual(self.upload(b'{"text": "json"}', 'application/json').status_code, 415)
+
+
+class SearchCacheTests(AuthenticatedTestCase):
+    username = 'searcher'
+
+    def setUp(self):
+        super().setUp()
+        caches['search'].clear()
+        self.url = reverse('paras-search') + '?word=Apple'
+
+    def test_ingest_invalidates_cached_results(self):
+        ingest_text(self.user.pk, 'apple pie')
+        self.assertEqual(self.client.get(self.url, **self.auth).json()['count'], '1 paragraphs found')
+
+        # cached: only the corpus statistics are read
+        with self.assertNumQueries(1):
+            self.client.get(self.url, **self.auth)
+
+        ingest_text(self.user.pk, 'apple tart')
+        self.assertEqual(self.client.get(self.url, **self.auth).json()['count'], '2 paragraphs found')
+
+    def test_only_whole_words_of_the_users_paragraphs_match(self):
+        other = self.make_user('other-searcher')
+        ingest_text(other.pk, 'apple crumble')
+        ingest_text(self.user.pk, 'APPLE juice\n\npineapple slices\n\napples')
+        data = self.client.get(self.url, **self.auth).json()['data']
+        self.assertEqual([row['paragraphs'] for row in data], ['APPLE juice'])
+
+    def test_results_are_ranked_by_relevance(self):
+        ingest_text(self.user.pk, 'apple and pears\n\napple apple apple\n\na long text mentioning one apple among many other words')
+        data = self.client.get(self.url, **self.auth).json()['data']
+        self.assertEqual(
+            [row['paragraphs'] for row in data],
+            ['apple apple apple', 'apple and pears', 'a long text mentioning one apple among many other words'],
+        )
+
+
+class SearchBackendTests:
+    """Query behaviour every search backend must share; subclasses pick the backend."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ingest_text(cls.user.pk, '\n\n'.join([
+            'the quick brown fox', 'brown quick fox', 'quick and then a very brown fox',
+            'alpha beta', 'alpha gamma delta', 'alpha gamma', 'beta gamma',
+        ]))
+
+    def setUp(self):
+        super().setUp()
+        caches['search'].clear()
+        bitmap_cache.clear()
+
+    def search(self, q):
+        response = self.client.get(reverse('paras-search'), {'q': q}, **self.auth)
+        return response.status_code, sorted(row['paragraphs'] for row in response.json()['data'] or [])
+
+    def test_word(self):
+        self.assertEqual(self.search('Delta'), (200, ['alpha gamma delta']))
+
+    def test_phrase(self):
+        self.assertEqual(self.search('"Quick Brown"'), (200, ['the quick brown fox']))
+        # stop words are not indexed but still take up a position
+        self.assertEqual(self.search('"quick and then a very brown"'), (200, ['quick and then a very brown fox']))
+
+    def test_near(self):
+        self.assertEqual(self.search('quick NEAR/1 brown'), (200, ['brown quick fox', 'the quick brown fox']))
+        self.assertEqual(len(self.search('fox NEAR/5 quick')[1]), 2)
+        self.assertEqual(len(self.search('fox NEAR/6 quick')[1]), 3)
+
+    def test_boolean_operators(self):
+        self.assertEqual(self.search('alpha AND (beta OR gamma) NOT delta'), (200, ['alpha beta', 'alpha gamma']))
+        self.assertEqual(self.search('alpha gamma'), (200, ['alpha gamma', 'alpha gamma delta']))
+        self.assertEqual(self.search('delta OR beta NOT alpha'), (200, ['alpha gamma delta', 'beta gamma']))
+        self.assertEqual(self.search('"alpha gamma" NOT delta'), (200, ['alpha gamma']))
+
+    def test_invalid_query(self):
+        self.assertEqual(self.search('quick AND')[0], 400)
+        self.assertEqual(self.search('(quick OR brown')[0], 400)
+        self.assertEqual(self.search('"the a"')[0], 400)
+
+
+@override_settings(TASKS_SEARCH_BACKEND='tasks.backends.postings.PostingsSearchBackend')
+class PostingsSearchBackendTests(SearchBackendTests, AuthenticatedTestCase):
+    def test_positions_are_offsets_in_the_paragraph(self):
+        token = TokenizedWords.objects.get(term__word='fox', uuid__paragraphs='quick and then a very brown fox')
+        self.assertEqual((token.indexes, decode_positions(token.positions)), (6, [6]))
+
+    def test_ingest_advances_bitmaps(self):
+        self.search('alpha OR beta')
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_text(self.user.pk, 'alpha omega')
+        # the bitmaps held for alpha and beta moved on to the new version instead of being reloaded
+        version = get_corpus_stats(self.user.pk).version
+        bitmaps = bitmap_cache.get(self.user.pk, version, ['alpha', 'beta'], load=None)
+        self.assertEqual(len(bitmaps['alpha']), 4)
+        self.assertEqual(self.search('alpha NOT gamma'), (200, ['alpha beta', 'alpha omega']))
+
+
+class TokenizerTests(AuthenticatedTestCase):
+    username = 'tokenizer'
+
+    def test_normalization(self):
+        tokenize = Tokenizer(casefold=True, strip_punctuation=True, nfkc=True)
+        self.assertEqual(
+            tokenize('The \ufb01sh, (FISH) -- fish\'s end.'),
+            (6, {'fish': [1, 2], "fish's": [4], 'end': [5]}),
+        )
+        # the defaults index whitespace separated words as they are
+        self.assertEqual(Tokenizer()('The fish, fish'), (3, {'The': [0], 'fish,': [1], 'fish': [2]}))
+
+    @override_settings(TASKS_TOKENIZER={'CASEFOLD': True, 'STRIP_PUNCTUATION': True})
+    def test_search_terms_are_normalized_like_paragraphs(self):
+        ingest_text(self.user.pk, 'Hello, World!\n\nworld peace')
+        response = self.client.get(reverse('paras-search'), {'q': '"hello -- world"'}, **self.auth)
+        # punctuation takes up a position, like stop words
+        self.assertIsNone(response.json()['data'])
+        response = self.client.get(reverse('paras-search'), {'q': '"hello world" OR peace!'}, **self.auth)
+        self.assertEqual(sorted(row['paragraphs'] for row in response.json()['data']), ['Hello, World!', 'world peace'])
+
+
+    @override_settings(TASKS_INGEST={'PARALLEL_TOKENIZE_THRESHOLD': 0, 'TOKENIZE_WORKERS': 2, 'TOKENIZE_CHUNK_SIZE': 10})
+    def test_large_submissions_are_tokenized_in_a_pool(self):
+        paras = [f'word{i} the word{i % 3} word{i}' for i in range(50)] + ['the a', 'last one']
+        self.assertEqual(
+            list(tokenize_paragraphs(paras, workers=2, chunk_size=10)),
+            [(para, index_paragraph(para)) for para in paras],
+        )
+        ingestor = ingest_text(self.user.pk, '\n\n'.join(paras))
+        self.assertEqual((ingestor.paragraphs, ingestor.tokens), (52, 99))
+        self.assertEqual(
+            list(Paragraph.objects.filter(user=self.user).order_by('id').values_list('paragraphs', flat=True)), paras
+        )
+
+    def test_broken_pool_is_replaced(self):
+        paras = [f'word{i} the word{i % 3}' for i in range(20)]
+        executor = tokenizer_pool.get(2)
+        # a pool process that dies breaks the whole executor
+        with self.assertRaises(BrokenProcessPool):
+            executor.submit(os._exit, 1).result()
+        self.assertEqual(
+            list(tokenize_paragraphs(paras, workers=2, chunk_size=10)),
+            [(para, index_paragraph(para)) for para in paras],
+        )
+        self.assertIsNot(tokenizer_pool.get(2), executor)
+        self.assertEqual(
+            list(tokenize_paragraphs(paras, workers=2, chunk_size=10)),
+            [(para, index_paragraph(para)) for para in paras],
+        )
+
+
+class VocabularyTests(AuthenticatedTestCase):
+    def test_words_are_stored_once(self):
+        for number in range(2):
+            user = self.make_user(f'vocabulary{number}')
+            ingest_text(user.pk, 'Fish fish\n\nfish')
+        self.assertEqual(TokenizedWords.objects.count(), 6)
+        self.assertEqual(sorted(Term.objects.values_list('word', flat=True)), ['Fish', 'fish'])
+
+    def test_terms_are_resolved_in_bulk_then_from_memory(self):
+        # one INSERT and one SELECT for however many new words
+        with self.assertNumQueries(2), self.captureOnCommitCallbacks(execute=True):
+            ids = resolve_terms(['red', 'green', 'blue'])
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_terms(['blue', 'red']), {'blue': ids['blue'], 'red': ids['red']})
+
+
+PACKED = {'FORMAT': 'packed', 'BLOCK_SIZE': 2}
+
+
+@override_settings(TASKS_SEARCH_BACKEND='tasks.backends.postings.PostingsSearchBackend', TASKS_POSTINGS=PACKED)
+class PackedPostingsSearchBackendTests(SearchBackendTests, AuthenticatedTestCase):
+    def test_one_block_per_term_and_flush(self):
+        self.assertFalse(TokenizedWords.objects.exists())
+        self.assertEqual(PostingBlock.objects.get(user=self.user, term='quick').postings, 3)
+
+    def test_deleted_paragraph_leaves_its_blocks(self):
+        Paragraph.objects.get(paragraphs='alpha beta').delete()
+        self.assertEqual(self.search('alpha'), (200, ['alpha gamma', 'alpha gamma delta']))
+        self.assertFalse(PostingBlock.objects.filter(term='beta').exclude(postings=1).exists())
+
+
+class PackPostingsTests(AuthenticatedTestCase):
+    username = 'packer'
+
+    def setUp(self):
+        super().setUp()
+        caches['search'].clear()
+        bitmap_cache.clear()
+        term_dictionaries.clear()
+
+    def get(self, url, **params):
+        return self.client.get(url, params, **self.auth).json()['data']
+
+    def test_rows_move_into_blocks(self):
+        ingest_text(self.user.pk, 'Red fish red\n\nblue fish\n\nold fish new fish')
+        tokens = self.get(reverse('tokenized'))
+        results = self.get(reverse('paras-search'), q='"fish red" OR blue')
+        with self.assertRaises(CommandError):
+            call_command('pack_postings', stdout=io.StringIO())
+
+        with override_settings(TASKS_POSTINGS=PACKED):
+            ingest_text(self.user.pk, 'one fish two fish')
+            call_command('pack_postings', stdout=io.StringIO())
+            self.assertFalse(TokenizedWords.objects.exists())
+            # 4 paragraphs in blocks of 2
+            self.assertEqual(list(PostingBlock.objects.filter(term='fish').values_list('postings', flat=True)), [2, 2])
+            self.assertEqual(self.get(reverse('tokenized'), page_size=3), tokens)
+            self.assertEqual(self.get(reverse('paras-search'), q='"fish red" OR blue'), results)
+            self.assertEqual(self.get(reverse('suggest'), prefix='fi'), [{'word': 'fish', 'paragraphs': 4}])
+
+    def test_delete_reads_only_the_blocks_of_its_terms(self):
+        ingest_text(self.user.pk, 'alpha beta\n\ngamma\n\nalpha delta')
+        with override_settings(TASKS_POSTINGS=PACKED):
+            call_command('pack_postings', '--block-size', '10', stdout=io.StringIO())
+            gamma = Paragraph.objects.get(paragraphs='gamma')
+            self.assertEqual(gamma.terms, 'gamma')
+            # the alpha block spans gamma's id but is never read
+            with mock.patch('tasks.postings.iter_block_ids', wraps=iter_block_ids) as read_ids:
+                gamma.delete()
+            self.assertEqual(read_ids.call_count, 1)
+            Paragraph.objects.get(paragraphs='alpha delta').delete()
+        self.assertEqual(
+            list(PostingBlock.objects.filter(user=self.user).order_by('term').values_list('term', 'postings')),
+            [('alpha', 1), ('beta', 1)],
+        )
+
+    def test_tokenized_page_reads_only_the_blocks_of_its_terms(self):
+        ingest_text(self.user.pk, 'alpha beta\n\ngamma\n\nalpha delta')
+        with override_settings(TASKS_POSTINGS=PACKED):
+            call_command('pack_postings', '--block-size', '10', stdout=io.StringIO())
+            first = self.client.get(reverse('tokenized'), {'page_size': 1}, **self.auth).json()
+            # the alpha block spans gamma's id but is never read
+            with mock.patch('tasks.serializers.decode_block', wraps=decode_block) as decode:
+                tokens = self.client.get(first['next'], **self.auth).json()['data']
+        self.assertEqual([token['words'] for token in tokens], ['gamma'])
+        self.assertEqual([call.args[0] for call in decode.call_args_list], ['gamma'])
+
+    @override_settings(TASKS_POSTINGS=PACKED)
+    def test_blocks_outlive_tokenizer_changes(self):
+        ingest_text(self.user.pk, 'Hello, World!\n\ngreen tea')
+        paragraph = Paragraph.objects.get(paragraphs='Hello, World!')
+        with override_settings(TASKS_TOKENIZER={'CASEFOLD': True, 'STRIP_PUNCTUATION': True}):
+            # the stored words, not the ones today's settings would produce
+            tokens = self.get(reverse('tokenized'))
+            self.assertEqual(
+                [token['words'] for token in tokens if token['paragraph_uuid'] == paragraph.uuid], ['Hello,', 'World!']
+            )
+            paragraph.delete()
+        terms = PostingBlock.objects.filter(user=self.user).values_list('term', flat=True)
+        self.assertEqual(set(terms), {'green', 'tea'})
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL full-text search')
+@override_settings(TASKS_SEARCH_BACKEND='tasks.backends.postgres.PostgresSearchBackend')
+class PostgresSearchBackendTests(SearchBackendTests, AuthenticatedTestCase):
+    def test_search_vector_follows_edits(self):
+        paragraph = Paragraph.objects.get(paragraphs='beta gamma')
+        paragraph.paragraphs = 'beta epsilon'
+        paragraph.save()
+        self.assertEqual(self.search('epsilon'), (200, ['beta epsilon']))
+
+
+class TermDictionaryCacheTests(SimpleTestCase):
+    def test_one_users_lookup_does_not_hold_up_another(self):
+        cache = TermDictionaryCache(10)
+        reading, release = threading.Event(), threading.Event()
+        self.addCleanup(release.set)
+
+        def slow_read(dictionary):
+            # a trigram index or merge that takes a while
+            reading.set()
+            release.wait(10)
+
+        with mock.patch('tasks.dictionary.load_term_frequencies', return_value={'pear': 2, 'plum': 1}), \
+                mock.patch('tasks.dictionary.get_corpus_stats', return_value=mock.Mock(version=1)):
+            slow = threading.Thread(target=cache.lookup, args=('slow', 1, slow_read))
+            slow.start()
+            self.assertTrue(reading.wait(5))
+            completed = []
+            other = threading.Thread(target=lambda: completed.append(cache.complete('other', 1, 'p', 5)))
+            other.start()
+            other.join(5)
+            self.assertEqual(completed, [[('pear', 2), ('plum', 1)]])
+            release.set()
+            slow.join(5)
+
+
+class SuggestTests(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ingest_text(cls.user.pk, 'pear peach\n\nPeach plum\n\npeach pecan pea')
+
+    def setUp(self):
+        super().setUp()
+        term_dictionaries.clear()
+
+    def suggest(self, **params):
+        response = self.client.get(reverse('suggest'), params, **self.auth)
+        return response.status_code, response.json()['data']
+
+    def test_most_frequent_first(self):
+        self.assertEqual(self.suggest(prefix='Pe', limit=3), (200, [
+            {'word': 'peach', 'paragraphs': 3},
+            {'word': 'pea', 'paragraphs': 1},
+            {'word': 'pear', 'paragraphs': 1},
+        ]))
+        self.assertEqual(self.suggest(prefix='x'), (200, []))
+        self.assertEqual(self.suggest(prefix='pe', limit=0)[0], 400)
+
+    def test_dictionary_is_cached_and_follows_ingest(self):
+        self.suggest(prefix='p')
+        # cached: only the corpus version is read
+        with self.assertNumQueries(1):
+            self.suggest(prefix='pl')
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_text(self.user.pk, 'plum plumb')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.suggest(prefix='pl')[1], [
+                {'word': 'plum', 'paragraphs': 2},
+                {'word': 'plumb', 'paragraphs': 1},
+            ])
+
+
+class FuzzySearchTests(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ingest_text(cls.user.pk, 'receive the parcel\n\nbelieve the weather\n\nreceiver station')
+
+    def setUp(self):
+        super().setUp()
+        caches['search'].clear()
+        term_dictionaries.clear()
+
+    def search(self, **params):
+        response = self.client.get(reverse('paras-search'), params, **self.auth)
+        return response.status_code, sorted(row['paragraphs'] for row in response.json()['data'] or [])
+
+    def test_typos_match_in_fuzzy_mode_only(self):
+        self.assertEqual(self.search(word='receve'), (200, []))
+        self.assertEqual(self.search(word='receve', fuzzy=1, max_edits=1), (200, ['receive the parcel']))
+        self.assertEqual(self.search(word='receve', fuzzy=1), (200, ['receive the parcel', 'receiver station']))
+        self.assertEqual(self.search(q='wheather NOT parcel', fuzzy='true'), (200, ['believe the weather']))
+
+    def test_max_edits_range(self):
+        self.assertEqual(self.search(word='receve', fuzzy=1, max_edits=3)[0], 400)
+
+
+class LoadgenTests(LiveServerTestCase):
+    def setUp(self):
+        # the tables are flushed between tests, so cached term ids would point at deleted rows
+        self.addCleanup(term_ids.clear)
+
+    def scenario(self, **options):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(options, f)
+        self.addCleanup(os.remove, f.name)
+        return load_scenario(f.name)
+
+    def test_invalid_scenarios_are_rejected(self):
+        with self.assertRaisesMessage(ScenarioError, 'unknown endpoints in mix: delete'):
+            self.scenario(mix={'search': 1, 'delete': 1})
+        with self.assertRaisesMessage(ScenarioError, 'positive rps and duration'):
+            self.scenario(stages=[{'rps': 0, 'duration': 1}])
+        with self.assertRaisesMessage(ScenarioError, "unknown api 'grpc'"):
+            self.scenario(api='grpc')
+        self.assertEqual(load_scenario('smoke')['slo'], {'p99_ms': 1000, 'error_rate': 0.01, 'throughput': 0.95})
+
+    def test_scenario_against_live_server(self):
+        scenario = self.scenario(
+            users={'count': 2}, preload={'requests': 1}, corpus={'paragraphs': 3, 'words': 10, 'vocabulary': 50},
+            # the live server threads share one sqlite connection, so requests go one at a time
+            connections=1, stages=[{'rps': 20, 'duration': 0.5}, {'rps': 20, 'duration': 0.5}],
+            # an SLO no server meets, so the first stage is where it saturates
+            slo={'p99_ms': 0},
+        )
+        report = run_load(scenario, self.live_server_url)
+        # the users were created on first use and each uploaded its preload
+        self.assertEqual(CustomUser.objects.filter(email__startswith='loadgen-').count(), 2)
+        self.assertEqual(Paragraph.objects.values('user').distinct().count(), 2)
+        self.assertEqual([stage['requests'] for stage in report['stages']], [10, 10])
+        self.assertEqual(sum(stage['errors'] for stage in report['stages']), 0)
+        for stage in report['stages']:
+            for endpoint in stage['endpoints'].values():
+                self.assertEqual(sum(endpoint['histogram'].values()), endpoint['requests'])
+        self.assertEqual(report['saturation']['target_rps'], 20)
+        self.assertIsNone(report['saturation']['last_sustained_rps'])
+
+    def test_async_api_with_slow_uploads(self):
+        scenario = self.scenario(
+            users={'count': 1}, preload={'requests': 1}, corpus={'paragraphs': 2, 'words': 10, 'vocabulary': 50},
+            api='async', upload_bytes_per_sec=500, mix={'paras': 1, 'search': 1, 'tokenized': 1},
+            connections=1, stages=[{'rps': 6, 'duration': 0.5}],
+        )
+        report = run_load(scenario, self.live_server_url)
+        self.assertEqual(report['api'], 'async')
+        self.assertEqual(report['stages'][0]['errors'], 0)
+        self.assertTrue(Paragraph.objects.filter(user__email='loadgen-0@example.com').exists())
+
+
+class AsyncViewsTests(AuthenticatedTestCase):
+    """The ASGI variants answer like the DRF views they mirror."""
+
+    username = 'async'
+
+    def setUp(self):
+        super().setUp()
+        caches['search'].clear()
+        # the async client takes plain header names
+        self.sync_auth = self.auth
+        self.auth = {'AUTHORIZATION': self.sync_auth['HTTP_AUTHORIZATION']}
+
+    async def test_create_then_list_like_sync(self):
+        text = 'apple pie\n\napple tart and pears\n\nplain bread'
+        response = await self.async_client.post(
+            reverse('async-paras'), {'text': text}, content_type='application/json', headers=self.auth
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(await Paragraph.objects.filter(user=self.user).acount(), 3)
+
+        page = (await self.async_client.get(reverse('async-paras'), {'page_size': 2}, headers=self.auth)).json()
+        self.assertEqual(page['count'], '2 paragraphs in this page')
+        self.assertIsNone(page['previous'])
+        rest = (await self.async_client.get(page['next'], headers=self.auth)).json()
+        self.assertEqual(len(rest['data']), 1)
+        self.assertIsNone(rest['next'])
+
+        sync_page = await sync_to_async(self.client.get)(reverse('paras'), {'page_size': 2}, **self.sync_auth)
+        self.assertEqual(page['data'], sync_page.json()['data'])
+
+        stream = await self.async_client.get(reverse('async-paras'), {'stream': 'true'}, headers=self.auth)
+        body = b''.join([chunk async for chunk in stream.streaming_content])
+        self.assertEqual(json.loads(body)['data'], page['data'] + rest['data'])
+
+    async def test_search_and_tokenized(self):
+        await sync_to_async(ingest_text)(self.user.pk, 'apple pie\n\napple apple apple\n\nplain bread')
+        url = reverse('async-paras-search')
+        data = (await self.async_client.get(url, {'word': 'Apple'}, headers=self.auth)).json()['data']
+        self.assertEqual([row['paragraphs'] for row in data], ['apple apple apple', 'apple pie'])
+        # cached now: the same answer from the corpus statistics alone
+        self.assertEqual((await self.async_client.get(url, {'word': 'Apple'}, headers=self.auth)).json()['data'], data)
+        self.assertEqual((await self.async_client.get(url, {'q': 'apple AND'}, headers=self.auth)).status_code, 400)
+
+        tokens = (await self.async_client.get(reverse('async-tokenized'), headers=self.auth)).json()
+        sync_tokens = await sync_to_async(self.client.get)(reverse('tokenized'), **self.sync_auth)
+        self.assertEqual(tokens['data'], sync_tokens.json()['data'])
+
+    async def test_queue_and_auth(self):
+        response = await self.async_client.post(
+            reverse('async-paras') + '?async=true', {'text': 'queued text'}, content_type='application/json',
+            headers=self.auth,
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(await IngestJob.objects.filter(pk=response.json()['data']['job_id']).aexists())
+        self.assertEqual((await self.async_client.get(reverse('async-paras'))).status_code, 401)
+        response = await self.async_client.get(reverse('async-paras'), {'cursor': 'bogus'}, headers=self.auth)
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(TASKS_POSTINGS=PACKED, TASKS_STREAM_CHUNK_SIZE=2)
+    async def test_packed_stream_tokenizes_chunks_off_the_event_loop(self):
+        await sync_to_async(ingest_text)(self.user.pk, 'apple pie\n\napple apple apple\n\nplain bread')
+        tokens = PackedTokenizedValuesSerializer.tokens
+        calls = []
+
+        def record(rows, blocks):
+            calls.append((len(rows), threading.get_ident()))
+            return tokens(rows, blocks)
+
+        with mock.patch.object(PackedTokenizedValuesSerializer, 'tokens', record):
+            stream = await self.async_client.get(reverse('async-tokenized'), {'stream': 'true'}, headers=self.auth)
+            body = b''.join([chunk async for chunk in stream.streaming_content])
+        self.assertEqual([size for size, thread in calls], [2, 1])
+        self.assertNotIn(threading.get_ident(), [thread for size, thread in calls])
+        page = (await self.async_client.get(reverse('async-tokenized'), headers=self.auth)).json()
+        self.assertEqual(json.loads(body)['data'], page['data'])
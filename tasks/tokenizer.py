@@ -0,0 +1,233 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from django.conf import settings
+
+from tasks.helpers import stop_words
+
+
+DEFAULTS = {
+    # case insensitive tokens (str.casefold, so "Straße" and "STRASSE" meet)
+    'CASEFOLD': False,
+    # drop leading and trailing punctuation, so "word," and "(word)" are "word"
+    'STRIP_PUNCTUATION': False,
+    # Unicode NFKC normalization, so compatibility forms ("ﬁ", full width letters) match
+    'NFKC': False,
+}
+
+# a whitespace separated token, captured without its leading and trailing punctuation;
+# the capture is empty for punctuation only tokens, which still take up a position
+WORD_RE = re.compile(r'(?<!\S)(?=\S)[^\w\s]*(\w(?:\S*\w)?)?\S*')
+
+
+class Tokenizer:
+    """
+    Splits a paragraph into whitespace separated tokens and indexes its words.
+
+    Normalization is applied to the whole text before it is split (NFKC, then
+    casefold), and punctuation is stripped by the same compiled regex that finds
+    the tokens, so a paragraph is read once. Token positions are offsets among
+    all the tokens, so stop words and punctuation still take up a position and
+    phrase queries can account for them.
+    """
+
+    def __init__(self, casefold=False, strip_punctuation=False, nfkc=False, stop_words=stop_words):
+        self.casefold = casefold
+        self.strip_punctuation = strip_punctuation
+        self.nfkc = nfkc
+        self.stop_words = frozenset(stop_words)
+
+    def tokens(self, text: str):
+        """The normalized tokens of `text`, one per position (empty for punctuation when stripped)."""
+        if self.nfkc:
+            text = unicodedata.normalize('NFKC', text)
+        if self.casefold:
+            text = text.casefold()
+        if self.strip_punctuation:
+            return WORD_RE.findall(text)
+        return text.split()
+
+    def __call__(self, para: str):
+        """
+        Return the word count of `para` and {word: positions} for its non stop
+        words, positions ascending and words in the order of their first occurrence.
+        A word's frequency is the length of its positions, its keys the unique terms.
+        """
+        tokens = self.tokens(para)
+        stop = self.stop_words
+        indexed = {}
+        for position, word in enumerate(tokens):
+            if word and word not in stop:
+                indexed.setdefault(word, []).append(position)
+        return len(tokens), indexed
+
+
+@lru_cache(maxsize=None)
+def load_tokenizer(casefold: bool, strip_punctuation: bool, nfkc: bool):
+    return Tokenizer(casefold=casefold, strip_punctuation=strip_punctuation, nfkc=nfkc)
+
+
+def get_tokenizer():
+    """The Tokenizer configured by TASKS_TOKENIZER."""
+    options = getattr(settings, 'TASKS_TOKENIZER', {})
+    return load_tokenizer(**{name.lower(): options.get(name, default) for name, default in DEFAULTS.items()})
+
+
+def index_paragraph(para: str):
+    return get_tokenizer()(para)
+
+
+def pack_results(results):
+    """
+    index_paragraph() results flattened into four arrays and one string, which
+    pickle as a handful of buffers instead of a list, dict and int per word.
+    """
+    lengths, sizes, counts, positions = array('I'), array('I'), array('I'), array('I')
+    words = []
+    for length, indexed in results:
+        lengths.append(length)
+        sizes.append(len(indexed))
+        words.extend(indexed)
+        for word_positions in indexed.values():
+            counts.append(len(word_positions))
+            positions.extend(word_positions)
+    return lengths, sizes, counts, positions, '\0'.join(words)
+
+
+def unpack_results(packed):
+    lengths, sizes, counts, positions, words = packed
+    positions = positions.tolist()
+    words = iter(words.split('\0'))
+    counts = iter(counts)
+    start = 0
+    for length, size in zip(lengths, sizes):
+        indexed = {}
+        for word, count in zip(itertools.islice(words, size), itertools.islice(counts, size)):
+            indexed[word] = positions[start:start + count]
+            start += count
+        yield length, indexed
+
+
+def _tokenize_chunk(options: tuple, paras: list):
+    # runs in a pool process; the options travel with each chunk so no Django settings are needed there
+    tokenize = load_tokenizer(*options)
+    return pack_results(tokenize(para) for para in paras)
+
+
+class TokenizerPool:
+    """
+    A ProcessPoolExecutor shared by every ingestion in the process, started on
+    first use and replaced if the number of workers asked for changes or after
+    it was discarded as broken.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._workers = None
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def get(self, workers: int):
+        with self._lock:
+            if self._executor is None or self._workers != workers:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                # spawned, not forked: forking a threaded server process can copy held locks
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+                )
+                self._workers = workers
+            return self._executor
+
+    def discard(self, executor):
+        """Drop `executor` if it is still the shared one, so the next get() starts a new pool."""
+        with self._lock:
+            if self._executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+tokenizer_pool = TokenizerPool()
+
+
+def iter_chunks(paras, chunk_size: int):
+    """Lists of consecutive paragraphs of about `chunk_size` characters."""
+    chunk = []
+    size = 0
+    for para in paras:
+        chunk.append(para)
+        size += len(para)
+        if size >= chunk_size:
+            yield chunk
+            chunk = []
+            size = 0
+    if chunk:
+        yield chunk
+
+
+def tokenize_paragraphs(paras, workers=None, chunk_size: int = 256 * 1024):
+    """
+    Yield (para, index_paragraph(para)) for every paragraph, in order.
+
+    With more than one worker the paragraphs are sent to the shared process pool
+    in chunks of about `chunk_size` characters. At most two chunks per worker are
+    in flight, so a lazy iterable (a streamed upload) is still read as it goes,
+    and results come back in submission order whichever worker finishes first.
+    Daemonic processes cannot start a pool and tokenize in process, and so do the
+    paragraphs not yielded yet when a pool process dies (killed for memory, crashed).
+    """
+    workers = os.cpu_count() if workers is None else workers
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        tokenize = get_tokenizer()
+        for para in paras:
+            yield para, tokenize(para)
+        return
+
+    tokenizer = get_tokenizer()
+    options = (tokenizer.casefold, tokenizer.strip_punctuation, tokenizer.nfkc)
+    executor = tokenizer_pool.get(workers)
+    chunks = iter_chunks(paras, chunk_size)
+    # a chunk leaves `pending` once its results are yielded, so a broken pool loses none
+    pending = deque()
+    futures = deque()
+    try:
+        for chunk in chunks:
+            pending.append(chunk)
+            futures.append(executor.submit(_tokenize_chunk, options, chunk))
+            if len(pending) >= 2 * workers:
+                yield from zip(pending[0], unpack_results(futures[0].result()))
+                pending.popleft()
+                futures.popleft()
+        while pending:
+            yield from zip(pending[0], unpack_results(futures[0].result()))
+            pending.popleft()
+            futures.popleft()
+    except BrokenProcessPool:
+        tokenizer_pool.discard(executor)
+        for para in itertools.chain(itertools.chain.from_iterable(pending), itertools.chain.from_iterable(chunks)):
+            yield para, tokenizer(para)
+
+
+def normalize_words(text: str):
+    """The tokens of a query phrase, normalized like paragraphs and lower cased for lookup."""
+    return [word.lower() for word in get_tokenizer().tokens(text)]
+
+
+def normalize_word(word: str):
+    return ' '.join(normalize_words(word))
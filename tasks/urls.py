@@ -1,8 +1,14 @@
 from django.urls import path
-from tasks import views
+from tasks import async_views, views
 
 urlpatterns = [
     path('paras/',views.ParagraphsView.as_view(), name='paras'),
+    path('paras/stream/',views.ParagraphStreamView.as_view(), name='paras-stream'),
+    path('jobs/<int:job_id>/',views.IngestJobView.as_view(), name='ingest-job'),
     path('search/',views.ParagraphSearchView.as_view(), name='paras-search'),
+    path('suggest/',views.SuggestView.as_view(), name='suggest'),
     path('tokenized/',views.TokenizedWordsView.as_view(), name='tokenized'),
+    path('async/paras/',async_views.AsyncParagraphsView.as_view(), name='async-paras'),
+    path('async/search/',async_views.AsyncParagraphSearchView.as_view(), name='async-paras-search'),
+    path('async/tokenized/',async_views.AsyncTokenizedWordsView.as_view(), name='async-tokenized'),
 ]
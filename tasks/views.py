@@ -1,29 +1,47 @@
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
+from django.urls import reverse
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from authtoken.views import get_token_user_data
-from tasks.models import Paragraph, TokenizedWords
-from tasks.serializers import ParagraphSerializer, TokenizedSerializer
-from users.models import CustomUser
+from monitoring.timing import phase
+from project.pagination import PrimaryKeyCursorPagination, cursor_parameters
+from tasks.cache import MISSING, get_corpus_stats, search_cache
+from tasks.dictionary import term_dictionaries
+from tasks.ingest import STREAM_CONTENT_TYPES, ingest_stream
+from tasks.jobs import enqueue
+from tasks.models import IngestJob, Paragraph, TokenizedWords
+from tasks.postings import get_postings_store
+from tasks.query import parse_search_params
+from tasks.search import rank_paragraphs, search_cache_key
+from tasks.serializers import (
+    IngestJobSerializer, PackedTokenizedValuesSerializer, ParagraphSerializer, ParagraphValuesSerializer,
+    TokenizedValuesSerializer,
+)
+from tasks.streaming import stream_parameter, streaming_response, wants_stream
+from tasks.tokenizer import normalize_word
 
 
 class ParagraphsView(APIView):
     queryset = Paragraph.objects
     serializer_class = ParagraphSerializer
-    data = {}
+    pagination_class = PrimaryKeyCursorPagination
     
+    @swagger_auto_schema(manual_parameters=cursor_parameters + [stream_parameter])
     def get(self, request):
         """
         API view for retrieving a list of paragraphs for the authenticated user.
 
         This endpoint allows authenticated users to retrieve a list of all paragraphs associated with their account.
         The API response includes the success status, a message, the list of paragraphs, and the HTTP status code.
+        Results are paginated by id; follow the `next` link to read the following page.
+        With `stream=true` every paragraph is streamed in one response instead, read from the database in chunks.
 
         **Request**:
-        - GET /tasks/v1/paras/
+        - GET /tasks/v1/paras/?cursor={cursor}&page_size={page_size}
+        - GET /tasks/v1/paras/?stream=true
 
         **Responses**:
         - 200 OK:
@@ -31,6 +49,9 @@ class ParagraphsView(APIView):
             - Response Body:
                 - success: bool, indicates if the request was successful
                 - message: str, confirmation message
+                - count: number of paragraphs in this page
+                - next: str, url of the next page or None
+                - previous: str, url of the previous page or None
                 - data: list, a list of paragraph objects associated with the user
                 - status_code: int, HTTP status code (200)
         - 401 Unauthorized:
@@ -41,34 +62,54 @@ class ParagraphsView(APIView):
                 - data: None
                 - status_code: int, HTTP status code (401)
         """
+        data = {}
         user_id, email, username = get_token_user_data(request)
         if not user_id or not email or not username:
-            self.data['success'] = False
-            self.data['message'] = "token is invalid or expired"
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_401_UNAUTHORIZED
-            return Response(data=self.data, status=status.HTTP_401_UNAUTHORIZED)
+            data['success'] = False
+            data['message'] = "token is invalid or expired"
+            data['data'] = None
+            data['status_code'] = status.HTTP_401_UNAUTHORIZED
+            return Response(data=data, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = CustomUser.objects.get(email=email)
-        instance = self.queryset.filter(user=user)
-        if not instance:
-            self.data['success'] = True
-            self.data['message'] = 'data is empty.'
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_200_OK
-            return Response(data=self.data, status=status.HTTP_200_OK)
+        rows = ParagraphValuesSerializer.project(self.queryset.filter(user_id=user_id))
+        if wants_stream(request):
+            return streaming_response(
+                "list of all paragraph's data", rows.order_by('id'), ParagraphValuesSerializer.to_representation
+            )
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        if not page:
+            data['success'] = True
+            data['message'] = 'data is empty.'
+            data['data'] = None
+            data['status_code'] = status.HTTP_200_OK
+            return Response(data=data, status=status.HTTP_200_OK)
         
-        serializer = self.serializer_class(instance, many=True)
-        self.data['success'] = True
-        self.data['message'] = "list of all paragraph's data"
-        self.data['count'] = f'{len(serializer.data)} paragraphs present'
-        self.data['data'] = serializer.data
-        self.data['status_code'] = status.HTTP_200_OK
+        data['success'] = True
+        data['message'] = "list of all paragraph's data"
+        data['count'] = f'{len(page)} paragraphs in this page'
+        data['next'] = paginator.get_next_link()
+        data['previous'] = paginator.get_previous_link()
+        with phase('serialize'):
+            data['data'] = ParagraphValuesSerializer.many(page)
+        data['status_code'] = status.HTTP_200_OK
         
-        return Response(data=self.data, status=status.HTTP_200_OK)
+        return Response(data=data, status=status.HTTP_200_OK)
     
 
-    @swagger_auto_schema(request_body=serializer_class)
+    @swagger_auto_schema(
+    request_body=serializer_class,
+    manual_parameters=[
+        openapi.Parameter(
+            name='async',
+            in_=openapi.IN_QUERY,
+            description='Queue the text for the ingest workers and return a job id immediately',
+            type=openapi.TYPE_BOOLEAN,
+            required=False
+        )
+    ]
+    )
     def post(self, request):
         """
         API view for creating a new paragraphs.
@@ -81,6 +122,8 @@ class ParagraphsView(APIView):
 
         **Request**:
         - POST /tasks/v1/paras/
+        - POST /tasks/v1/paras/?async=true queues the text for `manage.py ingest_workers` and answers 202 with a job id,
+          poll GET /tasks/v1/jobs/{id}/ for progress.
 
         **Request Body**:
         - application/json
@@ -95,6 +138,13 @@ class ParagraphsView(APIView):
                 - message: str, confirmation message
                 - data: object, the created task details
                 - status_code: int, HTTP status code (201)
+        - 202 Accepted:
+            - Description: The text was queued (async mode).
+            - Response Body:
+                - success: bool, indicates if the text was queued
+                - message: str, confirmation message
+                - data: object, the job id and its status url
+                - status_code: int, HTTP status code (202)
         - 400 Bad Request:
             - Description: The request data was invalid or incomplete.
             - Response Body:
@@ -110,31 +160,163 @@ class ParagraphsView(APIView):
                 - data: None
                 - status_code: int, HTTP status code (401)
         """
+        data = {}
         user_id, email, username = get_token_user_data(request)
         if not user_id or not email or not username:
-            self.data['success'] = False
-            self.data['message'] = "token is invalid or expired"
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_401_UNAUTHORIZED
-            return Response(data=self.data, status=status.HTTP_401_UNAUTHORIZED)
+            data['success'] = False
+            data['message'] = "token is invalid or expired"
+            data['data'] = None
+            data['status_code'] = status.HTTP_401_UNAUTHORIZED
+            return Response(data=data, status=status.HTTP_401_UNAUTHORIZED)
         
         serializer = self.serializer_class(data=request.data, context={'request': request})
-        if serializer.is_valid():
-            serializer.save()
-            self.data['success'] = True
-            self.data['message'] = "task has been created successfully"
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_201_CREATED
-
-            return Response(data=self.data, status=status.HTTP_201_CREATED)
-        
-        return Response(data=serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not serializer.is_valid():
+            return Response(data=serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.query_params.get('async', '').lower() in ('1', 'true', 'yes'):
+            job = enqueue(user_id, serializer.validated_data['text'])
+            data['success'] = True
+            data['message'] = "text has been queued for ingestion"
+            data['data'] = {
+                'job_id': job.id,
+                'status_url': reverse('ingest-job', kwargs={'job_id': job.id}),
+            }
+            data['status_code'] = status.HTTP_202_ACCEPTED
+            return Response(data=data, status=status.HTTP_202_ACCEPTED)
+
+        serializer.save()
+        data['success'] = True
+        data['message'] = "task has been created successfully"
+        data['data'] = None
+        data['status_code'] = status.HTTP_201_CREATED
+        return Response(data=data, status=status.HTTP_201_CREATED)
     
 
+class ParagraphStreamView(APIView):
+    def body_stream(self, request):
+        """
+        The request body as a file-like object, or None if there is none.
+
+        DRF's request.stream is None without a Content-Length, as for a chunked
+        upload. WSGI servers that de-chunk the body and mark the end of it with
+        `wsgi.input_terminated` (gunicorn, uWSGI) hand it over as wsgi.input, and
+        under ASGI Django has already spooled the whole body.
+        """
+        if request.stream is not None:
+            return request.stream
+        meta = request.META
+        if 'wsgi.input' not in meta:
+            return request._request
+        if meta.get('wsgi.input_terminated'):
+            return meta['wsgi.input']
+        return None
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(type=openapi.TYPE_STRING, format='binary'),
+        consumes=list(STREAM_CONTENT_TYPES),
+    )
+    def post(self, request):
+        """
+        API view for uploading very large texts as a raw request body.
+
+        The body is read in chunks, split into paragraphs and tokenized as it arrives and written
+        to the database in bounded batches, so memory use does not grow with the upload size.
+        Nothing is stored if the body turns out to be malformed. Chunked uploads without a
+        Content-Length work under ASGI and under WSGI servers that de-chunk the body (gunicorn, uWSGI).
+
+        **Request**:
+        - POST /tasks/v1/paras/stream/
+
+        **Request Body**:
+        - Content-Type: text/plain - the text itself, paragraphs separated by a blank line.
+        - Content-Type: application/x-ndjson - one `{"text": "..."}` object per line, each text is split into paragraphs.
+
+        **Responses**:
+        - 201 Created:
+            - Description: The paragraphs were stored successfully.
+            - Response Body:
+                - success: bool, indicates if the upload was successful
+                - message: str, confirmation message
+                - data: object, number of paragraphs and tokens written
+                - status_code: int, HTTP status code (201)
+        - 400 Bad Request:
+            - Description: The body is empty, has no text, is not valid UTF-8 or contains an invalid NDJSON line.
+            - Response Body:
+                - success: bool, indicates if the upload failed
+                - message: str, error message
+                - data: None
+                - status_code: int, HTTP status code (400)
+        - 401 Unauthorized:
+            - Description: The token is invalid or expired.
+            - Response Body:
+                - success: bool, indicates if the request failed
+                - message: str, error message
+                - data: None
+                - status_code: int, HTTP status code (401)
+        - 415 Unsupported Media Type:
+            - Description: The Content-Type is not text/plain or NDJSON.
+            - Response Body:
+                - success: bool, indicates if the request failed
+                - message: str, error message
+                - data: None
+                - status_code: int, HTTP status code (415)
+        """
+        data = {}
+        user_id, email, username = get_token_user_data(request)
+        if not user_id or not email or not username:
+            data['success'] = False
+            data['message'] = "token is invalid or expired"
+            data['data'] = None
+            data['status_code'] = status.HTTP_401_UNAUTHORIZED
+            return Response(data=data, status=status.HTTP_401_UNAUTHORIZED)
+
+        content_type = request.content_type.split(';')[0].strip().lower()
+        if content_type not in STREAM_CONTENT_TYPES:
+            data['success'] = False
+            data['message'] = f"content type must be one of {', '.join(STREAM_CONTENT_TYPES)}"
+            data['data'] = None
+            data['status_code'] = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            return Response(data=data, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        # the body is read straight from the socket; request.data would buffer it all
+        stream = self.body_stream(request)
+        if stream is None:
+            data['success'] = False
+            data['message'] = "request body is empty."
+            data['data'] = None
+            data['status_code'] = status.HTTP_400_BAD_REQUEST
+            return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            size = int(request.META.get('CONTENT_LENGTH') or 0) or None
+            ingestor = ingest_stream(user_id, stream, content_type, size=size)
+        except (ValueError, UnicodeDecodeError) as e:
+            data['success'] = False
+            data['message'] = f"invalid request body: {e}"
+            data['data'] = None
+            data['status_code'] = status.HTTP_400_BAD_REQUEST
+            return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+        if not ingestor.paragraphs:
+            data['success'] = False
+            data['message'] = "request body contains no text."
+            data['data'] = None
+            data['status_code'] = status.HTTP_400_BAD_REQUEST
+            return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+        data['success'] = True
+        data['message'] = "text has been stored successfully"
+        data['data'] = {'paragraphs': ingestor.paragraphs, 'tokens': ingestor.tokens}
+        data['status_code'] = status.HTTP_201_CREATED
+        return Response(data=data, status=status.HTTP_201_CREATED)
+
+
 class ParagraphSearchView(APIView):
     queryset = Paragraph.objects
-    serializer_class = ParagraphSerializer
-    data = {}
+    serializer_class = ParagraphValuesSerializer
+    max_edits = 2
+    # words a fuzzy term may stand for
+    fuzzy_expansions = 10
 
     @swagger_auto_schema(
     manual_parameters=[
@@ -143,7 +325,28 @@ class ParagraphSearchView(APIView):
             in_=openapi.IN_QUERY,
             description='Word to search for in paragraphs',
             type=openapi.TYPE_STRING,
-            required=True
+            required=False
+        ),
+        openapi.Parameter(
+            name='q',
+            in_=openapi.IN_QUERY,
+            description='Query: words, "quoted phrases" and "word NEAR/k word" combined with AND, OR, NOT and parentheses',
+            type=openapi.TYPE_STRING,
+            required=False
+        ),
+        openapi.Parameter(
+            name='fuzzy',
+            in_=openapi.IN_QUERY,
+            description='Also match words a few typos away (1 or true)',
+            type=openapi.TYPE_BOOLEAN,
+            required=False
+        ),
+        openapi.Parameter(
+            name='max_edits',
+            in_=openapi.IN_QUERY,
+            description='Typos tolerated per word in fuzzy mode, 1 or 2 (default 2)',
+            type=openapi.TYPE_INTEGER,
+            required=False
         )
     ]
     )
@@ -152,14 +355,26 @@ class ParagraphSearchView(APIView):
         """
         API view for searching and retrieving the top 10 paragraphs containing a specific word.
 
-        This endpoint allows authenticated users to search for paragraphs containing a given word and returns the top 10 results.
+        This endpoint allows authenticated users to search for paragraphs containing a given word and returns the top 10 results,
+        ranked by relevance (ties go to the older paragraph) by the search backend picked with TASKS_SEARCH_BACKEND:
+        BM25 over the tokenized words by default, or ts_rank over PostgreSQL full-text search.
+        Results are cached per user and query until the user's paragraphs change.
         The API response includes the success status, a message, the list of matching paragraphs, and the HTTP status code.
 
         **Request**:
         - GET /tasks/v1/search/?word={word}
+        - GET /tasks/v1/search/?q={query}
 
         **Request Parameters**:
-        - `word`: str, required. The word to search for in the paragraphs.
+        - `word`: str. The word to search for in the paragraphs (case-insensitive, stop words are not indexed).
+        - `q`: str. Used when `word` is not given. Made of:
+            - a word, as for `word`
+            - `"an exact phrase"`: the words next to each other, in order
+            - `first NEAR/k second`: both words at most k words apart, in either order
+            - any of the above combined with `AND` (or a space), `OR`, `NOT` and parentheses,
+              e.g. `alpha AND (beta OR gamma) NOT delta`; AND and NOT bind tighter than OR
+        - `fuzzy`: bool, optional. Also match indexed words a few typos away from each searched word (phrases and NEAR stay exact).
+        - `max_edits`: int, optional. Typos tolerated per word in fuzzy mode, 1 or 2 (default 2); words up to 5 letters tolerate one, words up to 2 letters none.
 
         **Responses**:
         - 200 OK:
@@ -171,7 +386,7 @@ class ParagraphSearchView(APIView):
                 - count: number of paragraphs found
                 - status_code: int, HTTP status code (200)
         - 400 Bad Request:
-            - Description: The word parameter is missing.
+            - Description: Both the word and q parameters are missing, q is not a valid query or max_edits is out of range.
             - Response Body:
                 - success: bool, indicates if the request failed
                 - message: str, error message
@@ -185,62 +400,171 @@ class ParagraphSearchView(APIView):
                 - data: None
                 - status_code: int, HTTP status code (401)
         """
+        data = {}
         user_id, email, username = get_token_user_data(request)
         if not user_id or not email or not username:
-            self.data['success'] = False
-            self.data['message'] = "Token is invalid or expired."
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_401_UNAUTHORIZED
-            return Response(data=self.data, status=status.HTTP_401_UNAUTHORIZED)
-        
-        # Get the search word from query parameters
-        word :str = request.query_params.get('word')
-        if not word:
-            self.data['success'] = False
-            self.data['message'] = "word parameter is required."
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_400_BAD_REQUEST
-            return Response(data=self.data, status=status.HTTP_400_BAD_REQUEST)
+            data['success'] = False
+            data['message'] = "Token is invalid or expired."
+            data['data'] = None
+            data['status_code'] = status.HTTP_401_UNAUTHORIZED
+            return Response(data=data, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = CustomUser.objects.get(email=email)
-        paragraphs_all = self.queryset.filter(user=user)
-
-        matching_paragraphs = []
-        for obj in paragraphs_all:
-            if len(matching_paragraphs) == 10: break
-            if word.lower() in obj.paragraphs.lower().split():
-                matching_paragraphs.append(obj)
+        # Get the search word (or query) from query parameters
+        try:
+            query, max_edits = parse_search_params(request.query_params, self.max_edits)
+        except ValueError as e:
+            data['success'] = False
+            data['message'] = str(e)
+            data['data'] = None
+            data['status_code'] = status.HTTP_400_BAD_REQUEST
+            return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+        stats = get_corpus_stats(user_id)
+        cache_key = search_cache_key(user_id, stats.version, query, max_edits)
+        matching_paragraphs = search_cache.get(cache_key)
+        if matching_paragraphs is MISSING:
+            # The backend ranks (TASKS_SEARCH_BACKEND) and returns the 10 best ids
+            paragraph_ids = rank_paragraphs(user_id, query, stats, max_edits, self.fuzzy_expansions)
+            with phase('serialize'):
+                rows = {
+                    row['id']: row
+                    for row in self.serializer_class.project(self.queryset.filter(id__in=paragraph_ids))
+                }
+                matching_paragraphs = [self.serializer_class.to_representation(rows[pk]) for pk in paragraph_ids]
+            search_cache.set(cache_key, matching_paragraphs)
         
         if not matching_paragraphs:
-            self.data['success'] = True
-            self.data['message'] = 'No paragraphs found containing the word.'
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_200_OK
-            return Response(data=self.data, status=status.HTTP_200_OK)
+            data['success'] = True
+            data['message'] = 'No paragraphs found containing the word.'
+            data['data'] = None
+            data['status_code'] = status.HTTP_200_OK
+            return Response(data=data, status=status.HTTP_200_OK)
         
-        serializer = self.serializer_class(matching_paragraphs, many=True)
-        self.data['success'] = True
-        self.data['message'] = "List of top 10 paragraphs containing the word."
-        self.data['count'] = f'{len(serializer.data)} paragraphs found'
-        self.data['data'] = serializer.data
-        self.data['status_code'] = status.HTTP_200_OK
+        data['success'] = True
+        data['message'] = "List of top 10 paragraphs containing the word, most relevant first."
+        data['count'] = f'{len(matching_paragraphs)} paragraphs found'
+        data['data'] = matching_paragraphs
+        data['status_code'] = status.HTTP_200_OK
         
-        return Response(data=self.data, status=status.HTTP_200_OK)    
+        return Response(data=data, status=status.HTTP_200_OK)    
+
+class SuggestView(APIView):
+    default_limit = 10
+    max_limit = 100
+
+    @swagger_auto_schema(
+    manual_parameters=[
+        openapi.Parameter(
+            name='prefix',
+            in_=openapi.IN_QUERY,
+            description='Start of the word being typed',
+            type=openapi.TYPE_STRING,
+            required=True
+        ),
+        openapi.Parameter(
+            name='limit',
+            in_=openapi.IN_QUERY,
+            description='Number of suggestions, 10 by default and at most 100',
+            type=openapi.TYPE_INTEGER,
+            required=False
+        )
+    ]
+    )
+    def get(self, request):
+        """
+        API view for as-you-type suggestions from the user's own vocabulary.
+
+        Returns the indexed words starting with the given prefix, most frequent first, each with the number of the user's
+        paragraphs containing it. Suggestions come from an in-memory sorted term dictionary of the user, updated as text
+        is ingested.
+
+        **Request**:
+        - GET /tasks/v1/suggest/?prefix={prefix}&limit={limit}
+
+        **Request Parameters**:
+        - `prefix`: str, required. The start of the word (case-insensitive).
+        - `limit`: int, optional. Number of suggestions, 10 by default and at most 100.
+
+        **Responses**:
+        - 200 OK:
+            - Description: Successfully retrieved the suggestions.
+            - Response Body:
+                - success: bool, indicates if the retrieval was successful
+                - message: str, confirmation message
+                - data: list, objects with the `word` and the number of `paragraphs` containing it
+                - status_code: int, HTTP status code (200)
+        - 400 Bad Request:
+            - Description: The prefix parameter is missing or the limit is not a positive number.
+            - Response Body:
+                - success: bool, indicates if the request failed
+                - message: str, error message
+                - data: None
+                - status_code: int, HTTP status code (400)
+        - 401 Unauthorized:
+            - Description: The token is invalid or expired.
+            - Response Body:
+                - success: bool, indicates if the request failed
+                - message: str, error message
+                - data: None
+                - status_code: int, HTTP status code (401)
+        """
+        data = {}
+        user_id, email, username = get_token_user_data(request)
+        if not user_id or not email or not username:
+            data['success'] = False
+            data['message'] = "Token is invalid or expired."
+            data['data'] = None
+            data['status_code'] = status.HTTP_401_UNAUTHORIZED
+            return Response(data=data, status=status.HTTP_401_UNAUTHORIZED)
+
+        prefix = normalize_word(request.query_params.get('prefix', ''))
+        if not prefix:
+            data['success'] = False
+            data['message'] = "prefix parameter is required."
+            data['data'] = None
+            data['status_code'] = status.HTTP_400_BAD_REQUEST
+            return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            data['success'] = False
+            data['message'] = "limit must be a positive number."
+            data['data'] = None
+            data['status_code'] = status.HTTP_400_BAD_REQUEST
+            return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+        version = get_corpus_stats(user_id).version
+        suggestions = term_dictionaries.complete(user_id, version, prefix, min(limit, self.max_limit))
+        data['success'] = True
+        data['message'] = "list of suggestions, most frequent first."
+        data['data'] = [{'word': word, 'paragraphs': paragraphs} for word, paragraphs in suggestions]
+        data['status_code'] = status.HTTP_200_OK
+        return Response(data=data, status=status.HTTP_200_OK)
+
 
 class TokenizedWordsView(APIView):
     queryset = TokenizedWords.objects
-    serializer_class = TokenizedSerializer
-    data = {}
+    serializer_class = TokenizedValuesSerializer
+    pagination_class = PrimaryKeyCursorPagination
 
+    @swagger_auto_schema(manual_parameters=cursor_parameters + [stream_parameter])
     def get(self, request):
         """
         API view for retrieving a list of all tokenized data for the authenticated user.
 
         This endpoint allows authenticated users to retrieve a list of all tokenized data associated with their account.
         The API response includes the success status, a message, the list of tokenized data, and the HTTP status code.
+        Results are paginated by id; follow the `next` link to read the following page.
+        With `stream=true` every token is streamed in one response instead, read from the database in chunks.
+        With packed postings (TASKS_POSTINGS['FORMAT'] = 'packed') the tokens are read from the posting
+        blocks and pages hold every token of `page_size` paragraphs.
 
         **Request**:
-        - GET /api/v1/tokenized-data/
+        - GET /tasks/v1/tokenized/?cursor={cursor}&page_size={page_size}
+        - GET /tasks/v1/tokenized/?stream=true
 
         **Responses**:
         - 200 OK:
@@ -248,6 +572,9 @@ class TokenizedWordsView(APIView):
             - Response Body:
                 - success: bool, indicates if the retrieval was successful
                 - message: str, confirmation message
+                - count: number of tokens in this page
+                - next: str, url of the next page or None
+                - previous: str, url of the previous page or None
                 - data: list, a list of tokenized data objects
                 - status_code: int, HTTP status code (200)           
         - 401 Unauthorized:
@@ -258,30 +585,107 @@ class TokenizedWordsView(APIView):
                 - data: None
                 - status_code: int, HTTP status code (401)
         """
+        data = {}
         user_id, email, username = get_token_user_data(request)
         if not user_id or not email or not username:
-            self.data['success'] = False
-            self.data['message'] = "token is invalid or expired"
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_401_UNAUTHORIZED
-            return Response(data=self.data, status=status.HTTP_401_UNAUTHORIZED)
+            data['success'] = False
+            data['message'] = "token is invalid or expired"
+            data['data'] = None
+            data['status_code'] = status.HTTP_401_UNAUTHORIZED
+            return Response(data=data, status=status.HTTP_401_UNAUTHORIZED)
 
-        user = CustomUser.objects.get(email=email)
-        instance = self.queryset.filter(user=user)
+        queryset, serializer_class = self.queryset, self.serializer_class
+        if get_postings_store().packed:
+            queryset, serializer_class = Paragraph.objects, PackedTokenizedValuesSerializer
+        rows = serializer_class.project(queryset.filter(user_id=user_id))
+        if wants_stream(request):
+            return streaming_response(
+                "list of all tokenized data", rows.order_by('id'), serializer_class.to_representation,
+                many=serializer_class.many if serializer_class.batched else None,
+            )
 
-        if not instance:
-            self.data['success'] = True
-            self.data['message'] = 'data is empty.'
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_200_OK
-            return Response(data=self.data, status=status.HTTP_200_OK)
-        
-        serializer = self.serializer_class(instance, many=True)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(rows, request, view=self)
+
+        if not page:
+            data['success'] = True
+            data['message'] = 'data is empty.'
+            data['data'] = None
+            data['status_code'] = status.HTTP_200_OK
+            return Response(data=data, status=status.HTTP_200_OK)
         
-        self.data['success'] = True
-        self.data['message'] = "list of all tokenized data"
-        self.data['data'] = serializer.data
-        self.data['status_code'] = status.HTTP_200_OK
+        data['success'] = True
+        data['message'] = "list of all tokenized data"
+        with phase('serialize'):
+            tokens = serializer_class.many(page)
+        data['count'] = f'{len(tokens)} tokens in this page'
+        data['next'] = paginator.get_next_link()
+        data['previous'] = paginator.get_previous_link()
+        data['data'] = tokens
+        data['status_code'] = status.HTTP_200_OK
         
-        return Response(data=self.data, status=status.HTTP_200_OK)
-    
\ No newline at end of file
+        return Response(data=data, status=status.HTTP_200_OK)
+    
+
+class IngestJobView(APIView):
+    queryset = IngestJob.objects
+    serializer_class = IngestJobSerializer
+
+    def get(self, request, job_id):
+        """
+        API view for checking an asynchronous ingestion job.
+
+        Returns the job status (pending, running, done or failed), the number of paragraphs and tokens
+        written so far, how many times a worker claimed it and the error of a failed job. Users only see
+        their own jobs.
+
+        **Request**:
+        - GET /tasks/v1/jobs/{id}/
+
+        **Responses**:
+        - 200 OK:
+            - Description: The job was found.
+            - Response Body:
+                - success: bool, indicates if the retrieval was successful
+                - message: str, confirmation message
+                - data: object, the job details
+                - status_code: int, HTTP status code (200)
+        - 401 Unauthorized:
+            - Description: The token is invalid or expired.
+            - Response Body:
+                - success: bool, indicates if the request failed
+                - message: str, error message
+                - data: None
+                - status_code: int, HTTP status code (401)
+        - 404 Not Found:
+            - Description: The job does not exist or belongs to another user.
+            - Response Body:
+                - success: bool, indicates that the job was not found
+                - message: str, error message
+                - data: None
+                - status_code: int, HTTP status code (404)
+        """
+        data = {}
+        user_id, email, username = get_token_user_data(request)
+        if not user_id or not email or not username:
+            data['success'] = False
+            data['message'] = "token is invalid or expired"
+            data['data'] = None
+            data['status_code'] = status.HTTP_401_UNAUTHORIZED
+            return Response(data=data, status=status.HTTP_401_UNAUTHORIZED)
+
+        instance = self.queryset.defer('text').filter(id=job_id, user_id=user_id).first()
+        if not instance:
+            data['success'] = False
+            data['message'] = "job doesn't exists."
+            data['data'] = None
+            data['status_code'] = status.HTTP_404_NOT_FOUND
+            return Response(data=data, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = self.serializer_class(instance)
+        data['success'] = True
+        data['message'] = "job details."
+        with phase('serialize'):
+            data['data'] = serializer.data
+        data['status_code'] = status.HTTP_200_OK
+        return Response(data=data, status=status.HTTP_200_OK)
@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from tasks.models import Term
+
+
+# words sent per INSERT and per IN list while resolving
+RESOLVE_BATCH_SIZE = 1000
+
+
+class TermIdCache:
+    """
+    Bounded LRU of word -> Term id, evicting the least recently used word once
+    `max_size` are held.
+
+    Terms are never renamed, so entries cannot go stale as long as only ids of
+    committed rows are added: resolve_terms() adds them from transaction.on_commit.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, words):
+        found = {}
+        with self._lock:
+            for word in words:
+                term_id = self._entries.get(word)
+                if term_id is not None:
+                    self._entries.move_to_end(word)
+                    found[word] = term_id
+        return found
+
+    def set_many(self, ids: dict):
+        with self._lock:
+            self._entries.update(ids)
+            for word in ids:
+                self._entries.move_to_end(word)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+term_ids = TermIdCache(getattr(settings, 'TASKS_TERM_ID_CACHE_SIZE', 100000))
+
+
+def resolve_terms(words):
+    """
+    {word: Term id} for `words`, creating the missing terms. Words the cache does
+    not hold cost one INSERT ... ON CONFLICT DO NOTHING and one SELECT per
+    RESOLVE_BATCH_SIZE words, however many there are.
+    """
+    ids = term_ids.get_many(words)
+    missing = [word for word in set(words) if word not in ids]
+    found = {}
+    for i in range(0, len(missing), RESOLVE_BATCH_SIZE):
+        batch = missing[i:i + RESOLVE_BATCH_SIZE]
+        # terms another transaction is adding conflict and are read back below
+        Term.objects.bulk_create([Term(word=word) for word in batch], ignore_conflicts=True)
+        found.update(Term.objects.filter(word__in=batch).values_list('word', 'id'))
+    if found:
+        ids.update(found)
+        transaction.on_commit(partial(term_ids.set_many, found))
+    return ids
@@ -0,0 +1,61 @@
+import threading
+import time
+
+from django.conf import settings
+
+from users.models import CustomUser
+
+
+_users = {}
+_lock = threading.Lock()
+
+
+def _cached(key, now):
+    with _lock:
+        entry = _users.get(key)
+    if entry is not None and entry[0] > now:
+        return entry
+    return None
+
+
+def _remember(key, now, user):
+    with _lock:
+        _users.pop(key, None)
+        if len(_users) >= getattr(settings, 'USERS_CACHE_MAX_SIZE', 10000):
+            # every entry has the same TTL, so insertion order is expiry order
+            del _users[next(iter(_users))]
+        _users[key] = (now + getattr(settings, 'USERS_CACHE_TTL', 30), user)
+
+
+def get_cached_user(user_id):
+    """
+    Return the CustomUser row for `user_id` (or None), reading the database at most
+    once per USERS_CACHE_TTL seconds per process. Saving or deleting a user
+    invalidates its entry in this process (see users.signals); other processes
+    pick the change up when their entry expires.
+    """
+    key = str(user_id)
+    now = time.monotonic()
+    entry = _cached(key, now)
+    if entry is not None:
+        return entry[1]
+    user = CustomUser.objects.filter(id=user_id).first()
+    _remember(key, now, user)
+    return user
+
+
+async def aget_cached_user(user_id):
+    """get_cached_user() for async views."""
+    key = str(user_id)
+    now = time.monotonic()
+    entry = _cached(key, now)
+    if entry is not None:
+        return entry[1]
+    user = await CustomUser.objects.filter(id=user_id).afirst()
+    _remember(key, now, user)
+    return user
+
+
+def invalidate_user(user_id):
+    with _lock:
+        _users.pop(str(user_id), None)
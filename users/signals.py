@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
+from users.cache import invalidate_user
 from users.models import CustomUser
 
 @receiver(post_save, sender=CustomUser)
@@ -11,3 +12,9 @@ def update_last_updated(sender, instance, **kwargs):
             instance._saving = True
             instance.modified_at = timezone.now()
             instance.save(update_fields=['modified_at'])
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
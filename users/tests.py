@@ -1,3 +1,29 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from authtoken.serializers import MyTokenObtainPairSerializer
+from users.models import CustomUser
+
+
+class UsersListPermissionTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='admin@example.com', password='secret', name='admin', dob='2000-01-01'
+        )
+        token = MyTokenObtainPairSerializer.get_token(self.user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {token.access_token}'}
+
+    def test_permission_change_is_seen_after_save(self):
+        response = self.client.get(reverse('users-list'), **self.auth)
+        self.assertEqual(response.status_code, 401)
+
+        self.user.is_superuser = True
+        self.user.save()
+        with self.assertNumQueries(2):
+            # cached user was invalidated by the save: one user read plus the page
+            response = self.client.get(reverse('users-list'), **self.auth)
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('users-list'), **self.auth)
+        self.assertEqual(response.status_code, 200)
@@ -4,26 +4,31 @@ from rest_framework import status, permissions
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+from users.cache import get_cached_user
 from users.models import CustomUser
 from users.serializers import CustomUserSerializer, PasswordResetSerializer
 from authtoken.views import get_token_user_data
+from monitoring.timing import phase
+from project.pagination import PrimaryKeyCursorPagination, cursor_parameters
 
 
 
 class UsersListView(APIView):
     queryset = CustomUser.objects
     serializer_class = CustomUserSerializer
-    data = {}
+    pagination_class = PrimaryKeyCursorPagination
 
+    @swagger_auto_schema(manual_parameters=cursor_parameters)
     def get(self, request):
         """
         API view for retrieving a list of all users.
 
         This endpoint allows users with proper authentication and permissions to retrieve a list of all users.
         The API response includes the success status, a message, the list of users, and the HTTP status code.
+        Results are paginated by id; follow the `next` link to read the following page.
 
         **Request**:
-        - GET /users/v1/list/
+        - GET /users/v1/list/?cursor={cursor}&page_size={page_size}
 
         **Responses**:
         - 200 OK: 
@@ -31,6 +36,9 @@ class UsersListView(APIView):
         - Response Body:
             - success: bool, indicates if the retrieval was successful
             - message: str, confirmation message
+            - count: number of users in this page
+            - next: str, url of the next page or None
+            - previous: str, url of the previous page or None
             - data: list, a list of user details
             - status_code: int, HTTP status code (200)
         - 401 Unauthorized:
@@ -48,46 +56,51 @@ class UsersListView(APIView):
             - data: None
             - status_code: int, HTTP status code (204)
         """
+        data = {}
 
         user_id, email, username = get_token_user_data(request)
         if not user_id or not email or not username:
-            self.data['success'] = False
-            self.data['message'] = "token is invalid or expired"
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_401_UNAUTHORIZED
-            return Response(data=self.data, status=status.HTTP_401_UNAUTHORIZED)     
+            data['success'] = False
+            data['message'] = "token is invalid or expired"
+            data['data'] = None
+            data['status_code'] = status.HTTP_401_UNAUTHORIZED
+            return Response(data=data, status=status.HTTP_401_UNAUTHORIZED)     
                
-        user = self.queryset.get(id=user_id)
-
-        if not user.is_superuser:
-            self.data['success'] = False
-            self.data['message'] = "insufficient permissions to access user details"
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_401_UNAUTHORIZED
-            return Response(data=self.data, status=status.HTTP_401_UNAUTHORIZED) 
+        # the token carries no permission claims, read them from the short-lived user cache
+        user = get_cached_user(user_id)
+
+        if not user or not user.is_superuser:
+            data['success'] = False
+            data['message'] = "insufficient permissions to access user details"
+            data['data'] = None
+            data['status_code'] = status.HTTP_401_UNAUTHORIZED
+            return Response(data=data, status=status.HTTP_401_UNAUTHORIZED) 
           
-        instance = self.queryset.all()
-        if not instance:
-            self.data['success'] = False
-            self.data['message'] = "user's Doesn't Exists"
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_204_NO_CONTENT
-            return Response(data=self.data, status=status.HTTP_204_NO_CONTENT)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(self.queryset.all(), request, view=self)
+        if not page:
+            data['success'] = False
+            data['message'] = "user's Doesn't Exists"
+            data['data'] = None
+            data['status_code'] = status.HTTP_204_NO_CONTENT
+            return Response(data=data, status=status.HTTP_204_NO_CONTENT)
         
-        serializer = self.serializer_class(instance, many=True)
-        self.data['success'] = True
-        self.data['message'] = "list of all user's data"
-        self.data['count'] = f'{len(serializer.data)} users present'
-        self.data['data'] = serializer.data
-        self.data['status_code'] = status.HTTP_200_OK
-        return Response(data=self.data, status=status.HTTP_200_OK)
+        serializer = self.serializer_class(page, many=True)
+        data['success'] = True
+        data['message'] = "list of all user's data"
+        data['count'] = f'{len(page)} users in this page'
+        data['next'] = paginator.get_next_link()
+        data['previous'] = paginator.get_previous_link()
+        with phase('serialize'):
+            data['data'] = serializer.data
+        data['status_code'] = status.HTTP_200_OK
+        return Response(data=data, status=status.HTTP_200_OK)
 
 
 class CreateUser(APIView):
     queryset = CustomUser.objects
     serializer_class = CustomUserSerializer
     permission_classes = [permissions.AllowAny]
-    data = {}
 
     @swagger_auto_schema(
         operation_summary="Create a new user",
@@ -129,16 +142,18 @@ class CreateUser(APIView):
             - data: object, error details
             - status_code: int, HTTP status code (400)
         """
+        data = {}
         
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             serializer.save()
-            self.data['success'] = True
-            self.data['message'] = "user has been created Successfully"
-            self.data['data'] = serializer.data
-            self.data['status_code'] = status.HTTP_201_CREATED
+            data['success'] = True
+            data['message'] = "user has been created Successfully"
+            with phase('serialize'):
+                data['data'] = serializer.data
+            data['status_code'] = status.HTTP_201_CREATED
 
-            return Response(data=self.data, status=status.HTTP_201_CREATED)
+            return Response(data=data, status=status.HTTP_201_CREATED)
         return Response(data=serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
@@ -146,7 +161,6 @@ class CreateUser(APIView):
 class UserDetailView(APIView):
     queryset = CustomUser.objects
     serializer_class = CustomUserSerializer
-    data = {}
 
     def get(self, request):
         """
@@ -182,30 +196,32 @@ class UserDetailView(APIView):
                 - data: None
                 - status_code: int, HTTP status code (404)
         """
+        data = {}
         user_id, email, username = get_token_user_data(request)
         if not user_id or not email or not username:
-            self.data['success'] = False
-            self.data['message'] = "token is invalid or expired"
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_401_UNAUTHORIZED
-            return Response(data=self.data, status=status.HTTP_401_UNAUTHORIZED)   
+            data['success'] = False
+            data['message'] = "token is invalid or expired"
+            data['data'] = None
+            data['status_code'] = status.HTTP_401_UNAUTHORIZED
+            return Response(data=data, status=status.HTTP_401_UNAUTHORIZED)   
                  
         instance = self.queryset.filter(id=user_id, email=email).first()
         if not instance:
-            self.data['success'] = False
-            self.data['message'] = "user doesn't exists."
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_404_NOT_FOUND
-            return Response(data=self.data, status=status.HTTP_404_NOT_FOUND)
+            data['success'] = False
+            data['message'] = "user doesn't exists."
+            data['data'] = None
+            data['status_code'] = status.HTTP_404_NOT_FOUND
+            return Response(data=data, status=status.HTTP_404_NOT_FOUND)
         
         serializer = self.serializer_class(instance)
 
-        self.data['success'] = True
-        self.data['message'] = "user details."
-        self.data['data'] = serializer.data
-        self.data['status_code'] = status.HTTP_200_OK
+        data['success'] = True
+        data['message'] = "user details."
+        with phase('serialize'):
+            data['data'] = serializer.data
+        data['status_code'] = status.HTTP_200_OK
 
-        return Response(data=self.data, status=status.HTTP_200_OK)
+        return Response(data=data, status=status.HTTP_200_OK)
     
     @swagger_auto_schema(
         request_body=serializer_class,
@@ -262,31 +278,33 @@ class UserDetailView(APIView):
                 - data: object, error details
                 - status_code: int, HTTP status code (400)
         """
+        data = {}
         user_id, email, username = get_token_user_data(request)
         if not user_id or not email or not username:
-            self.data['success'] = False
-            self.data['message'] = "token is invalid or expired"
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_401_UNAUTHORIZED
-            return Response(data=self.data, status=status.HTTP_401_UNAUTHORIZED)   
+            data['success'] = False
+            data['message'] = "token is invalid or expired"
+            data['data'] = None
+            data['status_code'] = status.HTTP_401_UNAUTHORIZED
+            return Response(data=data, status=status.HTTP_401_UNAUTHORIZED)   
                  
         instance = self.queryset.filter(id=user_id, email=email).first()
         if not instance:
-            self.data['success'] = False
-            self.data['message'] = "user doesn't exists."
-            self.data['data'] = None
-            self.data['status_code'] = status.HTTP_404_NOT_FOUND
-            return Response(data=self.data, status=status.HTTP_404_NOT_FOUND)
+            data['success'] = False
+            data['message'] = "user doesn't exists."
+            data['data'] = None
+            data['status_code'] = status.HTTP_404_NOT_FOUND
+            return Response(data=data, status=status.HTTP_404_NOT_FOUND)
         
         serializer = self.serializer_class(instance, data=request.data)
 
         if serializer.is_valid():
             serializer.save()
-            self.data['success'] = True
-            self.data['message'] = "user details has been updated successfully"
-            self.data['data'] = serializer.data
-            self.data['status_code'] = status.HTTP_200_OK
-            return Response(data=self.data, status=status.HTTP_200_OK)
+            data['success'] = True
+            data['message'] = "user details has been updated successfully"
+            with phase('serialize'):
+                data['data'] = serializer.data
+            data['status_code'] = status.HTTP_200_OK
+            return Response(data=data, status=status.HTTP_200_OK)
         
         return Response(data=serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -295,7 +313,6 @@ class UserDetailView(APIView):
 class PasswordResetView(APIView):
     queryset = CustomUser.objects
     serializer_class = PasswordResetSerializer
-    data = {}
     
 
     @swagger_auto_schema(
@@ -337,13 +354,15 @@ class PasswordResetView(APIView):
                 - data: object, error details
                 - status_code: int, HTTP status code (400)
         """
+        data = {}
         serializer = self.serializer_class(data=request.data)
 
         if serializer.is_valid():
-            self.data['success'] = True
-            self.data['message'] = "user password has been updated successfully"
-            self.data['data'] = serializer.data
-            self.data['status_code'] = status.HTTP_200_OK
-            return Response(data=self.data, status=status.HTTP_200_OK)
+            data['success'] = True
+            data['message'] = "user password has been updated successfully"
+            with phase('serialize'):
+                data['data'] = serializer.data
+            data['status_code'] = status.HTTP_200_OK
+            return Response(data=data, status=status.HTTP_200_OK)
         
         return Response(data=serializer.errors, status=status.HTTP_400_BAD_REQUEST)